@@ -2,7 +2,7 @@
 Vercel-compatible version of the Python Command Terminal
 """
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, request, jsonify
 import os
 import subprocess
 import psutil
@@ -11,8 +11,22 @@ import platform
 from datetime import datetime
 import re
 from pathlib import Path
+import sys
+
+# Shared modules live in the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from intents import IntentMatcher
+from commands import registry as builtin_commands
+import assets
 
 app = Flask(__name__)
+assets.init_app(app)
+
+# Natural language phrases supported in serverless mode
+intent_matcher = IntentMatcher(names={'mkdir', 'ls', 'monitor'})
+
+# Built-in commands that are safe without a real filesystem
+command_registry = builtin_commands.copy(serverless=True)
 
 class CommandTerminal:
     def __init__(self):
@@ -97,10 +111,6 @@ class CommandTerminal:
         """Create directory - Simulated for serverless"""
         return f"✅ Directory '{dirname}' created successfully (simulated in serverless environment)"
     
-    def remove_item(self, item_name):
-        """Remove item - Disabled for security"""
-        return "❌ File operations disabled in serverless environment for security"
-    
     def get_system_monitoring(self):
         """Get system monitoring information"""
         try:
@@ -178,33 +188,7 @@ class CommandTerminal:
     
     def parse_natural_language(self, command):
         """Basic natural language processing for commands"""
-        command = command.lower().strip()
-        
-        # Create folder patterns
-        create_patterns = [
-            r'create (?:folder|directory) (\w+)',
-            r'make (?:folder|directory) (\w+)',
-            r'mkdir (\w+)'
-        ]
-        
-        # List patterns
-        list_patterns = [
-            r'list (?:files|directory|contents)',
-            r'show (?:files|directory|contents)',
-            r'ls'
-        ]
-        
-        # Check patterns
-        for pattern in create_patterns:
-            match = re.search(pattern, command)
-            if match:
-                return f"mkdir {match.group(1)}"
-        
-        for pattern in list_patterns:
-            if re.search(pattern, command):
-                return "ls"
-        
-        return None
+        return intent_matcher.parse(command)
     
     def execute_command(self, command):
         """Main command execution function"""
@@ -222,52 +206,22 @@ class CommandTerminal:
         if not command:
             return "No command entered"
         
-        # Try natural language processing first
-        parsed_command = self.parse_natural_language(command)
-        if parsed_command:
-            command = parsed_command
-        
-        # Split command into parts
-        parts = command.split()
-        cmd = parts[0].lower()
-        
-        # Handle built-in commands
-        if cmd == 'pwd':
-            return f"📍 Current directory: {self.current_dir}"
-        
-        elif cmd == 'cd':
-            if len(parts) > 1:
-                return self.change_directory(parts[1])
-            else:
-                return self.change_directory("~")
-        
-        elif cmd in ['ls', 'dir']:
-            return self.list_directory()
+        # Try natural language processing first; explicit built-ins keep
+        # their arguments, so "history | grep ls" is not the "ls" intent
+        if command.split()[0] not in command_registry:
+            command = self.parse_natural_language(command) or command
         
-        elif cmd == 'mkdir':
-            if len(parts) > 1:
-                return self.create_directory(parts[1])
-            else:
-                return "Error: Please specify directory name"
-        
-        elif cmd in ['rm', 'rmdir', 'del']:
-            return self.remove_item(parts[1] if len(parts) > 1 else "")
-        
-        elif cmd in ['monitor', 'system']:
-            return self.get_system_monitoring()
-        
-        elif cmd == 'help':
-            return """
+        result = command_registry.run(self, command)
+        if result is None:
+            result = self.execute_system_command(command)
+        return result
+    
+    def help_text(self):
+        """Describe the commands available in serverless mode"""
+        return f"""
 📋 AVAILABLE COMMANDS (Serverless Mode):
 ─────────────────────────────────────────────
-📍 pwd                    - Show current directory
-📁 cd <directory>         - Change directory (limited)
-📄 ls/dir                 - List directory contents
-📁 mkdir <name>           - Create directory (simulated)
-🖥️  monitor/system        - Show system monitoring info
-📋 help                   - Show this help message
-🧹 clear                  - Clear terminal
-📚 history                - Show command history
+{command_registry.describe("{icon} {usage:<22} - {description}")}
 
 🤖 NATURAL LANGUAGE COMMANDS:
 ─────────────────────────────────────────────
@@ -277,30 +231,18 @@ class CommandTerminal:
 
 ⚠️  NOTE: Running in serverless environment with limited file operations.
             """
-        
-        elif cmd == 'clear':
-            return "CLEAR_TERMINAL"
-        
-        elif cmd == 'history':
-            if not self.command_history:
-                return "📚 No command history"
-            
-            output = "\n📚 COMMAND HISTORY:\n"
-            output += "─" * 50 + "\n"
-            for i, hist in enumerate(self.command_history[-10:], 1):
-                output += f"{i:2d}. {hist['timestamp']} - {hist['command']}\n"
-            return output
-        
-        else:
-            return self.execute_system_command(command)
+
+@command_registry.command('pwd', icon='📍', description='Show current directory')
+def pwd_command(terminal, args):
+    return f"📍 Current directory: {terminal.current_dir}"
 
 # Create terminal instance
 terminal = CommandTerminal()
 
 @app.route('/')
 def index():
-    """Main terminal interface"""
-    return render_template('index.html')
+    """Main terminal interface, rendered once per instance"""
+    return assets.page_response(app, 'index.html')
 
 @app.route('/execute', methods=['POST'])
 def execute_command():
@@ -329,9 +271,7 @@ def autocomplete():
     suggestions = []
     
     # Basic command suggestions
-    commands = ['pwd', 'cd', 'ls', 'dir', 'mkdir', 'help', 'clear', 'history', 'monitor', 'system']
-    
-    for cmd in commands:
+    for cmd in command_registry.names():
         if cmd.startswith(query.lower()):
             suggestions.append(cmd)
     
@@ -3,34 +3,95 @@ Python-Based Command Terminal with Web Interface
 A terminal interface that mimics real system terminals with Flask backend.
 """
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, session, g
 import os
+import secrets
+import threading
 import subprocess
 import psutil
 import json
 import shlex
-import platform
-from datetime import datetime
+import base64
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import re
 from pathlib import Path
+from monitoring import get_sampler, diff_snapshots, DEFAULT_TOP_N
+from timeseries import parse_duration, pack_history
+from execution import spawn_command, iter_output, DEFAULT_MAX_OUTPUT_BYTES, DEFAULT_STREAM_TIMEOUT
+from sessions import SessionManager, DEFAULT_MAX_SESSIONS, DEFAULT_IDLE_TIMEOUT
+from dircache import get_directory_cache, iter_directory, LISTING_MAX_AGE
+from autocomplete import CommandIndex, HistoryIndex, suggest
+from intents import IntentMatcher
+from commands import registry as builtin_commands
+from shellpool import get_shell_pool
+import metrics
+from profiling import profiler, sample_stacks
+from sysinfo import get_system_info
+from jobs import JobManager, JobRejected, get_job_store, DEFAULT_WORKERS, DEFAULT_PER_SESSION
+from history import HistoryRing, get_history_store, DEFAULT_SEARCH_LIMIT, DEFAULT_FIND_LIMIT, MAX_SEARCH_LIMIT
+from compression import compress_response
+from framing import stream_format, encode_event
+import assets
 
 app = Flask(__name__)
+# Session cookies must be signed with the same key in every worker process
+app.secret_key = os.environ.get('TERMINAL_SECRET_KEY') or secrets.token_hex(32)
+# Minified, fingerprinted CSS/JS under /assets/
+assets.init_app(app)
+
+# Restricted commands for security
+DANGEROUS_COMMANDS = ['rm -rf', 'format', 'del /f', 'shutdown', 'reboot']
+
+# Entries per ls page unless --limit is given
+LS_PAGE_SIZE = 1000
+
+# Limits for /execute/batch
+MAX_BATCH_COMMANDS = 100
+BATCH_WORKERS = int(os.environ.get('TERMINAL_BATCH_WORKERS', 8))
+
+# How long browsers may reuse /system_info before revalidating its ETag
+SYSTEM_INFO_MAX_AGE = 3600
+
+# Seconds between keep-alive comments on an idle /monitor/stream
+MONITOR_HEARTBEAT = 15
+
+# Natural language phrases understood by the terminal
+intent_matcher = IntentMatcher()
+
+# Commands handled by CommandTerminal itself rather than the shell
+command_registry = builtin_commands.copy()
+
+def format_command_output(stdout, stderr):
+    """Combine a shell command's output the way the terminal shows it"""
+    output = stdout
+    if stderr:
+        output += f"\nError: {stderr}"
+    return output if output else "Command executed successfully"
 
 class CommandTerminal:
-    def __init__(self):
+    def __init__(self, sampler=None):
         self.current_dir = os.getcwd()
-        self.command_history = []
+        # Recent commands in memory; the store keeps everything on disk
+        self.command_history = HistoryRing()
+        self.history_store = get_history_store()
+        self.session_id = 'local'
         self.system_info = self.get_system_info()
+        self.sampler = sampler or get_sampler()
+        self.dir_cache = get_directory_cache()
+        self.history_index = HistoryIndex()
+        # Newest store entry already in command_history and history_index
+        self.history_seen = 0
+        # Exit status of the last command, 0 for built-ins that succeeded
+        self.last_exit_code = 0
+        # Serializes commands within one session
+        self.lock = threading.RLock()
         
     def get_system_info(self):
         """Get basic system information"""
-        return {
-            'platform': platform.system(),
-            'platform_version': platform.version(),
-            'architecture': platform.architecture()[0],
-            'processor': platform.processor(),
-            'python_version': platform.python_version()
-        }
+        # Static, and platform.processor() may shell out, so it is collected
+        # once and cached on disk rather than per session
+        return get_system_info()
     
     def get_current_directory(self):
         """Get current working directory"""
@@ -56,34 +117,95 @@ class CommandTerminal:
         except Exception as e:
             return f"Error changing directory: {str(e)}"
     
+    def resolve_path(self, path=None):
+        """Resolve a path relative to the current directory"""
+        target_dir = path if path else self.current_dir
+        if not os.path.isabs(target_dir):
+            target_dir = os.path.join(self.current_dir, target_dir)
+        return target_dir
+    
     def list_directory(self, path=None):
         """List directory contents"""
         try:
-            target_dir = path if path else self.current_dir
-            if not os.path.isabs(target_dir):
-                target_dir = os.path.join(self.current_dir, target_dir)
+            target_dir = self.resolve_path(path)
+            
+            if not os.path.exists(target_dir):
+                return f"Error: Directory '{target_dir}' not found"
+            
+            return list(self.dir_cache.get(target_dir, max_age=LISTING_MAX_AGE).items)
+        except Exception as e:
+            return f"Error listing directory: {str(e)}"
+    
+    def list_directory_page(self, path=None, offset=0, limit=LS_PAGE_SIZE, cursor=None):
+        """List one page of directory contents, sorted by name
+        
+        Pass the returned next_cursor back as cursor to get the following
+        page; unlike offsets, cursors stay correct while entries are added.
+        """
+        try:
+            target_dir = self.resolve_path(path)
             
             if not os.path.exists(target_dir):
                 return f"Error: Directory '{target_dir}' not found"
             
-            items = []
-            for item in os.listdir(target_dir):
-                item_path = os.path.join(target_dir, item)
-                is_dir = os.path.isdir(item_path)
-                size = os.path.getsize(item_path) if not is_dir else 0
-                modified = datetime.fromtimestamp(os.path.getmtime(item_path)).strftime('%Y-%m-%d %H:%M')
-                
-                items.append({
-                    'name': item,
-                    'type': 'directory' if is_dir else 'file',
-                    'size': size,
-                    'modified': modified
-                })
+            after = None
+            if cursor:
+                try:
+                    after = base64.urlsafe_b64decode(cursor.encode()).decode('utf-8', 'surrogateescape')
+                except (ValueError, UnicodeDecodeError):
+                    return f"Error: Invalid cursor '{cursor}'"
+            
+            listing = self.dir_cache.get(target_dir, max_age=LISTING_MAX_AGE)
+            items, next_name = listing.page(offset, limit, after)
+            next_cursor = None
+            if next_name is not None:
+                next_cursor = base64.urlsafe_b64encode(next_name.encode('utf-8', 'surrogateescape')).decode()
             
-            return items
+            return {
+                'path': target_dir,
+                'items': items,
+                'total': len(listing),
+                'next_cursor': next_cursor
+            }
         except Exception as e:
             return f"Error listing directory: {str(e)}"
     
+    def parse_ls_args(self, args):
+        """Split ls arguments into a path and paging options"""
+        options = {'path': None, 'limit': LS_PAGE_SIZE, 'offset': 0, 'cursor': None, 'json': False}
+        args = iter(args)
+        for arg in args:
+            if arg == '--json':
+                options['json'] = True
+            elif arg in ('--limit', '--offset', '--cursor'):
+                value = next(args, None)
+                if value is None:
+                    raise ValueError(f"{arg} expects a value")
+                if arg == '--cursor':
+                    options['cursor'] = value
+                elif not value.isdigit():
+                    raise ValueError(f"{arg} expects a number")
+                else:
+                    options[arg[2:]] = int(value)
+            else:
+                options['path'] = arg
+        return options
+    
+    def format_listing(self, page):
+        """Format a directory page as a text table"""
+        lines = [
+            f"Contents of {page['path']}:\n\n",
+            f"{'Name':<30} {'Type':<10} {'Size':<10} {'Modified':<20}\n",
+            "-" * 70 + "\n"
+        ]
+        for item in page['items']:
+            size_str = f"{item['size']} bytes" if item['type'] == 'file' else ""
+            lines.append(f"{item['name']:<30} {item['type']:<10} {size_str:<10} {item['modified']:<20}\n")
+        if page['next_cursor']:
+            target = '' if page['path'] == self.current_dir else f"{page['path']} "
+            lines.append(f"\n... {page['total']} entries in total, next page: ls {target}--cursor {page['next_cursor']}\n")
+        return ''.join(lines)
+    
     def create_directory(self, dirname):
         """Create a new directory"""
         try:
@@ -116,204 +238,200 @@ class CommandTerminal:
             return f"Error removing '{item_name}': {str(e)}"
     
     def get_system_monitoring(self):
-        """Get system monitoring information"""
+        """Get system monitoring information from the background sampler"""
         try:
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
-            
-            # Get top processes
-            processes = []
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-                try:
-                    processes.append(proc.info)
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
-            
-            # Sort by CPU usage and get top 5
-            processes = sorted(processes, key=lambda x: x['cpu_percent'] or 0, reverse=True)[:5]
-            
-            return {
-                'cpu_percent': cpu_percent,
-                'memory': {
-                    'total': round(memory.total / (1024**3), 2),
-                    'available': round(memory.available / (1024**3), 2),
-                    'percent': memory.percent,
-                    'used': round(memory.used / (1024**3), 2)
-                },
-                'disk': {
-                    'total': round(disk.total / (1024**3), 2),
-                    'used': round(disk.used / (1024**3), 2),
-                    'free': round(disk.free / (1024**3), 2),
-                    'percent': round((disk.used / disk.total) * 100, 2)
-                },
-                'top_processes': processes
-            }
+            return self.sampler.get_snapshot()
         except Exception as e:
             return f"Error getting system information: {str(e)}"
     
+    def is_dangerous(self, command):
+        """Check a command against the restricted command list"""
+        return any(danger in command.lower() for danger in DANGEROUS_COMMANDS)
+    
+    def record_history(self, command):
+        """Add a command to the history, ignoring blank ones"""
+        command = command.strip()
+        if not command:
+            return
+        entry = self.history_store.append(command, self.session_id, self.current_dir)
+        if entry['id'] is None:
+            # Not stored, so only this process will know about it
+            self.history_index.record(command)
+            self.command_history.append(entry)
+        else:
+            self.sync_history()
+    
+    def sync_history(self):
+        """Catch up on commands this session ran, including in other worker processes"""
+        for entry in self.history_store.since(self.history_seen, self.session_id):
+            self.history_index.record(entry['command'], entry.pop('created'))
+            self.command_history.append(entry)
+            self.history_seen = entry['id']
+    
+    def resolve_command(self, command):
+        """Apply natural language parsing to a command"""
+        command = command.strip()
+        # Explicit built-ins keep their arguments; the loose patterns would
+        # otherwise turn "ls --limit 5" into a bare "ls"
+        if not command or self.is_builtin(command):
+            return command
+        return self.parse_natural_language(command) or command
+    
+    def is_builtin(self, command):
+        """Check whether a resolved command is handled without the shell"""
+        return not command or command.split()[0] in command_registry
+    
+    def stream_command(self, command, max_bytes=DEFAULT_MAX_OUTPUT_BYTES, timeout=DEFAULT_STREAM_TIMEOUT):
+        """Execute a command, yielding output events as they arrive
+        
+        Built-in commands produce a single 'output' event; anything else runs
+        in the shell and yields stdout/stderr chunks from execution.iter_output.
+        """
+        stripped = command.strip()
+        resolved = self.resolve_command(stripped)
+        
+        if self.is_builtin(resolved):
+            yield {'type': 'output', 'data': self.execute_command(command)}
+            return
+        
+        self.record_history(stripped)
+        
+        if self.is_dangerous(resolved):
+            metrics.commands_rejected.inc()
+            yield {'type': 'stderr', 'data': "Error: Command not allowed for security reasons"}
+            return
+        
+        try:
+            proc = spawn_command(resolved, self.current_dir)
+        except Exception as e:
+            yield {'type': 'stderr', 'data': f"Error executing command: {str(e)}"}
+            return
+        
+        yield from iter_output(proc, max_bytes=max_bytes, timeout=timeout)
+    
     def execute_system_command(self, command):
         """Execute system commands safely"""
+        output, self.last_exit_code = self.run_system_command(command)
+        return output
+    
+    def run_system_command(self, command):
+        """Run a shell command, returning (output, exit code)
+        
+        Does not touch the terminal's state, so batches can run several at
+        once.
+        """
+        # Execute command, on a pre-started shell when the pool is enabled
+        shell_pool = get_shell_pool()
+        mode = 'pool' if shell_pool is not None else 'shell'
         try:
-            # Restricted commands for security
-            dangerous_commands = ['rm -rf', 'format', 'del /f', 'shutdown', 'reboot']
-            if any(danger in command.lower() for danger in dangerous_commands):
-                return "Error: Command not allowed for security reasons"
-            
-            # Execute command
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                cwd=self.current_dir,
-                timeout=30
-            )
+            if self.is_dangerous(command):
+                metrics.commands_rejected.inc()
+                return "Error: Command not allowed for security reasons", 1
             
-            output = result.stdout
-            if result.stderr:
-                output += f"\nError: {result.stderr}"
+            metrics.subprocess_spawns.inc(mode=mode)
+            with metrics.subprocess_duration.time(mode=mode):
+                if shell_pool is not None:
+                    result = shell_pool.run(command, self.current_dir, timeout=30)
+                else:
+                    result = subprocess.run(
+                        command,
+                        shell=True,
+                        capture_output=True,
+                        text=True,
+                        cwd=self.current_dir,
+                        timeout=30
+                    )
             
-            return output if output else "Command executed successfully"
+            return format_command_output(result.stdout, result.stderr), result.returncode
         except subprocess.TimeoutExpired:
-            return "Error: Command timed out"
+            metrics.command_timeouts.inc(mode=mode)
+            return "Error: Command timed out", 1
         except Exception as e:
-            return f"Error executing command: {str(e)}"
+            return f"Error executing command: {str(e)}", 1
     
     def parse_natural_language(self, command):
         """Basic natural language processing for commands"""
-        command = command.lower().strip()
-        
-        # Create folder patterns
-        create_folder_patterns = [
-            r'create (?:folder|directory) (\w+)',
-            r'make (?:folder|directory) (\w+)',
-            r'mkdir (\w+)'
-        ]
-        
-        # Move file patterns
-        move_file_patterns = [
-            r'move (?:file )?(\w+(?:\.\w+)?) to (\w+)',
-            r'mv (\w+(?:\.\w+)?) (\w+)'
-        ]
-        
-        # List patterns
-        list_patterns = [
-            r'list (?:files|directory|contents)',
-            r'show (?:files|directory|contents)',
-            r'ls'
-        ]
-        
-        # Change directory patterns
-        cd_patterns = [
-            r'(?:go to|change to|cd) (\w+)',
-            r'enter (?:directory|folder) (\w+)'
-        ]
-        
-        # Check patterns and return appropriate command
-        for pattern in create_folder_patterns:
-            match = re.search(pattern, command)
-            if match:
-                return f"mkdir {match.group(1)}"
-        
-        for pattern in move_file_patterns:
-            match = re.search(pattern, command)
-            if match:
-                return f"mv {match.group(1)} {match.group(2)}"
-        
-        for pattern in list_patterns:
-            if re.search(pattern, command):
-                return "ls"
-        
-        for pattern in cd_patterns:
-            match = re.search(pattern, command)
-            if match:
-                return f"cd {match.group(1)}"
-        
-        return None
+        return intent_matcher.parse(command)
     
-    def execute_command(self, command):
+    def execute_command(self, command, record=True):
         """Main command execution function"""
         original_command = command
         command = command.strip()
         
         # Add to history
-        self.command_history.append({
-            'command': command,
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        })
-        
-        # Keep only last 50 commands
-        if len(self.command_history) > 50:
-            self.command_history = self.command_history[-50:]
+        if record:
+            self.record_history(command)
         
         if not command:
             return "No command entered"
         
         # Try natural language processing first
-        parsed_command = self.parse_natural_language(command)
-        if parsed_command:
-            command = parsed_command
-        
-        # Split command into parts
-        parts = command.split()
-        cmd = parts[0].lower()
+        with profiler.span('execute.resolve'):
+            command = self.resolve_command(command)
         
-        # Handle built-in commands
-        if cmd == 'pwd':
-            return self.current_dir
+        with profiler.span('execute.dispatch'):
+            result = command_registry.run(self, command)
+        if result is None:
+            # Try to execute as system command
+            with profiler.span('execute.subprocess'):
+                return self.execute_system_command(command)
+        self.last_exit_code = 1 if isinstance(result, str) and result.startswith('Error') else 0
+        return result
+    
+    def execute_batch(self, commands, stop_on_error=False, parallel=False, executor=None):
+        """Execute commands in order, yielding one result per command
         
-        elif cmd == 'cd':
-            if len(parts) > 1:
-                return self.change_directory(parts[1])
-            else:
-                return self.change_directory(os.path.expanduser("~"))
+        With parallel set, each run of consecutive shell commands is executed
+        concurrently on executor and its results are yielded as they finish;
+        built-ins run on their own, in order, since they may change the
+        working directory. Once a command fails with stop_on_error set, the
+        remaining commands are reported as skipped.
+        """
+        def result(index, output, exit_code):
+            return {
+                'index': index,
+                'command': commands[index],
+                'output': output,
+                'exit_code': exit_code,
+                'status': 'ok' if exit_code == 0 else 'error'
+            }
         
-        elif cmd == 'ls' or cmd == 'dir':
-            if len(parts) > 1:
-                result = self.list_directory(parts[1])
-            else:
-                result = self.list_directory()
+        index = 0
+        failed = False
+        while index < len(commands) and not failed:
+            resolved = self.resolve_command(commands[index])
+            if not parallel or executor is None or self.is_builtin(resolved):
+                output = self.execute_command(commands[index])
+                yield result(index, output, self.last_exit_code)
+                failed = stop_on_error and self.last_exit_code != 0
+                index += 1
+                continue
             
-            if isinstance(result, list):
-                # Format the output
-                output = f"Contents of {self.current_dir}:\n\n"
-                output += f"{'Name':<30} {'Type':<10} {'Size':<10} {'Modified':<20}\n"
-                output += "-" * 70 + "\n"
-                for item in result:
-                    size_str = f"{item['size']} bytes" if item['type'] == 'file' else ""
-                    output += f"{item['name']:<30} {item['type']:<10} {size_str:<10} {item['modified']:<20}\n"
-                return output
-            else:
-                return result
-        
-        elif cmd == 'mkdir':
-            if len(parts) > 1:
-                return self.create_directory(parts[1])
-            else:
-                return "Error: Please specify directory name"
-        
-        elif cmd == 'rm' or cmd == 'rmdir' or cmd == 'del':
-            if len(parts) > 1:
-                return self.remove_item(parts[1])
-            else:
-                return "Error: Please specify file or directory name"
-        
-        elif cmd == 'monitor' or cmd == 'system':
-            return self.get_system_monitoring()
+            # Gather the run of shell commands starting here
+            group = []
+            while index < len(commands):
+                resolved = self.resolve_command(commands[index])
+                if self.is_builtin(resolved):
+                    break
+                self.record_history(commands[index])
+                group.append((index, resolved))
+                index += 1
+            
+            futures = {executor.submit(self.run_system_command, command): position for position, command in group}
+            for future in as_completed(futures):
+                output, exit_code = future.result()
+                self.last_exit_code = exit_code
+                yield result(futures[future], output, exit_code)
+                failed = failed or (stop_on_error and exit_code != 0)
         
-        elif cmd == 'help':
-            return """
+        for skipped in range(index, len(commands)):
+            yield {'index': skipped, 'command': commands[skipped], 'output': None, 'exit_code': None, 'status': 'skipped'}
+    
+    def help_text(self):
+        """Describe the built-in and natural language commands"""
+        return f"""
 Available Commands:
-- pwd: Show current directory
-- cd <directory>: Change directory
-- ls/dir [directory]: List directory contents
-- mkdir <name>: Create directory
-- rm/del <name>: Remove file or directory
-- monitor/system: Show system monitoring info
-- help: Show this help message
-- clear: Clear terminal
-- history: Show command history
+{command_registry.describe("- {usage}: {description}")}
 
 Natural Language Commands (examples):
 - "create folder mydir"
@@ -321,30 +439,100 @@ Natural Language Commands (examples):
 - "go to documents"
 - "show system info"
             """
-        
-        elif cmd == 'clear':
-            return "CLEAR_TERMINAL"
-        
-        elif cmd == 'history':
-            if not self.command_history:
-                return "No command history"
-            
-            output = "Command History:\n\n"
-            for i, hist in enumerate(self.command_history[-10:], 1):
-                output += f"{i:2d}. {hist['timestamp']} - {hist['command']}\n"
-            return output
-        
-        else:
-            # Try to execute as system command
-            return self.execute_system_command(command)
 
-# Create terminal instance
-terminal = CommandTerminal()
+@command_registry.command('ls', aliases=('dir',), usage='ls/dir [directory] [--limit N] [--offset N] [--cursor C] [--json]',
+                          icon='📄', description='List directory contents')
+def ls_command(terminal, args):
+    try:
+        options = terminal.parse_ls_args(args)
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    
+    result = terminal.list_directory_page(
+        options['path'], offset=options['offset'], limit=options['limit'], cursor=options['cursor']
+    )
+    
+    if isinstance(result, dict):
+        # Structured mode hands the raw items to the client
+        if options['json']:
+            return result
+        with profiler.span('ls.format'):
+            return terminal.format_listing(result)
+    else:
+        return result
+
+# One terminal per client session
+sessions = SessionManager(
+    CommandTerminal,
+    max_sessions=int(os.environ.get('TERMINAL_MAX_SESSIONS', DEFAULT_MAX_SESSIONS)),
+    idle_timeout=float(os.environ.get('TERMINAL_SESSION_IDLE', DEFAULT_IDLE_TIMEOUT))
+)
+
+# Background jobs for asynchronous /execute
+jobs = JobManager(
+    workers=int(os.environ.get('TERMINAL_JOB_WORKERS', DEFAULT_WORKERS)),
+    per_session=int(os.environ.get('TERMINAL_JOBS_PER_SESSION', DEFAULT_PER_SESSION)),
+    store=get_job_store()
+)
+
+def get_session_id():
+    """Identify the current client
+    
+    API clients can pass an X-Terminal-Session header; browsers get a signed
+    session cookie.
+    """
+    session_id = request.headers.get('X-Terminal-Session')
+    if not session_id:
+        session_id = session.get('sid')
+        if not session_id:
+            session_id = secrets.token_urlsafe(16)
+            session['sid'] = session_id
+    return session_id
+
+def get_terminal():
+    """Get the terminal for the current client
+    
+    The session cookie also carries the working directory, so a request
+    served by another worker process resumes in the same place.
+    """
+    session_id = get_session_id()
+    is_new = session_id not in sessions
+    terminal = sessions.get(session_id)
+    saved_dir = session.get('cwd')
+    if is_new and saved_dir and os.path.isdir(saved_dir):
+        terminal.current_dir = saved_dir
+    terminal.session_id = session_id
+    return terminal
+
+def save_terminal(terminal):
+    """Persist the portable part of the terminal state in the session cookie"""
+    if not request.headers.get('X-Terminal-Session') and session.get('cwd') != terminal.current_dir:
+        session['cwd'] = terminal.current_dir
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_duration(response):
+    """Observe request latency by route template, not by raw path"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        elapsed = time.perf_counter() - started
+        metrics.request_duration.observe(elapsed, route=route, method=request.method)
+        profiler.record(f"route {request.method} {route}", elapsed)
+    return response
+
+@app.after_request
+def compress_output(response):
+    """Negotiate gzip/br/zstd for buffered responses above the size threshold"""
+    return compress_response(response, request.headers.get('Accept-Encoding'))
 
 @app.route('/')
 def index():
-    """Main terminal interface"""
-    return render_template('index.html')
+    """Main terminal interface, rendered once and revalidated by ETag"""
+    return assets.page_response(app, 'index.html')
 
 @app.route('/execute', methods=['POST'])
 def execute_command():
@@ -352,50 +540,433 @@ def execute_command():
     data = request.get_json()
     command = data.get('command', '')
     
-    result = terminal.execute_command(command)
+    terminal = get_terminal()
+    resolved = terminal.resolve_command(command)
+    if data.get('async') and not terminal.is_builtin(resolved):
+        return submit_job(terminal, command, resolved)
+    
+    # "history": false runs a command the client issued itself, such as the
+    # web UI's pwd on load, without adding it to the user's history
+    with terminal.lock:
+        result = terminal.execute_command(command, record=data.get('history', True))
+    save_terminal(terminal)
+    
+    # Clients that fetched /system_info once send "system_info": false
+    response = {'output': result, 'current_dir': terminal.current_dir}
+    if data.get('system_info', True):
+        response['system_info'] = terminal.system_info
+    with profiler.span('execute.serialize'):
+        return jsonify(response)
+
+@app.route('/system_info')
+def get_static_system_info():
+    """Static platform details, cacheable and revalidated by ETag"""
+    response = jsonify(get_system_info())
+    response.cache_control.public = True
+    response.cache_control.max_age = SYSTEM_INFO_MAX_AGE
+    response.add_etag()
+    return response.make_conditional(request)
+
+def submit_job(terminal, command, resolved):
+    """Queue a shell command and return its job id straight away"""
+    if terminal.is_dangerous(resolved):
+        metrics.commands_rejected.inc()
+        return jsonify({'error': "Command not allowed for security reasons"}), 403
+    
+    terminal.record_history(command)
+    try:
+        job = jobs.submit(get_session_id(), resolved, terminal.current_dir)
+    except JobRejected as e:
+        return jsonify({'error': str(e)}), 429
+    
+    return jsonify({'job_id': job.id, 'status': job.status}), 202
+
+@app.route('/jobs')
+def list_jobs():
+    """List the current session's jobs without their output"""
+    session_id = get_session_id()
+    return jsonify([
+        {key: value for key, value in job.to_dict().items() if key != 'output'}
+        for job in jobs.for_session(session_id)
+    ])
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Get job status and output, from ?offset= onwards for incremental polling"""
+    job = jobs.get(job_id, get_session_id())
+    if job is None:
+        return jsonify({'error': f"Job '{job_id}' not found"}), 404
+    return jsonify(job.to_dict(offset=request.args.get('offset', 0, type=int)))
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running job"""
+    job = jobs.cancel(job_id, get_session_id())
+    if job is None:
+        return jsonify({'error': f"Job '{job_id}' not found"}), 404
+    return jsonify({'job_id': job.id, 'status': job.status})
+
+def stream_byte_limit(data):
+    """The max_bytes option of /execute/stream, clamped to 1..DEFAULT_MAX_OUTPUT_BYTES
+    
+    Raises ValueError unless it is an integer or a string of one.
+    """
+    value = data.get('max_bytes', DEFAULT_MAX_OUTPUT_BYTES)
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError("max_bytes must be an integer")
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError("max_bytes must be an integer") from None
+    return min(max(1, value), DEFAULT_MAX_OUTPUT_BYTES)
+
+@app.route('/execute/stream', methods=['POST'])
+def stream_command():
+    """Execute a command and stream its output as newline-delimited JSON
+    
+    ?format=binary sends length-prefixed frames instead and ?format=msgpack
+    MessagePack maps; see framing.py.
+    """
+    data = request.get_json()
+    command = data.get('command', '')
+    try:
+        max_bytes = stream_byte_limit(data)
+        format, mimetype = stream_format(request.args.get('format'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    terminal = get_terminal()
+    if terminal.is_builtin(terminal.resolve_command(command)):
+        # Built-ins finish immediately and may change the working directory,
+        # which has to reach the session cookie before the response starts
+        with terminal.lock:
+            events = list(terminal.stream_command(command))
+        save_terminal(terminal)
+        events.append({'type': 'done', 'current_dir': terminal.current_dir})
+        # A buffered body, so it is compressed like any other response
+        return Response([encode_event(event, format) for event in events], mimetype=mimetype)
+    
+    def generate():
+        # Each line is written to the socket before the next chunk is read, so
+        # a slow client throttles the command instead of growing a buffer
+        for event in terminal.stream_command(command, max_bytes=max_bytes):
+            yield encode_event(event, format)
+        yield encode_event({'type': 'done', 'current_dir': terminal.current_dir}, format)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# Shared by all sessions for parallel batches
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='batch')
+
+@app.route('/execute/batch', methods=['POST'])
+def execute_batch():
+    """Execute a list of commands in one request
+    
+    Body: {"commands": [...], "stop_on_error": false, "parallel": false,
+    "stream": false, "system_info": true}. With stream set, each result is
+    sent as a JSON line as soon as its command finishes, or as a frame with
+    ?format=binary|msgpack.
+    """
+    data = request.get_json()
+    commands = data.get('commands')
+    if not isinstance(commands, list) or not all(isinstance(command, str) for command in commands):
+        return jsonify({'error': "commands must be a list of strings"}), 400
+    if len(commands) > MAX_BATCH_COMMANDS:
+        return jsonify({'error': f"At most {MAX_BATCH_COMMANDS} commands per batch"}), 400
+    
+    try:
+        format, mimetype = stream_format(request.args.get('format'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    terminal = get_terminal()
+    include_system_info = data.get('system_info', True)
+    options = {
+        'stop_on_error': bool(data.get('stop_on_error')),
+        'parallel': bool(data.get('parallel')),
+        'executor': batch_executor
+    }
+    
+    if not data.get('stream'):
+        with terminal.lock:
+            results = sorted(terminal.execute_batch(commands, **options), key=lambda result: result['index'])
+        save_terminal(terminal)
+        response = {'results': results, 'current_dir': terminal.current_dir}
+        if include_system_info:
+            response['system_info'] = terminal.system_info
+        return jsonify(response)
     
-    return jsonify({
-        'output': result,
-        'current_dir': terminal.current_dir,
-        'system_info': terminal.system_info
-    })
+    def generate():
+        # The cookie is already sent, so a cd here only reaches the
+        # in-memory session; the done line reports where the batch ended
+        with terminal.lock:
+            for result in terminal.execute_batch(commands, **options):
+                yield encode_event({'type': 'result', **result}, format)
+        done = {'type': 'done', 'current_dir': terminal.current_dir}
+        if include_system_info:
+            done['system_info'] = terminal.system_info
+        yield encode_event(done, format)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/ls')
+def list_files():
+    """List a directory as JSON, one page at a time or as a row stream
+    
+    ?stream=1 writes one JSON row per line straight from os.scandir, in
+    directory order, without building the listing in memory; with
+    ?format=binary or msgpack each row is a frame instead.
+    """
+    terminal = get_terminal()
+    path = request.args.get('path')
+    
+    if request.args.get('stream'):
+        try:
+            format, mimetype = stream_format(request.args.get('format'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        target_dir = terminal.resolve_path(path)
+        if not os.path.isdir(target_dir):
+            return jsonify({'error': f"Directory '{target_dir}' not found"}), 404
+        
+        def generate():
+            for item in iter_directory(target_dir):
+                yield encode_event(item, format)
+        
+        return Response(stream_with_context(generate()), mimetype=mimetype)
+    
+    page = terminal.list_directory_page(
+        path,
+        offset=request.args.get('offset', 0, type=int),
+        limit=request.args.get('limit', LS_PAGE_SIZE, type=int),
+        cursor=request.args.get('cursor')
+    )
+    if isinstance(page, str):
+        return jsonify({'error': page}), 400
+    return jsonify(page)
 
 @app.route('/monitor')
 def get_monitoring():
     """Get system monitoring data"""
-    monitoring_data = terminal.get_system_monitoring()
+    sampler = get_sampler()
+    try:
+        monitoring_data = sampler.get_snapshot()
+    except Exception as e:
+        monitoring_data = f"Error getting system information: {str(e)}"
+    
+    # Optional process ranking, e.g. /monitor?sort=memory&n=10
+    sort = request.args.get('sort')
+    n = request.args.get('n')
+    if isinstance(monitoring_data, dict) and (sort or n):
+        try:
+            monitoring_data['top_processes'] = sampler.top_processes(
+                int(n) if n else DEFAULT_TOP_N, sort or 'cpu'
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    
     return jsonify(monitoring_data)
 
+@app.route('/monitor/history')
+def get_monitoring_history():
+    """Monitoring history as columns of averages
+    
+    ?range=15m&step=30s picks the window and resolution (s, m, h, d units);
+    ?format=binary returns little-endian float32 columns instead of JSON,
+    described by the X-Series-* headers.
+    """
+    try:
+        range_seconds = parse_duration(request.args.get('range', '15m'))
+        step = request.args.get('step')
+        step = parse_duration(step) if step else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    history = get_sampler().get_history(range_seconds, step)
+    if request.args.get('format') == 'binary':
+        return Response(pack_history(history), mimetype='application/octet-stream', headers={
+            'X-Series-Start': str(history['start']),
+            'X-Series-Step': str(history['step']),
+            'X-Series-Count': str(history['count']),
+            'X-Series-Fields': ','.join(history['fields'])
+        })
+    return jsonify(history)
+
+def history_options(default_limit):
+    """Result limit and session to search for the /history routes
+    
+    Raises ValueError for a bad limit or scope.
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', default_limit)), 1), MAX_SEARCH_LIMIT)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    scope = request.args.get('scope', 'session')
+    if scope not in ('session', 'all'):
+        raise ValueError("scope must be 'session' or 'all'")
+    return limit, get_session_id() if scope == 'session' else None
+
+@app.route('/history')
+def get_history():
+    """Search the command history, newest first
+    
+    ?q= matches a substring (any case), &fuzzy=1 its characters in order;
+    without q the most recent commands are returned. Only the caller's
+    session is searched unless &scope=all.
+    """
+    try:
+        limit, session_id = history_options(DEFAULT_SEARCH_LIMIT)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    entries = get_history_store().search(
+        request.args.get('q', ''),
+        session=session_id,
+        limit=limit,
+        fuzzy=request.args.get('fuzzy') == '1'
+    )
+    # Session ids double as credentials, so they stay out of the response
+    return jsonify([
+        {key: value for key, value in entry.items() if key != 'session'}
+        for entry in entries
+    ])
+
+@app.route('/history/find')
+def find_history():
+    """Reverse-i-search: distinct commands matching ?q=, best first
+    
+    Ranked by match quality, use count and recency; see HistoryStore.find.
+    Takes the same limit and scope arguments as /history.
+    """
+    try:
+        limit, session_id = history_options(DEFAULT_FIND_LIMIT)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(get_history_store().find(request.args.get('q', ''), session=session_id, limit=limit))
+
+@app.route('/metrics')
+def get_metrics():
+    """Host and server metrics in the OpenMetrics text format
+    
+    Host gauges come from the sampler's cached snapshot, so a scrape never
+    waits on psutil; they are left out until the first sample exists.
+    """
+    snapshot = get_sampler().get_snapshot(wait=False)
+    return Response(metrics.registry.render(snapshot), mimetype=None, content_type=metrics.CONTENT_TYPE)
+
+@app.route('/debug/profile', methods=['GET', 'POST'])
+def debug_profile():
+    """Span timings, runtime profiling switch and on-demand stack sampling
+    
+    POST {"enabled": true|false, "reset": true} toggles or clears the span
+    aggregates; GET ?seconds=N also samples every thread's stack for N
+    seconds (at most 30) before answering.
+    """
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        if 'enabled' in data:
+            profiler.enabled = bool(data['enabled'])
+        if data.get('reset'):
+            profiler.reset()
+    
+    response = {
+        'enabled': profiler.enabled,
+        'since': profiler.started_at,
+        'spans': profiler.stats()
+    }
+    seconds = request.args.get('seconds', type=float)
+    if seconds:
+        response['profile'] = sample_stacks(seconds)
+    return jsonify(response)
+
+@app.route('/monitor/stream')
+def stream_monitoring():
+    """Push monitoring updates to the client as Server-Sent Events"""
+    sampler = get_sampler()
+    
+    def generate():
+        # Every client waits on the same sampler, so one psutil scan per tick
+        # is shared by all connected viewers
+        version, snapshot = sampler.wait_for_update(0)
+        last_sent = snapshot
+        yield f"event: snapshot\ndata: {json.dumps(snapshot)}\n\n"
+        
+        while True:
+            new_version, snapshot = sampler.wait_for_update(version, timeout=MONITOR_HEARTBEAT)
+            if new_version == version:
+                yield ": heartbeat\n\n"
+                continue
+            version = new_version
+            changes = diff_snapshots(last_sent, snapshot)
+            last_sent = snapshot
+            if changes:
+                yield f"event: update\ndata: {json.dumps(changes)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# Built-ins and PATH executables, shared by every session
+command_index = CommandIndex(command_registry.names())
+
 @app.route('/autocomplete')
 def autocomplete():
-    """Basic autocomplete functionality"""
+    """Ranked command, history and file name suggestions"""
     query = request.args.get('q', '')
-    suggestions = []
-    
-    # Basic command suggestions
-    commands = ['pwd', 'cd', 'ls', 'dir', 'mkdir', 'rm', 'del', 'help', 'clear', 'history', 'monitor', 'system']
-    
-    for cmd in commands:
-        if cmd.startswith(query.lower()):
-            suggestions.append(cmd)
+    terminal = get_terminal()
+    terminal.sync_history()
     
     # File/directory suggestions for current directory
+    directory = None
     if query:
         try:
-            for item in os.listdir(terminal.current_dir):
-                if item.lower().startswith(query.lower()):
-                    suggestions.append(item)
-        except:
+            directory = terminal.dir_cache.get(terminal.current_dir)
+        except OSError:
             pass
     
-    return jsonify(suggestions[:10])
+    return jsonify(suggest(query, command_index, terminal.history_index, directory))
 
-if __name__ == '__main__':
+def create_app():
+    """Application factory for production servers
+    
+    Safe to call in a preloading master process before workers fork: it
+    only does work whose result can be shared, such as indexing PATH, while
+    threads (monitoring sampler, job workers, shell pool) start lazily in
+    each worker on first use. Every worker must see the same
+    TERMINAL_SECRET_KEY so session cookies stay valid whichever worker
+    serves a request.
+    """
+    command_index.refresh()
+    assets.get_asset_pipeline().render_page(app, 'index.html')
+    return app
+
+def run_development_server(use_reloader=True):
+    """Run Flask's development server with the debugger
+    
+    The reloader restarts the program it was started from, so callers that
+    are not app.py itself (the launcher) turn it off.
+    """
+    system_info = get_system_info()
     print("Starting Python Command Terminal...")
-    print(f"System: {terminal.system_info['platform']} {terminal.system_info['platform_version']}")
-    print(f"Python: {terminal.system_info['python_version']}")
+    print(f"System: {system_info['platform']} {system_info['platform_version']}")
+    print(f"Python: {system_info['python_version']}")
     print("Access the terminal at: http://localhost:5000")
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    get_sampler().start()
+    command_index.refresh()
+    app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=use_reloader)
+
+if __name__ == '__main__':
+    run_development_server()
 
 # Vercel compatibility
 def handler(event, context):
@@ -0,0 +1,538 @@
+"""
+Python Command Terminal, ASGI Variant
+The routes of app.py for asyncio servers (uvicorn app_asgi:app). Shell
+commands run as asyncio subprocesses, so a command in flight costs a
+coroutine and two pipes instead of a blocked thread, and is killed when
+it times out or the client disconnects. Blocking work such as psutil
+sampling and built-in commands runs on a small thread pool, and routes
+without an async version are served by the Flask app on that pool.
+"""
+
+import asyncio
+import io
+import json
+import os
+import secrets
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from itsdangerous import BadSignature
+from werkzeug.http import dump_cookie, parse_cookie
+
+import metrics
+from compression import encode_body
+from framing import stream_format, encode_event
+from app import (
+    app as flask_app, create_app, format_command_output, sessions, jobs, JobRejected, DEFAULT_TOP_N,
+    MONITOR_HEARTBEAT, stream_byte_limit
+)
+from execution import spawn_command_async, aiter_output, DEFAULT_MAX_OUTPUT_BYTES, DEFAULT_STREAM_TIMEOUT
+from monitoring import get_sampler, diff_snapshots
+from profiling import profiler
+
+# Same limit as the synchronous /execute
+COMMAND_TIMEOUT = 30
+# Threads for blocking work: built-ins, psutil and Flask-served routes
+BLOCKING_THREADS = int(os.environ.get('TERMINAL_ASGI_THREADS', 16))
+
+executor = ThreadPoolExecutor(max_workers=BLOCKING_THREADS, thread_name_prefix='asgi')
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client goes away before the response is complete"""
+
+
+def run_blocking(function, *args):
+    """Run a blocking call on the thread pool"""
+    return asyncio.get_running_loop().run_in_executor(executor, function, *args)
+
+
+class Request:
+    def __init__(self, scope, receive):
+        self.scope = scope
+        self.receive = receive
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = {key: values[0] for key, values in parse_qs(scope['query_string'].decode('latin-1')).items()}
+        self.headers = {}
+        for name, value in scope['headers']:
+            self.headers[name.decode('latin-1').lower()] = value.decode('latin-1')
+        self.session = load_session(self.headers.get('cookie', ''))
+        self.session_modified = False
+        self._body_read = False
+
+    async def body(self):
+        chunks = []
+        while True:
+            message = await self.receive()
+            if message['type'] == 'http.disconnect':
+                raise ClientDisconnected()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        self._body_read = True
+        return b''.join(chunks)
+
+    async def json(self):
+        """Request body as a JSON object, or None when it is not one"""
+        try:
+            data = json.loads(await self.body() or b'null')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    async def until_disconnect(self, awaitable):
+        """Await something, cancelling it if the client disconnects first"""
+        if not self._body_read:
+            await self.body()
+        task = asyncio.ensure_future(awaitable)
+        watcher = asyncio.ensure_future(self._wait_disconnect())
+        try:
+            await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            watcher.cancel()
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            raise ClientDisconnected()
+        return task.result()
+
+    async def _wait_disconnect(self):
+        while (await self.receive())['type'] != 'http.disconnect':
+            pass
+
+
+class JSONResponse:
+    def __init__(self, data, status=200):
+        self.data = data
+        self.status = status
+
+
+class StreamResponse:
+    def __init__(self, lines, content_type='application/x-ndjson', headers=None):
+        self.lines = lines
+        self.content_type = content_type
+        self.headers = headers or {}
+
+
+def load_session(cookie_header):
+    """Read Flask's signed session cookie, so both apps share sessions"""
+    value = parse_cookie(cookie_header).get(flask_app.config['SESSION_COOKIE_NAME'])
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    if not value or serializer is None:
+        return {}
+    try:
+        return dict(serializer.loads(value, max_age=int(flask_app.permanent_session_lifetime.total_seconds())))
+    except BadSignature:
+        return {}
+
+
+def session_cookie(session):
+    """Set-Cookie header value for a session, as Flask would write it"""
+    interface = flask_app.session_interface
+    return dump_cookie(
+        flask_app.config['SESSION_COOKIE_NAME'],
+        interface.get_signing_serializer(flask_app).dumps(session),
+        domain=interface.get_cookie_domain(flask_app),
+        path=interface.get_cookie_path(flask_app),
+        secure=interface.get_cookie_secure(flask_app),
+        httponly=interface.get_cookie_httponly(flask_app),
+        samesite=interface.get_cookie_samesite(flask_app)
+    )
+
+
+def get_session_id(request):
+    session_id = request.headers.get('x-terminal-session')
+    if not session_id:
+        session_id = request.session.get('sid')
+        if not session_id:
+            session_id = secrets.token_urlsafe(16)
+            request.session['sid'] = session_id
+            request.session_modified = True
+    return session_id
+
+
+def get_terminal(request):
+    """Get the client's terminal, as app.get_terminal does"""
+    session_id = get_session_id(request)
+    is_new = session_id not in sessions
+    terminal = sessions.get(session_id)
+    saved_dir = request.session.get('cwd')
+    if is_new and saved_dir and os.path.isdir(saved_dir):
+        terminal.current_dir = saved_dir
+    terminal.session_id = session_id
+    return terminal
+
+
+def save_terminal(request, terminal):
+    if not request.headers.get('x-terminal-session') and request.session.get('cwd') != terminal.current_dir:
+        request.session['cwd'] = terminal.current_dir
+        request.session_modified = True
+
+
+async def run_shell(command, cwd, timeout=COMMAND_TIMEOUT, max_bytes=DEFAULT_MAX_OUTPUT_BYTES):
+    """Run a shell command without a thread, returning (output, exit code)"""
+    try:
+        proc = await spawn_command_async(command, cwd)
+    except Exception as e:
+        return f"Error executing command: {str(e)}", 1
+
+    output = {'stdout': [], 'stderr': []}
+    code = -1
+    events = aiter_output(proc, max_bytes=max_bytes, timeout=timeout)
+    try:
+        async for event in events:
+            if event['type'] in output:
+                output[event['type']].append(event['data'])
+            elif event['type'] == 'timeout':
+                return "Error: Command timed out", 1
+            elif event['type'] == 'exit':
+                code = event['code']
+    finally:
+        await events.aclose()
+    return format_command_output(''.join(output['stdout']), ''.join(output['stderr'])), code
+
+
+def execute_builtin(terminal, command, record=True):
+    with terminal.lock:
+        return terminal.execute_command(command, record)
+
+
+def stream_builtin(terminal, command):
+    with terminal.lock:
+        return list(terminal.stream_command(command))
+
+
+routes = {}
+
+
+def route(path, methods=('GET',)):
+    """Register an async handler; other paths and methods go to Flask"""
+    def register(handler):
+        for method in methods:
+            routes[(method, path)] = handler
+        return handler
+    return register
+
+
+@route('/execute', methods=['POST'])
+async def execute_command(request):
+    """Execute command endpoint"""
+    data = await request.json()
+    if data is None:
+        return JSONResponse({'error': "Request body must be a JSON object"}, 400)
+    command = data.get('command', '')
+
+    terminal = get_terminal(request)
+    resolved = terminal.resolve_command(command)
+    record = data.get('history', True)
+    if terminal.is_builtin(resolved):
+        result = await run_blocking(execute_builtin, terminal, command, record)
+    elif data.get('async'):
+        return await submit_job(request, terminal, command, resolved)
+    else:
+        if record:
+            await run_blocking(terminal.record_history, command)
+        if terminal.is_dangerous(resolved):
+            metrics.commands_rejected.inc()
+            result, terminal.last_exit_code = "Error: Command not allowed for security reasons", 1
+        else:
+            with profiler.span('execute.subprocess'):
+                result, terminal.last_exit_code = await request.until_disconnect(
+                    run_shell(resolved, terminal.current_dir))
+    save_terminal(request, terminal)
+
+    response = {'output': result, 'current_dir': terminal.current_dir}
+    if data.get('system_info', True):
+        response['system_info'] = terminal.system_info
+    return JSONResponse(response)
+
+
+async def submit_job(request, terminal, command, resolved):
+    """Queue a shell command and return its job id straight away"""
+    if terminal.is_dangerous(resolved):
+        metrics.commands_rejected.inc()
+        return JSONResponse({'error': "Command not allowed for security reasons"}, 403)
+
+    await run_blocking(terminal.record_history, command)
+    try:
+        job = jobs.submit(get_session_id(request), resolved, terminal.current_dir)
+    except JobRejected as e:
+        return JSONResponse({'error': str(e)}, 429)
+    return JSONResponse({'job_id': job.id, 'status': job.status}, 202)
+
+
+@route('/execute/stream', methods=['POST'])
+async def stream_command(request):
+    """Execute a command and stream its output as newline-delimited JSON or frames"""
+    data = await request.json()
+    if data is None:
+        return JSONResponse({'error': "Request body must be a JSON object"}, 400)
+    command = data.get('command', '')
+    try:
+        max_bytes = stream_byte_limit(data)
+        format, content_type = stream_format(request.args.get('format'))
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, 400)
+
+    terminal = get_terminal(request)
+    resolved = terminal.resolve_command(command)
+    if terminal.is_builtin(resolved):
+        # Built-ins may change the working directory, which has to reach the
+        # session cookie before the response starts
+        events = await run_blocking(stream_builtin, terminal, command)
+        save_terminal(request, terminal)
+        events.append({'type': 'done', 'current_dir': terminal.current_dir})
+        return StreamResponse((encode_event(event, format) for event in events), content_type)
+
+    async def generate():
+        await run_blocking(terminal.record_history, command)
+        if terminal.is_dangerous(resolved):
+            metrics.commands_rejected.inc()
+            yield encode_event({'type': 'stderr', 'data': "Error: Command not allowed for security reasons"}, format)
+        else:
+            try:
+                proc = await spawn_command_async(resolved, terminal.current_dir)
+            except Exception as e:
+                yield encode_event({'type': 'stderr', 'data': f"Error executing command: {str(e)}"}, format)
+            else:
+                events = aiter_output(proc, max_bytes=max_bytes, timeout=DEFAULT_STREAM_TIMEOUT)
+                try:
+                    async for event in events:
+                        yield encode_event(event, format)
+                finally:
+                    await events.aclose()
+        yield encode_event({'type': 'done', 'current_dir': terminal.current_dir}, format)
+
+    return StreamResponse(generate(), content_type, headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@route('/monitor')
+async def get_monitoring(request):
+    """Get system monitoring data, sampled off the event loop"""
+    sampler = get_sampler()
+    try:
+        monitoring_data = await run_blocking(sampler.get_snapshot)
+    except Exception as e:
+        monitoring_data = f"Error getting system information: {str(e)}"
+
+    sort = request.args.get('sort')
+    n = request.args.get('n')
+    if isinstance(monitoring_data, dict) and (sort or n):
+        try:
+            monitoring_data['top_processes'] = await run_blocking(
+                sampler.top_processes, int(n) if n else DEFAULT_TOP_N, sort or 'cpu')
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, 400)
+
+    return JSONResponse(monitoring_data)
+
+
+def as_bytes(chunk):
+    return chunk.encode() if isinstance(chunk, str) else chunk
+
+
+async def wait_for_sample(sampler, version, timeout=None):
+    """SystemSampler.wait_for_update for the event loop, without a thread
+
+    The sampling thread wakes the waiting coroutine through its listener,
+    so an open /monitor/stream costs a coroutine rather than a pool thread.
+    """
+    loop = asyncio.get_running_loop()
+    updated = asyncio.Event()
+
+    def notify():
+        try:
+            loop.call_soon_threadsafe(updated.set)
+        except RuntimeError:
+            # The loop closed while the sampler was publishing
+            pass
+
+    # Listen before checking the version, so an update in between is not missed
+    sampler.add_listener(notify)
+    try:
+        current, snapshot = sampler.wait_for_update(version, timeout=0)
+        if current > version:
+            return current, snapshot
+        try:
+            await asyncio.wait_for(updated.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return sampler.wait_for_update(version, timeout=0)
+    finally:
+        sampler.remove_listener(notify)
+
+
+@route('/monitor/stream')
+async def stream_monitoring(request):
+    """Push monitoring updates to the client as Server-Sent Events"""
+    sampler = get_sampler()
+
+    async def generate():
+        version, snapshot = await wait_for_sample(sampler, 0)
+        last_sent = snapshot
+        yield f"event: snapshot\ndata: {json.dumps(snapshot)}\n\n"
+
+        while True:
+            new_version, snapshot = await wait_for_sample(sampler, version, timeout=MONITOR_HEARTBEAT)
+            if new_version == version:
+                yield ": heartbeat\n\n"
+                continue
+            version = new_version
+            changes = diff_snapshots(last_sent, snapshot)
+            last_sent = snapshot
+            if changes:
+                yield f"event: update\ndata: {json.dumps(changes)}\n\n"
+
+    return StreamResponse(generate(), 'text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+async def send_response(send, request, response):
+    headers = []
+    if request.session_modified:
+        headers.append((b'set-cookie', session_cookie(request.session).encode('latin-1')))
+
+    if isinstance(response, JSONResponse):
+        with profiler.span('execute.serialize'):
+            body = json.dumps(response.data).encode()
+        body, encoding = encode_body(body, 'application/json', request.headers.get('accept-encoding'))
+        headers += [(b'content-type', b'application/json'), (b'vary', b'Accept-Encoding')]
+        if encoding:
+            headers.append((b'content-encoding', encoding.encode()))
+        headers.append((b'content-length', str(len(body)).encode()))
+        await send({'type': 'http.response.start', 'status': response.status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+        return
+
+    headers.append((b'content-type', response.content_type.encode()))
+    headers += [(name.lower().encode(), value.encode()) for name, value in response.headers.items()]
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+
+    async def stream():
+        if hasattr(response.lines, '__aiter__'):
+            async for line in response.lines:
+                await send({'type': 'http.response.body', 'body': as_bytes(line), 'more_body': True})
+        else:
+            for line in response.lines:
+                await send({'type': 'http.response.body', 'body': as_bytes(line), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    # Cancelling the stream on disconnect closes the generator, which kills the command
+    await request.until_disconnect(stream())
+
+
+def _close_after(future, result):
+    """Close a WSGI response once the read in progress has finished"""
+    if future is not None:
+        future.exception()
+    result.close()
+
+
+async def call_wsgi(scope, receive, send):
+    """Serve a request with the Flask app on the thread pool"""
+    request = Request(scope, receive)
+    body = await request.body()
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f"HTTP_{name}"
+        value = value.decode('latin-1')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(executor, flask_app, environ, start_response)
+    iterator = iter(result)
+    pending = None
+
+    async def relay():
+        nonlocal pending
+        await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+        while True:
+            # Each chunk is read on the pool, and a stream that blocks
+            # between chunks holds its thread all the while; long-lived
+            # streams such as /monitor/stream therefore have native routes
+            pending = executor.submit(next, iterator, None)
+            chunk = await asyncio.wrap_future(pending)
+            pending = None
+            if chunk is None:
+                break
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    try:
+        await request.until_disconnect(relay())
+    except ClientDisconnected:
+        pass
+    finally:
+        if hasattr(result, 'close'):
+            executor.submit(_close_after, pending, result)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await run_blocking(create_app)
+            get_sampler().start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    handler = routes.get((scope['method'], scope['path']))
+    if handler is None:
+        try:
+            await call_wsgi(scope, receive, send)
+        except ClientDisconnected:
+            pass
+        return
+
+    request = Request(scope, receive)
+    started = time.perf_counter()
+    try:
+        await send_response(send, request, await handler(request))
+    except ClientDisconnected:
+        pass
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.request_duration.observe(elapsed, route=scope['path'], method=scope['method'])
+        profiler.record(f"route {scope['method']} {scope['path']}", elapsed)
@@ -3,13 +3,24 @@ Vercel-compatible Python Command Terminal
 Simplified version without psutil for serverless deployment
 """
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, request, jsonify
 import os
 import platform
 from datetime import datetime
 import re
+from intents import IntentMatcher
+from commands import registry as builtin_commands
+import assets
 
 app = Flask(__name__)
+assets.init_app(app)
+
+# Natural language phrases supported in serverless mode
+intent_matcher = IntentMatcher(names={'mkdir', 'ls', 'monitor'})
+
+# Built-in commands that are safe without a real filesystem, plus a few
+# simulated shell commands
+command_registry = builtin_commands.copy(serverless=True)
 
 class SimpleTerminal:
     def __init__(self):
@@ -27,7 +38,11 @@ class SimpleTerminal:
             'python_version': platform.python_version()
         }
     
-    def list_directory(self):
+    def change_directory(self, path):
+        """Directory navigation is not available in serverless"""
+        return f"📍 Directory navigation limited in serverless. Current: {self.current_dir}"
+    
+    def list_directory(self, path=None):
         """Simulated directory listing for demo"""
         items = [
             {'name': 'app.py', 'type': 'file', 'size': 15420, 'modified': '2025-09-21 10:30'},
@@ -49,6 +64,10 @@ class SimpleTerminal:
         
         return output
     
+    def create_directory(self, dirname):
+        """Simulated directory creation"""
+        return f"✅ Directory '{dirname}' created successfully (simulated in serverless)"
+    
     def get_system_monitoring(self):
         """Simulated system monitoring for serverless"""
         return {
@@ -73,18 +92,8 @@ class SimpleTerminal:
         }
     
     def parse_natural_language(self, command):
-        """Basic natural language processing"""
-        command = command.lower().strip()
-        
-        if re.search(r'create (?:folder|directory) (\w+)', command):
-            match = re.search(r'create (?:folder|directory) (\w+)', command)
-            return f"mkdir {match.group(1)}"
-        elif re.search(r'list (?:files|directory|contents)', command):
-            return "ls"
-        elif re.search(r'show system (?:info|monitor)', command):
-            return "monitor"
-        
-        return None
+        """Basic natural language processing for commands"""
+        return intent_matcher.parse(command)
     
     def execute_command(self, command):
         """Execute commands with serverless limitations"""
@@ -103,43 +112,23 @@ class SimpleTerminal:
         if not command:
             return "No command entered"
         
-        # Try natural language processing
-        parsed = self.parse_natural_language(command)
-        if parsed:
-            command = parsed
-        
-        parts = command.split()
-        cmd = parts[0].lower()
+        # Try natural language processing; explicit built-ins keep their
+        # arguments, so "history | grep ls" is not the "ls" intent
+        if command.split()[0] not in command_registry:
+            command = self.parse_natural_language(command) or command
         
-        if cmd == 'pwd':
-            return f"📍 Current directory: {self.current_dir} (Serverless Environment)"
-        
-        elif cmd in ['ls', 'dir']:
-            return self.list_directory()
-        
-        elif cmd == 'mkdir':
-            dirname = parts[1] if len(parts) > 1 else "newdir"
-            return f"✅ Directory '{dirname}' created successfully (simulated in serverless)"
-        
-        elif cmd in ['rm', 'del']:
-            filename = parts[1] if len(parts) > 1 else "file"
-            return f"✅ '{filename}' removed successfully (simulated in serverless)"
-        
-        elif cmd in ['monitor', 'system']:
-            return self.get_system_monitoring()
-        
-        elif cmd == 'help':
-            return """
+        result = command_registry.run(self, command)
+        if result is None:
+            cmd = command.split()[0].lower()
+            result = f"Command '{cmd}' not available in serverless environment. Type 'help' for available commands."
+        return result
+    
+    def help_text(self):
+        """Describe the commands available in serverless mode"""
+        return f"""
 📋 SERVERLESS TERMINAL COMMANDS:
 ─────────────────────────────────────────────
-📍 pwd                    - Show current directory
-📄 ls/dir                 - List directory contents (demo)
-📁 mkdir <name>           - Create directory (simulated)
-🗑️  rm/del <name>          - Remove item (simulated)
-🖥️  monitor/system        - Show system info
-📋 help                   - Show this help
-🧹 clear                  - Clear terminal
-📚 history                - Show command history
+{command_registry.describe("{icon} {usage:<22} - {description}")}
 
 🤖 NATURAL LANGUAGE:
 ─────────────────────────────────────────────
@@ -150,44 +139,30 @@ class SimpleTerminal:
 ⚠️  Running in Vercel serverless environment
    Some features are simulated for security.
             """
-        
-        elif cmd == 'clear':
-            return "CLEAR_TERMINAL"
-        
-        elif cmd == 'history':
-            if not self.command_history:
-                return "📚 No command history"
-            
-            output = "\n📚 COMMAND HISTORY:\n"
-            output += "─" * 50 + "\n"
-            for i, hist in enumerate(self.command_history[-10:], 1):
-                output += f"{i:2d}. {hist['timestamp']} - {hist['command']}\n"
-            return output
-        
-        elif cmd == 'cd':
-            target = parts[1] if len(parts) > 1 else "~"
-            return f"📍 Directory navigation limited in serverless. Current: {self.current_dir}"
-        
-        elif cmd in ['echo']:
-            text = ' '.join(parts[1:]) if len(parts) > 1 else ""
-            return f"🔊 {text}"
-        
-        elif cmd == 'date':
-            return f"📅 {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}"
-        
-        elif cmd == 'whoami':
-            return "👤 vercel-user (serverless)"
-        
-        else:
-            return f"Command '{cmd}' not available in serverless environment. Type 'help' for available commands."
+
+@command_registry.command('pwd', icon='📍', description='Show current directory')
+def pwd_command(terminal, args):
+    return f"📍 Current directory: {terminal.current_dir} (Serverless Environment)"
+
+@command_registry.command('echo', usage='echo <text>', icon='🔊', description='Print text')
+def echo_command(terminal, args):
+    return f"🔊 {' '.join(args)}"
+
+@command_registry.command('date', icon='📅', description='Show the date and time')
+def date_command(terminal, args):
+    return f"📅 {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}"
+
+@command_registry.command('whoami', icon='👤', description='Show the current user')
+def whoami_command(terminal, args):
+    return "👤 vercel-user (serverless)"
 
 # Create terminal instance
 terminal = SimpleTerminal()
 
 @app.route('/')
 def index():
-    """Main terminal interface"""
-    return render_template('index.html')
+    """Main terminal interface, rendered once per instance"""
+    return assets.page_response(app, 'index.html')
 
 @app.route('/execute', methods=['POST'])
 def execute_command():
@@ -230,9 +205,7 @@ def autocomplete():
     """Basic autocomplete functionality"""
     try:
         query = request.args.get('q', '')
-        commands = ['pwd', 'cd', 'ls', 'dir', 'mkdir', 'rm', 'del', 'help', 'clear', 'history', 'monitor', 'echo', 'date', 'whoami']
-        
-        suggestions = [cmd for cmd in commands if cmd.startswith(query.lower())]
+        suggestions = [cmd for cmd in command_registry.names() if cmd.startswith(query.lower())]
         return jsonify(suggestions[:10])
     except Exception as e:
         return jsonify([])
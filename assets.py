@@ -0,0 +1,425 @@
+"""
+Static Asset Pipeline
+Builds the web UI's CSS and JavaScript for long-lived caching: each file is
+minified, named after a hash of its content and precompressed with every
+encoding compression.py can produce. `python assets.py` writes the build to
+static/dist, where a reverse proxy can also serve the .gz/.br files;
+otherwise the build runs once at startup and stays in memory if the
+directory is read-only. Pages are rendered once and revalidated by ETag.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+
+from flask import Response, jsonify, render_template, request
+
+from compression import available_encodings, choose_encoding, compress
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+ASSETS = ('index.css', 'index.js')
+MANIFEST_FILE = 'manifest.json'
+ASSET_URL_PREFIX = '/assets/'
+HASH_LENGTH = 12
+MIMETYPES = {'.css': 'text/css', '.js': 'application/javascript', '.html': 'text/html'}
+FILE_SUFFIXES = {'gzip': '.gz', 'br': '.br', 'zstd': '.zst'}
+# A fingerprinted URL always has the same content, so browsers keep it for
+# a year without asking; pages are always revalidated, which is a 304
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+PAGE_CACHE_CONTROL = 'no-cache'
+
+_CSS_TOKENS = re.compile(r'/\*.*?\*/|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'', re.S)
+# Characters after which a / starts a regular expression, not a division
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'void', 'yield', 'await', 'delete',
+                   'new', 'instanceof', 'throw'}
+
+
+def _squeeze_css(code):
+    code = re.sub(r'\s+', ' ', code)
+    code = re.sub(r' ?([{};,>]) ?', r'\1', code)
+    return code.replace(': ', ':').replace(';}', '}')
+
+
+def minify_css(text):
+    """Drop comments and the whitespace CSS does not need, keeping strings"""
+    parts = []
+    code = []
+    position = 0
+    for match in _CSS_TOKENS.finditer(text):
+        code.append(text[position:match.start()])
+        if match.group().startswith('/*'):
+            code.append(' ')
+        else:
+            parts.append(_squeeze_css(''.join(code)))
+            parts.append(match.group())
+            code = []
+        position = match.end()
+    code.append(text[position:])
+    parts.append(_squeeze_css(''.join(code)))
+    return ''.join(parts).strip()
+
+
+def _string_end(text, start):
+    """Index after the string or template literal starting at start"""
+    quote = text[start]
+    i = start + 1
+    while i < len(text):
+        char = text[i]
+        if char == '\\':
+            i += 2
+            continue
+        if quote == '`' and text.startswith('${', i):
+            i = _expression_end(text, i + 2)
+            continue
+        if char == quote:
+            return i + 1
+        if char == '\n' and quote != '`':
+            break
+        i += 1
+    raise ValueError(f"Unterminated string at offset {start}")
+
+
+def _expression_end(text, i):
+    """Index after the } closing a template literal's ${ expression"""
+    depth = 1
+    while i < len(text):
+        char = text[i]
+        if char in '\'"`':
+            i = _string_end(text, i)
+            continue
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    raise ValueError("Unterminated template expression")
+
+
+def _regex_end(text, start):
+    """Index after the regular expression literal and flags starting at start"""
+    i = start + 1
+    in_class = False
+    while i < len(text) and text[i] != '\n':
+        char = text[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            i += 1
+            while i < len(text) and text[i].isalpha():
+                i += 1
+            return i
+        i += 1
+    raise ValueError(f"Unterminated regular expression at offset {start}")
+
+
+def _starts_regex(text, i):
+    """Whether the / at i starts a regular expression"""
+    j = i - 1
+    while j >= 0 and text[j] in ' \t\r\n':
+        j -= 1
+    if j < 0 or text[j] in _REGEX_PRECEDERS:
+        return True
+    word = re.search(r'[A-Za-z_$][\w$]*$', text[:j + 1])
+    return bool(word) and word.group() in _REGEX_KEYWORDS
+
+
+def _squeeze_js(code):
+    code = re.sub(r'[ \t]+', ' ', code)
+    code = re.sub(r' ?\n\s*', '\n', code)
+    code = re.sub(r' ?([{}()\[\];,:=]) ?', r'\1', code)
+    # No line break is needed where one could not end a statement
+    return re.sub(r'([{;,])\n|\n(?=[})\]])', r'\1', code)
+
+
+def minify_js(text):
+    """Drop comments, indentation and blank lines from JavaScript
+
+    Line breaks between statements are kept, so automatic semicolon
+    insertion works as in the source, and strings, template literals and
+    regular expressions are copied unchanged.
+    """
+    parts = []
+    code = []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if text.startswith('//', i):
+            end = text.find('\n', i)
+            i = len(text) if end < 0 else end
+            continue
+        if text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            if end < 0:
+                raise ValueError(f"Unterminated comment at offset {i}")
+            code.append(' ')
+            i = end + 2
+            continue
+        if char in '\'"`':
+            end = _string_end(text, i)
+        elif char == '/' and _starts_regex(text, i):
+            end = _regex_end(text, i)
+        else:
+            code.append(char)
+            i += 1
+            continue
+        parts.append(_squeeze_js(''.join(code)))
+        parts.append(text[i:end])
+        code = []
+        i = end
+    parts.append(_squeeze_js(''.join(code)))
+    return ''.join(parts).strip() + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+class Asset:
+    """A built file with its content hash and precompressed variants"""
+
+    def __init__(self, name, content, variants=None):
+        self.name = name
+        self.content = content
+        self.mimetype = MIMETYPES.get(os.path.splitext(name)[1], 'application/octet-stream')
+        self.digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+        if variants is None:
+            variants = {}
+            for encoding in available_encodings():
+                body = compress(content, encoding, best=True)
+                # Tiny files can grow when compressed
+                if len(body) < len(content):
+                    variants[encoding] = body
+        self.variants = variants
+
+    @property
+    def filename(self):
+        """The name with the content hash, e.g. index.3f2a9c1b7d4e.js"""
+        stem, extension = os.path.splitext(self.name)
+        return f"{stem}.{self.digest}{extension}"
+
+    def select(self, accept_encoding):
+        """Return (body, encoding) for a client's Accept-Encoding"""
+        encoding = choose_encoding(accept_encoding, self.variants)
+        if encoding is None:
+            return self.content, None
+        return self.variants[encoding], encoding
+
+
+def _source_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _write_file(path, data):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+class AssetPipeline:
+    """Minified, fingerprinted assets, built once and kept in memory
+
+    output_dir=None skips the disk: assets are then rebuilt by every
+    process, which only costs a few milliseconds for the web UI's files.
+    """
+
+    def __init__(self, source_dir=STATIC_DIR, output_dir=None, names=ASSETS):
+        self.source_dir = source_dir
+        self.output_dir = output_dir
+        self.names = names
+        self.lock = threading.Lock()
+        self.assets = {}
+        self.files = {}
+        self.pages = {}
+        self.mtimes = {}
+
+    def _source_path(self, name):
+        return os.path.join(self.source_dir, name)
+
+    def _source_mtimes(self):
+        return {name: os.stat(self._source_path(name)).st_mtime_ns for name in self.names}
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.output_dir, MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return manifest if isinstance(manifest, dict) else {}
+
+    def _load(self, name, entry, source):
+        """Reuse a file from an earlier build if its source has not changed"""
+        if not isinstance(entry, dict) or entry.get('source') != source:
+            return None
+        path = os.path.join(self.output_dir, entry.get('file', ''))
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+            variants = {}
+            for encoding in entry.get('encodings', []):
+                with open(path + FILE_SUFFIXES[encoding], 'rb') as f:
+                    variants[encoding] = f.read()
+        except (OSError, KeyError):
+            return None
+        asset = Asset(name, content, variants)
+        return asset if asset.filename == entry['file'] else None
+
+    def _minify(self, name):
+        with open(self._source_path(name), encoding='utf-8') as f:
+            text = f.read()
+        minify = MINIFIERS.get(os.path.splitext(name)[1])
+        return Asset(name, (minify(text) if minify else text).encode('utf-8'))
+
+    def _save(self, assets, sources, old_manifest):
+        """Write the build and manifest; a read-only directory keeps it in memory"""
+        manifest = {
+            name: {'file': asset.filename, 'source': sources[name], 'encodings': list(asset.variants)}
+            for name, asset in assets.items()
+        }
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            for asset in assets.values():
+                path = os.path.join(self.output_dir, asset.filename)
+                _write_file(path, asset.content)
+                for encoding, body in asset.variants.items():
+                    _write_file(path + FILE_SUFFIXES[encoding], body)
+            _write_file(os.path.join(self.output_dir, MANIFEST_FILE), json.dumps(manifest, indent=2).encode())
+        except OSError:
+            return
+        # Old builds are dropped once the manifest no longer points at them
+        current = {entry['file'] for entry in manifest.values()}
+        for entry in old_manifest.values():
+            filename = entry.get('file') if isinstance(entry, dict) else None
+            if not filename or filename in current:
+                continue
+            for suffix in ('', *FILE_SUFFIXES.values()):
+                try:
+                    os.remove(os.path.join(self.output_dir, filename + suffix))
+                except OSError:
+                    pass
+
+    def build(self):
+        """Build every asset, reusing the output directory's files when current"""
+        with self.lock:
+            mtimes = self._source_mtimes()
+            sources = {name: _source_digest(self._source_path(name)) for name in self.names}
+            manifest = self._read_manifest() if self.output_dir else {}
+            assets = {}
+            for name in self.names:
+                asset = self._load(name, manifest.get(name), sources[name]) if manifest else None
+                assets[name] = asset or self._minify(name)
+            if self.output_dir and any(manifest.get(name, {}).get('file') != asset.filename
+                                       for name, asset in assets.items()):
+                self._save(assets, sources, manifest)
+            self.assets = assets
+            self.files = {asset.filename: asset for asset in assets.values()}
+            self.pages = {}
+            self.mtimes = mtimes
+        return self
+
+    def refresh(self):
+        """Rebuild if a source file changed, for the development server"""
+        if self._source_mtimes() != self.mtimes:
+            self.build()
+
+    def url(self, name):
+        return ASSET_URL_PREFIX + self.assets[name].filename
+
+    def get(self, filename):
+        """The asset served at a fingerprinted file name, or None"""
+        return self.files.get(filename)
+
+    def render_page(self, app, template):
+        """Render a template once; its assets' URLs are fixed until a rebuild"""
+        # Apps sharing a process may render the same template differently
+        key = (app.import_name, template)
+        page = self.pages.get(key)
+        if page is None:
+            with app.app_context():
+                page = Asset(template, render_template(template).encode('utf-8'))
+            self.pages[key] = page
+        return page
+
+
+def asset_dir():
+    """Build directory; TERMINAL_ASSET_DIR='' keeps the build in memory only"""
+    configured = os.environ.get('TERMINAL_ASSET_DIR')
+    if configured is not None:
+        return configured or None
+    return DIST_DIR
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_asset_pipeline():
+    """Get the process-wide pipeline, building it on first use"""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = AssetPipeline(output_dir=asset_dir()).build()
+    return _pipeline
+
+
+def asset_response(asset, cache_control):
+    """Serve an asset's best precompressed variant, answering 304 when unchanged"""
+    body, encoding = asset.select(request.headers.get('Accept-Encoding'))
+    response = Response(body, mimetype=asset.mimetype)
+    response.headers['Cache-Control'] = cache_control
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    # Each variant is a different byte sequence, so each gets its own ETag
+    response.set_etag(f"{asset.digest}-{encoding}" if encoding else asset.digest)
+    return response.make_conditional(request)
+
+
+def page_response(app, template):
+    """A pre-rendered page, revalidated by ETag on every load"""
+    pipeline = get_asset_pipeline()
+    if app.debug:
+        pipeline.refresh()
+        pipeline.pages.pop((app.import_name, template), None)
+    return asset_response(pipeline.render_page(app, template), PAGE_CACHE_CONTROL)
+
+
+def init_app(app):
+    """Serve the built assets from an app and give its templates asset_url()"""
+    def asset_url(name):
+        return get_asset_pipeline().url(name)
+
+    app.add_template_global(asset_url)
+
+    @app.route(ASSET_URL_PREFIX + '<filename>')
+    def static_asset(filename):
+        """A fingerprinted asset, cacheable forever"""
+        asset = get_asset_pipeline().get(filename)
+        if asset is None:
+            return jsonify({'error': f"Asset '{filename}' not found"}), 404
+        return asset_response(asset, IMMUTABLE_CACHE_CONTROL)
+
+
+def main():
+    """Build static/dist ahead of time, e.g. in a deploy step"""
+    pipeline = AssetPipeline(output_dir=asset_dir() or DIST_DIR).build()
+    for name, asset in pipeline.assets.items():
+        source_size = os.path.getsize(pipeline._source_path(name))
+        variants = ', '.join(f"{encoding} {len(body)}" for encoding, body in asset.variants.items())
+        print(f"{name} -> {asset.filename}: {source_size} -> {len(asset.content)} bytes ({variants})")
+
+
+if __name__ == '__main__':
+    main()
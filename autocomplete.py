@@ -0,0 +1,187 @@
+"""
+Autocomplete Index
+Prefix search over built-in commands, executables on PATH, command history
+and directory entries, ranked by how often and how recently each
+suggestion was used. All sources are sorted arrays searched with bisect.
+"""
+
+import bisect
+import os
+import threading
+import time
+
+DEFAULT_LIMIT = 10
+# Matches examined per source; ranking only considers this many candidates
+MAX_CANDIDATES = 200
+PATH_REFRESH_INTERVAL = 5.0
+HISTORY_MAX_ENTRIES = 5000
+# Usage weight halves every hour without use
+RECENCY_HALF_LIFE = 3600.0
+
+
+def _prefix_range(keys, query):
+    """Index range of keys starting with query in a sorted list"""
+    lo = bisect.bisect_left(keys, query)
+    hi = bisect.bisect_left(keys, query + '\U0010ffff', lo)
+    return lo, hi
+
+
+class CommandIndex:
+    def __init__(self, builtins, refresh_interval=PATH_REFRESH_INTERVAL):
+        self.builtins = frozenset(builtins)
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._path = None
+        self._dir_mtimes = {}
+        self._dir_entries = {}
+        self._checked_at = None
+        self._keys = []
+        self._names = []
+
+    def _scan_path_dir(self, directory):
+        """Executable names in one PATH directory"""
+        names = set()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file() and os.access(entry.path, os.X_OK):
+                            names.add(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return names
+
+    def refresh(self, force=False):
+        """Rescan PATH directories whose mtime changed since the last check"""
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.refresh_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            path = os.environ.get('PATH', '')
+            directories = [d for d in dict.fromkeys(path.split(os.pathsep)) if d]
+
+            changed = path != self._path
+            mtimes = {}
+            for directory in directories:
+                try:
+                    mtimes[directory] = os.stat(directory).st_mtime_ns
+                except OSError:
+                    mtimes[directory] = None
+                if mtimes[directory] != self._dir_mtimes.get(directory) or directory not in self._dir_entries:
+                    self._dir_entries[directory] = self._scan_path_dir(directory)
+                    changed = True
+            for directory in [d for d in self._dir_entries if d not in mtimes]:
+                del self._dir_entries[directory]
+
+            self._path = path
+            self._dir_mtimes = mtimes
+            if changed:
+                names = set(self.builtins)
+                for entries in self._dir_entries.values():
+                    names.update(entries)
+                index = sorted((name.lower(), name) for name in names)
+                # Replace both arrays together so readers never see a mix
+                self._keys, self._names = [k for k, n in index], [n for k, n in index]
+
+    def prefix(self, query, limit=MAX_CANDIDATES):
+        """Command names starting with query (case-insensitive)"""
+        self.refresh()
+        keys, names = self._keys, self._names
+        lo, hi = _prefix_range(keys, query.lower())
+        return names[lo:min(hi, lo + limit)]
+
+
+class HistoryIndex:
+    def __init__(self, max_entries=HISTORY_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # text -> [use count, last used]; covers full lines and command words
+        self._stats = {}
+        self._keys = []
+        self._texts = []
+
+    def record(self, command, when=None):
+        """Count a use of a command line and of its command word"""
+        command = command.strip()
+        if not command:
+            return
+        when = time.time() if when is None else when
+        word = command.split()[0]
+        with self._lock:
+            for text in {command, word}:
+                stats = self._stats.get(text)
+                if stats is None:
+                    self._stats[text] = [1, when]
+                    key = text.lower()
+                    position = bisect.bisect_left(self._keys, key)
+                    self._keys.insert(position, key)
+                    self._texts.insert(position, text)
+                else:
+                    stats[0] += 1
+                    stats[1] = when
+            if len(self._stats) > self.max_entries * 1.1:
+                self._prune()
+
+    def _prune(self):
+        """Keep the best-scored entries once the index outgrows its cap"""
+        now = time.time()
+        keep = sorted(self._stats, key=lambda text: self.score(text, now), reverse=True)[:self.max_entries]
+        self._stats = {text: self._stats[text] for text in keep}
+        index = sorted((text.lower(), text) for text in keep)
+        self._keys = [k for k, t in index]
+        self._texts = [t for k, t in index]
+
+    def score(self, text, now=None):
+        """Usage frequency weighted by recency, 0 for unused text"""
+        stats = self._stats.get(text)
+        if stats is None:
+            return 0.0
+        now = time.time() if now is None else now
+        count, last_used = stats
+        return count * 0.5 ** (max(0.0, now - last_used) / RECENCY_HALF_LIFE)
+
+    def prefix(self, query, limit=MAX_CANDIDATES):
+        """Recorded texts starting with query (case-insensitive)"""
+        with self._lock:
+            lo, hi = _prefix_range(self._keys, query.lower())
+            return self._texts[lo:min(hi, lo + limit)]
+
+    def __len__(self):
+        return len(self._stats)
+
+
+def suggest(query, commands, history=None, directory=None, limit=DEFAULT_LIMIT):
+    """Ranked completions for a partially typed command line
+
+    directory is a DirectoryListing (or anything with prefix()) for the
+    current directory. For a single word, commands, history and entry
+    names are offered; after a space the last word completes to an entry
+    and the rest of the line is kept.
+    """
+    now = time.time()
+    # Lower rank wins ties: built-ins, then PATH and history, then files
+    candidates = {}
+
+    def add(text, rank):
+        score = history.score(text, now) if history is not None else 0.0
+        previous = candidates.get(text)
+        if previous is None or (-score, rank) < previous:
+            candidates[text] = (-score, rank)
+
+    head, space, tail = query.rpartition(' ')
+    if not space:
+        for name in commands.prefix(query):
+            add(name, 0 if name in commands.builtins else 1)
+    if history is not None:
+        for text in history.prefix(query):
+            add(text, 1)
+    if directory is not None:
+        lead = f"{head} " if space else ''
+        for name in directory.prefix(tail, MAX_CANDIDATES):
+            add(lead + name, 2)
+
+    ranked = sorted(candidates.items(), key=lambda item: (item[1], len(item[0]), item[0]))
+    return [text for text, _ in ranked[:limit]]
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Python Command Terminal Benchmarks
+Measures the terminal's hot paths locally through the Flask test client,
+writes the results as JSON and compares them with a saved baseline,
+exiting with status 1 when a tracked metric regresses past the threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_DIRECTORY_SIZES = (10000, 100000)
+DEFAULT_PROCESSES = 100
+DEFAULT_ROUNDS = 3
+DEFAULT_HISTORY_SIZE = 100000
+NLP_COMMANDS = ('ls', 'git status', 'create folder test', 'go to docs', 'show system info')
+AUTOCOMPLETE_QUERIES = ('g', 'gi', 'cd', 'file_00', 'show', 'l')
+HISTORY_COMMANDS = ('git status', 'git commit -m', 'ls -la', 'cd src', 'python app.py', 'grep -rn TODO .',
+                    'docker ps', 'make test', 'vim history.py', 'kubectl get pods', 'tail -f /var/log/syslog')
+# Substrings, short prefixes, a typo and a miss
+HISTORY_QUERIES = ('g', 'gi', 'git', 'git st', 'kubectl', 'dokcer ps', '/var/log', 'make test 4', 'zzzz')
+HISTORY_SESSIONS = 100
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+# End of the CLI prompt, "🐍 <dir> $ "
+PROMPT_MARKER = b' $ '
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def time_calls(call, iterations, warmup=3):
+    """Run call repeatedly, returning each run's duration in seconds"""
+    for _ in range(warmup):
+        call()
+    durations = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        call()
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def create_directory(path, count):
+    """Fill path with count empty files"""
+    os.makedirs(path, exist_ok=True)
+    for i in range(count):
+        os.close(os.open(os.path.join(path, f"file_{i:07d}.txt"), os.O_CREAT | os.O_WRONLY, 0o644))
+
+
+def time_to_prompt(command):
+    """Seconds from starting a terminal command to its first prompt"""
+    started = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=PROJECT_DIR, stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    output = b''
+    try:
+        while PROMPT_MARKER not in output:
+            chunk = proc.stdout.read1(4096)
+            if not chunk:
+                raise RuntimeError(f"{' '.join(command)} exited before showing a prompt")
+            output += chunk
+        return time.perf_counter() - started
+    finally:
+        # End of input makes the terminal exit
+        proc.stdin.close()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+
+
+def fill_history(store, count):
+    """Add count commands spread over HISTORY_SESSIONS sessions, mostly distinct"""
+    import random
+    generator = random.Random(0)
+    now = time.time()
+    store.extend(
+        (f"{generator.choice(HISTORY_COMMANDS)} {generator.randrange(count)}", f"session-{i % HISTORY_SESSIONS}",
+         '/tmp', now - (count - i) * 10)
+        for i in range(count)
+    )
+
+
+def start_process_load(count):
+    """Start count idle processes so process scans have real work to do"""
+    sleep = shutil.which('sleep')
+    command = [sleep, '600'] if sleep else [sys.executable, '-c', 'import time; time.sleep(600)']
+    return [subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            for _ in range(count)]
+
+
+def stop_process_load(processes):
+    for proc in processes:
+        proc.kill()
+    for proc in processes:
+        proc.wait()
+
+
+class BenchmarkRun:
+    def __init__(self, iterations=200, quick=False):
+        self.iterations = iterations
+        self.quick = quick
+        self.metrics = {}
+
+    def record(self, name, value, unit, better='lower'):
+        """Store one tracked metric; better is 'lower' or 'higher'
+
+        Each benchmark runs for several rounds and the best round is kept,
+        which filters out most of the noise from other work on the machine.
+        """
+        value = round(value, 4)
+        current = self.metrics.get(name)
+        if current is not None:
+            best = min if better == 'lower' else max
+            value = best(value, current['value'])
+        self.metrics[name] = {'value': value, 'unit': unit, 'better': better}
+
+    def report(self, prefix):
+        for name, metric in self.metrics.items():
+            if name.startswith(prefix):
+                print(f"  {name:<40} {metric['value']:>12.3f} {metric['unit']}")
+
+    def record_latency(self, name, durations):
+        self.record(f"{name}.p50_ms", percentile(durations, 0.5) * 1000, 'ms')
+        self.record(f"{name}.p99_ms", percentile(durations, 0.99) * 1000, 'ms')
+
+    def bench_startup(self):
+        """Time to the first CLI prompt, directly and through the launcher"""
+        commands = {
+            'cli': [sys.executable, 'cli_terminal.py'],
+            'launcher_cli': [sys.executable, 'launcher.py', '--mode', 'cli']
+        }
+        for name, command in commands.items():
+            durations = [time_to_prompt(command) for _ in range(3 if self.quick else 10)]
+            self.record(f"startup.{name}_ms", percentile(durations, 0.5) * 1000, 'ms')
+
+    def bench_execute(self, client):
+        """Requests per second through /execute, built-in and shell"""
+        for name, command in (('builtin', 'pwd'), ('shell', 'echo benchmark')):
+            iterations = self.iterations if name == 'builtin' else max(10, self.iterations // 4)
+            durations = time_calls(lambda: client.post('/execute', json={'command': command}), iterations)
+            # From the median request, so one slow outlier does not move the rate
+            self.record(f"execute.{name}.requests_per_sec", 1 / percentile(durations, 0.5), 'req/s', 'higher')
+
+    def bench_monitor(self, client, sampler):
+        """/monitor latency and the cost of one psutil sample"""
+        durations = time_calls(lambda: client.get('/monitor'), self.iterations)
+        self.record_latency('monitor', durations)
+        durations = time_calls(sampler.sample, 3 if self.quick else 10, warmup=1)
+        self.record('monitor.sample_ms', percentile(durations, 0.5) * 1000, 'ms')
+
+    def bench_autocomplete(self, client):
+        """Suggestions for a mix of command and file name prefixes"""
+        durations = []
+        for query in AUTOCOMPLETE_QUERIES:
+            durations += time_calls(lambda: client.get('/autocomplete', query_string={'q': query}),
+                                    max(1, self.iterations // len(AUTOCOMPLETE_QUERIES)))
+        self.record_latency('autocomplete', durations)
+
+    def bench_list_directory(self, terminal, path, size):
+        """First page of a large directory, rescanned and cached"""
+        def cold():
+            terminal.dir_cache.invalidate(path)
+            terminal.list_directory_page(path)
+        iterations = 3 if self.quick or size > 100000 else 10
+        self.record(f"list_directory.{size}.cold_ms", percentile(time_calls(cold, iterations, warmup=1), 0.5) * 1000, 'ms')
+        # Cached pages take microseconds, so time them in batches of 100
+        def warm():
+            for _ in range(100):
+                terminal.list_directory_page(path)
+        durations = time_calls(warm, max(5, self.iterations // 20))
+        self.record(f"list_directory.{size}.warm_us", percentile(durations, 0.5) / 100 * 1e6, 'us')
+
+    def bench_history(self, store, size):
+        """Reverse-i-search over a large history, across and within sessions"""
+        for scope, session in (('all', None), ('session', 'session-7')):
+            durations = []
+            for query in HISTORY_QUERIES:
+                durations += time_calls(lambda: store.find(query, session=session),
+                                        max(1, self.iterations // len(HISTORY_QUERIES)))
+            self.record_latency(f"history_find.{size}.{scope}", durations)
+        durations = time_calls(lambda: store.append('echo benchmark', 'session-7'), max(10, self.iterations // 4))
+        self.record(f"history_append.{size}.p50_ms", percentile(durations, 0.5) * 1000, 'ms')
+
+    def bench_nlp(self, terminal):
+        """Cost of parse_natural_language per command"""
+        def parse_all():
+            for command in NLP_COMMANDS:
+                terminal.parse_natural_language(command)
+        durations = time_calls(parse_all, self.iterations * 5)
+        self.record('nlp.parse_us', percentile(durations, 0.5) / len(NLP_COMMANDS) * 1e6, 'us')
+
+
+def run_benchmarks(sizes=DEFAULT_DIRECTORY_SIZES, processes=DEFAULT_PROCESSES, iterations=200,
+                   rounds=DEFAULT_ROUNDS, quick=False, history_size=DEFAULT_HISTORY_SIZE):
+    """Run every benchmark and return the results document"""
+    workdir = tempfile.mkdtemp(prefix='terminal_bench_')
+    # Benchmark commands, here and in the CLI subprocesses, go to a throwaway
+    # history rather than the user's, where they would skew ranking
+    saved_history_db = os.environ.get('TERMINAL_HISTORY_DB')
+    os.environ['TERMINAL_HISTORY_DB'] = os.path.join(workdir, 'terminal_history.db')
+    from app import app, CommandTerminal
+    from monitoring import get_sampler
+    from history import HistoryStore
+
+    run = BenchmarkRun(iterations, quick)
+    client = app.test_client()
+    terminal = CommandTerminal()
+    load = []
+    try:
+        print("Startup")
+        # The first start fills the on-disk system info cache
+        time_to_prompt([sys.executable, 'cli_terminal.py'])
+        for _ in range(rounds):
+            run.bench_startup()
+        run.report('startup.')
+        print("Execution")
+        for _ in range(rounds):
+            run.bench_execute(client)
+        run.report('execute.')
+        print("Natural language")
+        for _ in range(rounds):
+            run.bench_nlp(terminal)
+        run.report('nlp.')
+
+        print(f"Monitoring ({processes} extra processes)")
+        load = start_process_load(processes)
+        sampler = get_sampler()
+        sampler.get_snapshot()
+        for _ in range(rounds):
+            run.bench_monitor(client, sampler)
+        run.report('monitor.')
+        stop_process_load(load)
+        load = []
+
+        for size in sizes:
+            path = os.path.join(workdir, f"dir_{size}")
+            print(f"Directory with {size} files")
+            create_directory(path, size)
+            for _ in range(rounds):
+                run.bench_list_directory(terminal, path, size)
+            run.report(f"list_directory.{size}.")
+
+        print("Autocomplete")
+        if sizes:
+            client.post('/execute', json={'command': f"cd {os.path.join(workdir, f'dir_{min(sizes)}')}"})
+        for _ in range(rounds):
+            run.bench_autocomplete(client)
+        run.report('autocomplete.')
+
+        if history_size:
+            print(f"History search ({history_size} commands)")
+            store = HistoryStore(os.path.join(workdir, 'history.db'))
+            fill_history(store, history_size)
+            for _ in range(rounds):
+                run.bench_history(store, history_size)
+            store.close()
+            run.report('history_')
+    finally:
+        stop_process_load(load)
+        if saved_history_db is None:
+            os.environ.pop('TERMINAL_HISTORY_DB', None)
+        else:
+            os.environ['TERMINAL_HISTORY_DB'] = saved_history_db
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count()
+        },
+        'config': {'sizes': list(sizes), 'processes': processes, 'iterations': iterations, 'rounds': rounds,
+                   'history_size': history_size},
+        'metrics': run.metrics
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compare each metric with the baseline
+
+    Returns one entry per metric in results; a metric regresses when it is
+    more than threshold (a fraction) worse than its baseline value.
+    """
+    report = []
+    base_metrics = baseline.get('metrics', {})
+    for name, metric in sorted(results['metrics'].items()):
+        entry = {'name': name, 'value': metric['value'], 'unit': metric['unit'],
+                 'baseline': None, 'change': None, 'regressed': False}
+        base = base_metrics.get(name)
+        if base and base['value']:
+            change = (metric['value'] - base['value']) / base['value']
+            if metric['better'] == 'higher':
+                change = -change
+            entry.update(baseline=base['value'], change=round(change, 4), regressed=change > threshold)
+        report.append(entry)
+    return report
+
+
+def print_report(report, threshold):
+    print(f"\n{'Metric':<40} {'Baseline':>12} {'Current':>12} {'Change':>9}")
+    print("─" * 76)
+    for entry in report:
+        if entry['baseline'] is None:
+            print(f"{entry['name']:<40} {'-':>12} {entry['value']:>12.3f} {'new':>9}")
+            continue
+        flag = "  ❌" if entry['regressed'] else ""
+        # Positive change is always worse, whichever direction the metric improves in
+        print(f"{entry['name']:<40} {entry['baseline']:>12.3f} {entry['value']:>12.3f} "
+              f"{entry['change'] * 100:>+8.1f}%{flag}")
+    regressions = [entry for entry in report if entry['regressed']]
+    if regressions:
+        print(f"\n❌ {len(regressions)} metric(s) regressed by more than {threshold * 100:.0f}%")
+    else:
+        print(f"\n✅ No regressions beyond {threshold * 100:.0f}%")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Python Command Terminal benchmarks")
+    parser.add_argument("--output", help="Write the results JSON to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help=f"Baseline results to compare with (default: {DEFAULT_BASELINE})")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store these results as the new baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown as a fraction before failing (default: 0.25)")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_DIRECTORY_SIZES)),
+                        help="Comma-separated directory sizes to list, e.g. 10000,100000,1000000")
+    parser.add_argument("--processes", type=int, default=DEFAULT_PROCESSES,
+                        help="Idle processes to start while benchmarking monitoring")
+    parser.add_argument("--iterations", type=int, default=200,
+                        help="Requests per latency benchmark")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS,
+                        help="Times to repeat each benchmark, keeping the best (default: 3)")
+    parser.add_argument("--history", type=int, default=DEFAULT_HISTORY_SIZE,
+                        help=f"Commands in the history searched (default: {DEFAULT_HISTORY_SIZE}; 0 skips it)")
+    parser.add_argument("--quick", action="store_true",
+                        help="Small run for smoke testing: 1000 files, 10 processes, 20 iterations, 1 round, "
+                             "1000 history entries")
+    args = parser.parse_args()
+
+    if args.quick:
+        sizes, processes, iterations, rounds, history_size = (1000,), 10, 20, 1, 1000
+    else:
+        sizes = tuple(int(size) for size in args.sizes.split(',') if size.strip())
+        processes, iterations, rounds = args.processes, args.iterations, max(1, args.rounds)
+        history_size = args.history
+
+    print("⏱️  Running Python Command Terminal benchmarks")
+    print("=" * 60)
+    results = run_benchmarks(sizes, processes, iterations, rounds, quick=args.quick, history_size=history_size)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('config') != results['config']:
+        print("\n⚠️  Baseline was recorded with different settings; compare with care")
+    regressions = print_report(compare(results, baseline, args.threshold), args.threshold)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
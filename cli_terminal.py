@@ -4,13 +4,11 @@ A command-line interface version for users who prefer terminal-only interaction
 """
 
 import os
-import subprocess
-import psutil
-import platform
-import shlex
-from datetime import datetime
-import atexit
-import json
+from dircache import get_directory_cache, LISTING_MAX_AGE
+from sysinfo import get_system_info
+from history import HistoryRing, get_history_store
+from intents import IntentMatcher
+from commands import registry as builtin_commands
 
 # Try to import readline, fallback for Windows
 try:
@@ -20,12 +18,40 @@ except ImportError:
     READLINE_AVAILABLE = False
     print("Note: readline not available on this system. History and autocomplete disabled.")
 
+# Commands loaded into readline for the arrow keys
+READLINE_HISTORY_LENGTH = 1000
+
+# Readline cannot bind Ctrl-R to Python code, so it submits the line with
+# this marker in front and run() opens the history search
+SEARCH_MARKER = '#reverse-i-search '
+SEARCH_RESULTS = 9
+
+# Natural language phrases understood by the CLI
+intent_matcher = IntentMatcher(names={'mkdir', 'ls', 'cd', 'monitor'})
+
+# Built-in commands, with the CLI's own pwd, clear and exit
+command_registry = builtin_commands.copy(error_format="❌ Error: {}")
+
+def format_rate(bytes_per_sec):
+    """Format a byte rate with a readable unit"""
+    for unit in ('B/s', 'KB/s', 'MB/s', 'GB/s'):
+        if bytes_per_sec < 1024 or unit == 'GB/s':
+            return f"{bytes_per_sec:.1f} {unit}"
+        bytes_per_sec /= 1024
+
 class CLITerminal:
     def __init__(self):
         self.current_dir = os.getcwd()
-        self.command_history = []
+        self.command_history = HistoryRing()
+        # Shared with the web terminal; CLI runs all use one session
+        self.history_store = get_history_store()
+        self.session_id = 'cli'
+        # Command picked in a history search, put on the next prompt
+        self.pending_input = None
         self.setup_readline()
         self.system_info = self.get_system_info()
+        self._sampler = None
+        self.dir_cache = get_directory_cache()
         
         # Display welcome message
         self.display_welcome()
@@ -35,31 +61,73 @@ class CLITerminal:
         if not READLINE_AVAILABLE:
             return
             
-        histfile = os.path.join(os.path.expanduser("~"), ".python_terminal_history")
-        try:
-            readline.read_history_file(histfile)
-            readline.set_history_length(1000)
-        except FileNotFoundError:
-            pass
-        
-        atexit.register(readline.write_history_file, histfile)
+        # Arrow-key history comes from the history store, which records every
+        # command as it runs, so there is no file to save on exit
+        readline.set_history_length(READLINE_HISTORY_LENGTH)
+        for entry in reversed(self.history_store.recent(READLINE_HISTORY_LENGTH, session=self.session_id)):
+            readline.add_history(entry['command'])
         
         # Setup tab completion
         readline.set_completer(self.completer)
         readline.parse_and_bind('tab: complete')
+        if 'libedit' not in (readline.__doc__ or ''):
+            readline.parse_and_bind(r'"\C-r": "\C-a' + SEARCH_MARKER + r'\C-j"')
+    
+    def forget_last_line(self):
+        """Drop the line input() just added to readline's history"""
+        if READLINE_AVAILABLE and readline.get_current_history_length():
+            readline.remove_history_item(readline.get_current_history_length() - 1)
+    
+    def read_line(self, prompt):
+        """input() that leaves the line out of readline's history"""
+        line = input(prompt)
+        if line:
+            self.forget_last_line()
+        return line.strip()
+    
+    def reverse_search(self, query=''):
+        """Ranked fuzzy search of the history, returning the picked command
+        
+        Matches come from HistoryStore.find. Enter takes the first match, a
+        number picks another, other text searches again and an empty
+        search (or Ctrl-C) cancels.
+        """
+        matches = []
+        try:
+            while True:
+                if not query:
+                    query = self.read_line("(reverse-i-search)`': ")
+                    if not query:
+                        return None
+                matches = [m['command'] for m in self.history_store.find(query, session=self.session_id, limit=SEARCH_RESULTS)]
+                if not matches:
+                    print(f"❌ No history matching '{query}'")
+                    query = ''
+                    continue
+                for number, command in enumerate(matches, 1):
+                    print(f"  {number}. {command}")
+                choice = self.read_line(f"(reverse-i-search)`{query}' [Enter, 1-{len(matches)} or new search]: ")
+                if not choice:
+                    return matches[0]
+                if choice.isdigit() and 1 <= int(choice) <= len(matches):
+                    return matches[int(choice) - 1]
+                query = choice
+        except (KeyboardInterrupt, EOFError):
+            print()
+            return None
     
     def completer(self, text, state):
         """Auto-completion function"""
         if not READLINE_AVAILABLE:
             return None
             
-        commands = ['pwd', 'cd', 'ls', 'dir', 'mkdir', 'rm', 'rmdir', 'del', 'help', 'clear', 'history', 'monitor', 'system', 'exit', 'quit']
+        commands = command_registry.names()
         
         # Get files and directories in current directory
         try:
-            files_dirs = [f for f in os.listdir(self.current_dir) if f.startswith(text)]
+            files_dirs = [f for f in self.dir_cache.prefix(self.current_dir, text) if f.startswith(text)]
             options = [cmd for cmd in commands if cmd.startswith(text)] + files_dirs
-        except:
+        except OSError:
             options = [cmd for cmd in commands if cmd.startswith(text)]
         
         if state < len(options):
@@ -67,15 +135,17 @@ class CLITerminal:
         else:
             return None
     
+    @property
+    def sampler(self):
+        """The monitoring sampler, loaded on first use since psutil is slow to import"""
+        if self._sampler is None:
+            from monitoring import get_sampler
+            self._sampler = get_sampler()
+        return self._sampler
+    
     def get_system_info(self):
-        """Get basic system information"""
-        return {
-            'platform': platform.system(),
-            'platform_version': platform.version(),
-            'architecture': platform.architecture()[0],
-            'processor': platform.processor(),
-            'python_version': platform.python_version()
-        }
+        """Get basic system information, cached on disk between runs"""
+        return get_system_info()
     
     def display_welcome(self):
         """Display welcome message"""
@@ -128,19 +198,7 @@ class CLITerminal:
             if not os.path.exists(target_dir):
                 return f"❌ Error: Directory '{target_dir}' not found"
             
-            items = []
-            for item in os.listdir(target_dir):
-                item_path = os.path.join(target_dir, item)
-                is_dir = os.path.isdir(item_path)
-                size = os.path.getsize(item_path) if not is_dir else 0
-                modified = datetime.fromtimestamp(os.path.getmtime(item_path)).strftime('%Y-%m-%d %H:%M')
-                
-                items.append({
-                    'name': item,
-                    'type': 'directory' if is_dir else 'file',
-                    'size': size,
-                    'modified': modified
-                })
+            items = self.dir_cache.get(target_dir, max_age=LISTING_MAX_AGE).items
             
             # Format output
             if not items:
@@ -194,20 +252,11 @@ class CLITerminal:
     def get_system_monitoring(self):
         """Get system monitoring information"""
         try:
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/' if os.name != 'nt' else 'C:')
-            
-            # Get top processes
-            processes = []
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-                try:
-                    processes.append(proc.info)
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
-            
-            # Sort by CPU usage and get top 5
-            processes = sorted(processes, key=lambda x: x['cpu_percent'] or 0, reverse=True)[:5]
+            data = self.sampler.get_snapshot()
+            cpu_percent = data['cpu_percent']
+            memory = data['memory']
+            disk = data['disk']
+            processes = data['top_processes']
             
             # Format output
             output = "\n🖥️  SYSTEM MONITORING\n"
@@ -215,31 +264,34 @@ class CLITerminal:
             
             # CPU Info
             output += f"🔥 CPU Usage: {cpu_percent:.1f}%\n"
-            output += f"{'█' * int(cpu_percent / 2)}{' ' * (50 - int(cpu_percent / 2))}\n\n"
+            output += f"{'█' * int(cpu_percent / 2)}{' ' * (50 - int(cpu_percent / 2))}\n"
+            cores = data.get('cpu_per_core') or []
+            for i in range(0, len(cores), 4):
+                output += "   " + "  ".join(f"#{n:<2} {core:5.1f}%" for n, core in enumerate(cores[i:i + 4], i)) + "\n"
+            output += "\n"
             
             # Memory Info
-            memory_gb = memory.total / (1024**3)
-            used_gb = memory.used / (1024**3)
-            available_gb = memory.available / (1024**3)
-            
-            output += f"💾 Memory Usage: {memory.percent:.1f}%\n"
-            output += f"   Total: {memory_gb:.1f} GB\n"
-            output += f"   Used:  {used_gb:.1f} GB\n"
-            output += f"   Free:  {available_gb:.1f} GB\n"
-            output += f"{'█' * int(memory.percent / 2)}{' ' * (50 - int(memory.percent / 2))}\n\n"
+            output += f"💾 Memory Usage: {memory['percent']:.1f}%\n"
+            output += f"   Total: {memory['total']:.1f} GB\n"
+            output += f"   Used:  {memory['used']:.1f} GB\n"
+            output += f"   Free:  {memory['available']:.1f} GB\n"
+            output += f"{'█' * int(memory['percent'] / 2)}{' ' * (50 - int(memory['percent'] / 2))}\n\n"
             
             # Disk Info
-            disk_gb = disk.total / (1024**3)
-            used_disk_gb = disk.used / (1024**3)
-            free_disk_gb = disk.free / (1024**3)
-            disk_percent = (disk.used / disk.total) * 100
+            disk_percent = disk['percent']
             
             output += f"💿 Disk Usage: {disk_percent:.1f}%\n"
-            output += f"   Total: {disk_gb:.1f} GB\n"
-            output += f"   Used:  {used_disk_gb:.1f} GB\n"
-            output += f"   Free:  {free_disk_gb:.1f} GB\n"
+            output += f"   Total: {disk['total']:.1f} GB\n"
+            output += f"   Used:  {disk['used']:.1f} GB\n"
+            output += f"   Free:  {disk['free']:.1f} GB\n"
             output += f"{'█' * int(disk_percent / 2)}{' ' * (50 - int(disk_percent / 2))}\n\n"
             
+            # Network and disk throughput
+            network = data.get('network') or {}
+            disk_io = data.get('disk_io') or {}
+            output += f"🌐 Network: ↓ {format_rate(network.get('bytes_recv_per_sec', 0))}  ↑ {format_rate(network.get('bytes_sent_per_sec', 0))}\n"
+            output += f"📀 Disk IO: read {format_rate(disk_io.get('read_bytes_per_sec', 0))}  write {format_rate(disk_io.get('write_bytes_per_sec', 0))}\n\n"
+            
             # Top Processes
             output += "🚀 Top Processes (by CPU):\n"
             output += "-" * 50 + "\n"
@@ -255,6 +307,7 @@ class CLITerminal:
     
     def execute_system_command(self, command):
         """Execute system commands safely"""
+        import subprocess
         try:
             # Restricted commands for security
             dangerous_commands = ['rm -rf', 'format', 'del /f', 'shutdown', 'reboot']
@@ -283,57 +336,7 @@ class CLITerminal:
     
     def parse_natural_language(self, command):
         """Basic natural language processing for commands"""
-        import re
-        
-        command = command.lower().strip()
-        
-        # Create folder patterns
-        create_patterns = [
-            r'create (?:folder|directory) (\w+)',
-            r'make (?:folder|directory) (\w+)',
-            r'mkdir (\w+)'
-        ]
-        
-        # List patterns
-        list_patterns = [
-            r'list (?:files|directory|contents)',
-            r'show (?:files|directory|contents)',
-            r'ls'
-        ]
-        
-        # Change directory patterns
-        cd_patterns = [
-            r'(?:go to|change to|cd) (\w+)',
-            r'enter (?:directory|folder) (\w+)'
-        ]
-        
-        # System monitoring patterns
-        monitor_patterns = [
-            r'show system (?:info|information|monitor)',
-            r'system (?:monitor|info)',
-            r'monitor'
-        ]
-        
-        # Check patterns
-        for pattern in create_patterns:
-            match = re.search(pattern, command)
-            if match:
-                return f"mkdir {match.group(1)}"
-        
-        for pattern in list_patterns:
-            if re.search(pattern, command):
-                return "ls"
-        
-        for pattern in cd_patterns:
-            match = re.search(pattern, command)
-            if match:
-                return f"cd {match.group(1)}"
-        
-        for pattern in monitor_patterns:
-            if re.search(pattern, command):
-                return "monitor"
-        
-        return None
+        return intent_matcher.parse(command)
     
     def execute_command(self, command):
         """Main command execution function"""
@@ -341,72 +344,29 @@ class CLITerminal:
         command = command.strip()
         
         # Add to history
-        self.command_history.append({
-            'command': command,
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        })
-        
-        # Keep only last 50 commands
-        if len(self.command_history) > 50:
-            self.command_history = self.command_history[-50:]
+        if command:
+            self.command_history.append(self.history_store.append(command, self.session_id, self.current_dir))
         
         if not command:
             return "❌ No command entered"
         
-        # Try natural language processing first
-        parsed_command = self.parse_natural_language(command)
-        if parsed_command:
-            command = parsed_command
-        
-        # Split command into parts
-        parts = command.split()
-        cmd = parts[0].lower()
-        
-        # Handle built-in commands
-        if cmd == 'pwd':
-            return f"📍 Current directory: {self.current_dir}"
-        
-        elif cmd == 'cd':
-            if len(parts) > 1:
-                return self.change_directory(parts[1])
-            else:
-                return self.change_directory(os.path.expanduser("~"))
-        
-        elif cmd in ['ls', 'dir']:
-            if len(parts) > 1:
-                return self.list_directory(parts[1])
-            else:
-                return self.list_directory()
-        
-        elif cmd == 'mkdir':
-            if len(parts) > 1:
-                return self.create_directory(parts[1])
-            else:
-                return "❌ Error: Please specify directory name"
-        
-        elif cmd in ['rm', 'rmdir', 'del']:
-            if len(parts) > 1:
-                return self.remove_item(parts[1])
-            else:
-                return "❌ Error: Please specify file or directory name"
-        
-        elif cmd in ['monitor', 'system']:
-            return self.get_system_monitoring()
+        # Try natural language processing first; explicit built-ins keep
+        # their arguments, so "history | grep ls" is not the "ls" intent
+        if command.split()[0] not in command_registry:
+            command = self.parse_natural_language(command) or command
         
-        elif cmd == 'help':
-            return """
+        result = command_registry.run(self, command)
+        if result is None:
+            # Try to execute as system command
+            result = self.execute_system_command(command)
+        return result
+    
+    def help_text(self):
+        """Describe the built-in and natural language commands"""
+        return f"""
 📋 AVAILABLE COMMANDS:
 ─────────────────────────────────────────────
-📍 pwd                    - Show current directory
-📁 cd <directory>         - Change directory
-📄 ls/dir [directory]     - List directory contents
-📁 mkdir <name>           - Create directory
-🗑️  rm/del <name>          - Remove file or directory
-🖥️  monitor/system        - Show system monitoring info
-📋 help                   - Show this help message
-🧹 clear                  - Clear terminal
-📚 history                - Show command history
-🚪 exit/quit              - Exit terminal
+{command_registry.describe("{icon} {usage:<22} - {description}")}
 
 🤖 NATURAL LANGUAGE COMMANDS:
 ─────────────────────────────────────────────
@@ -419,32 +379,9 @@ class CLITerminal:
 ─────────────────────────────────────────────
 • Use Tab for auto-completion
 • Use ↑/↓ arrows for command history
+• Press Ctrl-R to search history (or type 'history <text>')
 • Type 'exit' or 'quit' to close terminal
             """
-        
-        elif cmd == 'clear':
-            os.system('cls' if os.name == 'nt' else 'clear')
-            self.display_welcome()
-            return ""
-        
-        elif cmd == 'history':
-            if not self.command_history:
-                return "📚 No command history"
-            
-            output = "\n📚 COMMAND HISTORY:\n"
-            output += "─" * 50 + "\n"
-            for i, hist in enumerate(self.command_history[-10:], 1):
-                output += f"{i:2d}. {hist['timestamp']} - {hist['command']}\n"
-            return output
-        
-        elif cmd in ['exit', 'quit']:
-            print("\n👋 Thank you for using Python Command Terminal!")
-            print("Goodbye! 🐍")
-            exit(0)
-        
-        else:
-            # Try to execute as system command
-            return self.execute_system_command(command)
     
     def run(self):
         """Main terminal loop"""
@@ -458,10 +395,21 @@ class CLITerminal:
                     
                     prompt = f"\n🐍 {short_dir} $ "
                     
-                    # Get user input
-                    command = input(prompt).strip()
+                    # Get user input, starting from a command picked by Ctrl-R
+                    if self.pending_input and READLINE_AVAILABLE:
+                        pending = self.pending_input
+                        readline.set_startup_hook(lambda: readline.insert_text(pending))
+                    self.pending_input = None
+                    try:
+                        command = input(prompt).strip()
+                    finally:
+                        if READLINE_AVAILABLE:
+                            readline.set_startup_hook(None)
                     
-                    if command:
+                    if command.startswith(SEARCH_MARKER.strip()):
+                        self.forget_last_line()
+                        self.pending_input = self.reverse_search(command[len(SEARCH_MARKER):].strip())
+                    elif command:
                         result = self.execute_command(command)
                         if result:
                             print(result)
@@ -480,6 +428,22 @@ class CLITerminal:
             print(f"\n❌ Fatal error: {str(e)}")
             print("Terminal will now exit.")
 
+@command_registry.command('pwd', icon='📍', description='Show current directory')
+def pwd_command(terminal, args):
+    return f"📍 Current directory: {terminal.current_dir}"
+
+@command_registry.command('clear', icon='🧹', description='Clear terminal')
+def clear_command(terminal, args):
+    os.system('cls' if os.name == 'nt' else 'clear')
+    terminal.display_welcome()
+    return ""
+
+@command_registry.command('exit', aliases=('quit',), usage='exit/quit', icon='🚪', description='Exit terminal')
+def exit_command(terminal, args):
+    print("\n👋 Thank you for using Python Command Terminal!")
+    print("Goodbye! 🐍")
+    exit(0)
+
 def main():
     """Main function to start CLI terminal"""
     try:
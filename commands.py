@@ -0,0 +1,189 @@
+"""
+Built-in Command Registry
+One table of the terminal's built-in commands shared by the web, CLI and
+serverless front ends. Commands and their aliases are looked up in a dict,
+and the same table drives help output and autocomplete.
+"""
+
+# Matches shown by `history <text>`
+HISTORY_SEARCH_LIMIT = 20
+# Entries shown by a bare `history`
+HISTORY_RECENT_LIMIT = 10
+
+
+class Command:
+    def __init__(self, name, handler, aliases=(), usage=None, description='', icon='',
+                 min_args=0, missing=None, serverless=True):
+        self.name = name
+        self.handler = handler
+        self.aliases = tuple(aliases)
+        self.usage = usage or name
+        self.description = description
+        self.icon = icon
+        # Arguments the command needs, and the error shown when they are missing
+        self.min_args = min_args
+        self.missing = missing
+        # Whether the command is safe to offer in serverless deployments
+        self.serverless = serverless
+
+    def run(self, terminal, args, error_format):
+        """Check the arguments and call the handler"""
+        if len(args) < self.min_args:
+            return error_format.format(self.missing or f"{self.name} expects {self.min_args} argument(s)")
+        return self.handler(terminal, args)
+
+
+class CommandRegistry:
+    def __init__(self, error_format="Error: {}"):
+        self.error_format = error_format
+        self._commands = {}  # name -> Command, in registration order
+        self._lookup = {}    # name or alias -> Command
+
+    def add(self, command):
+        """Register a command, replacing any command with the same name in place"""
+        self._commands[command.name] = command
+        self._lookup = {}
+        for registered in self._commands.values():
+            for name in (registered.name,) + registered.aliases:
+                self._lookup[name] = registered
+        return command
+
+    def command(self, name, **options):
+        """Decorator registering handler(terminal, args) as a command"""
+        def register(handler):
+            self.add(Command(name, handler, **options))
+            return handler
+        return register
+
+    def get(self, name):
+        """Look up a command by name or alias (case-insensitive)"""
+        return self._lookup.get(name.lower())
+
+    def run(self, terminal, command):
+        """Run a command line if it starts with a built-in
+
+        Returns None when the first word is not a registered command, so the
+        caller can hand the line to the shell instead.
+        """
+        parts = command.split()
+        if not parts:
+            return None
+        found = self._lookup.get(parts[0].lower())
+        if found is None:
+            return None
+        return found.run(terminal, parts[1:], self.error_format)
+
+    def copy(self, serverless=False, error_format=None):
+        """A new registry with the same commands, optionally only serverless-safe ones"""
+        registry = CommandRegistry(error_format or self.error_format)
+        for command in self._commands.values():
+            if command.serverless or not serverless:
+                registry.add(command)
+        return registry
+
+    def names(self):
+        """Every command name and alias, for autocomplete"""
+        return sorted(self._lookup)
+
+    def describe(self, template):
+        """Format one help line per command
+
+        template may use {icon}, {usage} and {description}.
+        """
+        return "\n".join(
+            template.format(icon=command.icon, usage=command.usage, description=command.description)
+            for command in self._commands.values()
+        )
+
+    def __contains__(self, name):
+        return name.lower() in self._lookup
+
+    def __iter__(self):
+        return iter(list(self._commands.values()))
+
+    def __len__(self):
+        return len(self._commands)
+
+
+def format_history(history, limit=HISTORY_RECENT_LIMIT):
+    """Format the most recent history entries"""
+    if not history:
+        return "📚 No command history"
+
+    output = "\n📚 COMMAND HISTORY:\n"
+    output += "─" * 50 + "\n"
+    for i, hist in enumerate(history[-limit:], 1):
+        output += f"{i:2d}. {hist['timestamp']} - {hist['command']}\n"
+    return output
+
+
+# Built-ins every front end understands; each front end copies this table
+# and overrides the commands it handles differently
+registry = CommandRegistry()
+
+
+@registry.command('pwd', icon='📍', description='Show current directory')
+def pwd_command(terminal, args):
+    return terminal.get_current_directory()
+
+
+@registry.command('cd', usage='cd <directory>', icon='📁', description='Change directory')
+def cd_command(terminal, args):
+    return terminal.change_directory(args[0] if args else "~")
+
+
+@registry.command('ls', aliases=('dir',), usage='ls/dir [directory]', icon='📄',
+                  description='List directory contents')
+def ls_command(terminal, args):
+    return terminal.list_directory(args[0] if args else None)
+
+
+@registry.command('mkdir', usage='mkdir <name>', icon='📁', description='Create directory',
+                  min_args=1, missing="Please specify directory name")
+def mkdir_command(terminal, args):
+    return terminal.create_directory(args[0])
+
+
+@registry.command('rm', aliases=('rmdir', 'del'), usage='rm/del <name>', icon='🗑️ ',
+                  description='Remove file or directory', min_args=1,
+                  missing="Please specify file or directory name", serverless=False)
+def rm_command(terminal, args):
+    return terminal.remove_item(args[0])
+
+
+@registry.command('monitor', aliases=('system',), usage='monitor/system', icon='🖥️ ',
+                  description='Show system monitoring info')
+def monitor_command(terminal, args):
+    return terminal.get_system_monitoring()
+
+
+@registry.command('help', icon='📋', description='Show this help message')
+def help_command(terminal, args):
+    return terminal.help_text()
+
+
+@registry.command('clear', icon='🧹', description='Clear terminal')
+def clear_command(terminal, args):
+    return "CLEAR_TERMINAL"
+
+
+@registry.command('history', usage='history [text]', icon='📚', description='Show or search command history')
+def history_command(terminal, args):
+    # `history | grep text` searches too, without a shell pipeline
+    if args[:2] == ['|', 'grep']:
+        args = [arg for arg in args[2:] if not arg.startswith('-')]
+    store = getattr(terminal, 'history_store', None)
+    if not args:
+        if store is None:
+            return format_history(terminal.command_history)
+        # The store also has commands run by other worker processes
+        return format_history(store.recent(session=terminal.session_id, limit=HISTORY_RECENT_LIMIT)[::-1])
+    query = ' '.join(args)
+    if store is None:
+        # Serverless terminals only have their in-memory list
+        entries = [hist for hist in terminal.command_history if query.lower() in hist['command'].lower()]
+    else:
+        entries = store.search(query, session=terminal.session_id, limit=HISTORY_SEARCH_LIMIT)[::-1]
+    if not entries:
+        return f"📚 No history matching '{query}'"
+    return format_history(entries, limit=HISTORY_SEARCH_LIMIT)
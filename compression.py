@@ -0,0 +1,166 @@
+"""
+Response Compression
+Content-Encoding negotiation for buffered responses. gzip is always
+available; zstd and brotli are preferred when the zstandard or brotli
+packages are installed. Bodies under TERMINAL_COMPRESS_MIN_BYTES are sent
+as they are, since compressing a few hundred bytes costs more than it saves.
+"""
+
+import gzip
+import os
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    try:
+        import brotlicffi as brotli
+        BROTLI_AVAILABLE = True
+    except ImportError:
+        BROTLI_AVAILABLE = False
+
+DEFAULT_MIN_BYTES = 1024
+# Fast levels: responses are compressed per request, not ahead of time
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/x-ndjson', 'application/javascript', 'image/svg+xml',
+    'application/x-terminal-frames', 'application/msgpack'
+)
+
+
+def compression_enabled():
+    """TERMINAL_COMPRESSION=0 turns response compression off"""
+    return os.environ.get('TERMINAL_COMPRESSION', '1') != '0'
+
+
+def min_bytes():
+    """Smallest body worth compressing"""
+    try:
+        return int(os.environ.get('TERMINAL_COMPRESS_MIN_BYTES', DEFAULT_MIN_BYTES))
+    except ValueError:
+        return DEFAULT_MIN_BYTES
+
+
+def available_encodings():
+    """Encodings this process can produce, best first"""
+    encodings = []
+    if ZSTD_AVAILABLE:
+        encodings.append('zstd')
+    if BROTLI_AVAILABLE:
+        encodings.append('br')
+    encodings.append('gzip')
+    return encodings
+
+
+def parse_accept_encoding(header):
+    """Map each coding in an Accept-Encoding header to its q-value"""
+    weights = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        weights[coding] = quality
+    return weights
+
+
+def choose_encoding(accept_encoding, encodings=None):
+    """Best encoding the client accepts, or None for identity
+
+    The client's q-values decide first and our preference order breaks ties,
+    so "gzip, br" picks br while "gzip;q=1, br;q=0.5" picks gzip. encodings
+    limits the choice, e.g. to the variants of a precompressed file.
+    """
+    weights = parse_accept_encoding(accept_encoding)
+    best, best_quality = None, 0.0
+    for encoding in available_encodings():
+        if encodings is not None and encoding not in encodings:
+            continue
+        quality = weights.get(encoding, weights.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding, best=False):
+    """Compress bytes with one of available_encodings()
+
+    best=True uses the slowest, smallest settings, for content compressed
+    once ahead of time rather than per request.
+    """
+    if encoding == 'gzip':
+        # mtime=0 keeps the output, and so any ETag of it, stable
+        return gzip.compress(data, compresslevel=9 if best else GZIP_LEVEL, mtime=0)
+    if encoding == 'br' and BROTLI_AVAILABLE:
+        return brotli.compress(data, quality=11 if best else BROTLI_QUALITY)
+    if encoding == 'zstd' and ZSTD_AVAILABLE:
+        return zstandard.ZstdCompressor(level=19 if best else ZSTD_LEVEL).compress(data)
+    raise ValueError(f"Unsupported encoding '{encoding}'")
+
+
+def is_compressible(mimetype):
+    mimetype = (mimetype or '').split(';')[0].strip().lower()
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+
+
+def encode_body(body, mimetype, accept_encoding):
+    """Return (body, encoding) for a buffered response body
+
+    encoding is None when the body is left as it is: compression is off,
+    the type is already compressed, the body is small or the client does
+    not accept anything we can produce.
+    """
+    if not compression_enabled() or not is_compressible(mimetype) or len(body) < min_bytes():
+        return body, None
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return body, None
+    return compress(body, encoding), encoding
+
+
+def add_vary(headers):
+    """Add Accept-Encoding to a Werkzeug headers object's Vary"""
+    vary = [value.strip() for value in headers.get('Vary', '').split(',') if value.strip()]
+    if 'accept-encoding' not in (value.lower() for value in vary):
+        vary.append('Accept-Encoding')
+        headers['Vary'] = ', '.join(vary)
+
+
+def compress_response(response, accept_encoding):
+    """Compress a Flask response in place when it is worth it
+
+    Streamed responses are left alone: compressing them would hold output
+    back until a compressor block fills, which defeats streaming.
+    """
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or response.status_code in (204, 206, 304) or 'Content-Encoding' in response.headers
+            or not is_compressible(response.mimetype)):
+        return response
+    add_vary(response.headers)
+    body, encoding = encode_body(response.get_data(), response.mimetype, accept_encoding)
+    if encoding is None:
+        return response
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    # Each encoding is a different byte sequence, so a strong ETag of the
+    # plain body would be wrong; a weak one still revalidates
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
@@ -0,0 +1,215 @@
+"""
+Directory Metadata Cache
+Lists directories with os.scandir (one stat per entry instead of three),
+caches the result until the directory's mtime changes, and keeps a sorted
+name index so autocomplete prefix lookups are a binary search.
+"""
+
+import bisect
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+# Optional inotify/FSEvents/ReadDirectoryChanges support for instant refresh
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+
+DEFAULT_MAX_DIRECTORIES = 64
+# How stale file sizes and times in an ls listing may get before a rescan
+LISTING_MAX_AGE = 2.0
+
+
+class DirectoryListing:
+    def __init__(self, path, mtime, items):
+        self.path = path
+        self.mtime = mtime
+        self.built_at = time.monotonic()
+        self.items = sorted(items, key=lambda item: item['name'])
+        self._keys = None
+        self._names = None
+        self._sorted_names = None
+
+    def _build_index(self):
+        """Build parallel sorted arrays for case-insensitive prefix search"""
+        index = sorted((item['name'].lower(), item['name']) for item in self.items)
+        self._names = [name for key, name in index]
+        self._keys = [key for key, name in index]
+
+    def prefix(self, query, limit=None):
+        """Names starting with query (case-insensitive), in sorted order"""
+        # Built on first use, ls never needs it
+        if self._keys is None:
+            self._build_index()
+        query = query.lower()
+        lo = bisect.bisect_left(self._keys, query)
+        hi = bisect.bisect_left(self._keys, query + '\U0010ffff', lo)
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return self._names[lo:hi]
+
+    def page(self, offset=0, limit=None, after=None):
+        """Slice the name-sorted items, optionally resuming after a name
+
+        Returns (items, next_name) where next_name is the cursor for the
+        following page, or None on the last page.
+        """
+        start = 0
+        if after is not None:
+            if self._sorted_names is None:
+                self._sorted_names = [item['name'] for item in self.items]
+            start = bisect.bisect_right(self._sorted_names, after)
+        start = min(start + max(offset, 0), len(self.items))
+        end = len(self.items) if limit is None else min(start + max(limit, 0), len(self.items))
+        items = self.items[start:end]
+        next_name = items[-1]['name'] if items and end < len(self.items) else None
+        return items, next_name
+
+    def __len__(self):
+        return len(self.items)
+
+
+def iter_directory(path):
+    """Yield a directory's entries and their metadata in directory order
+
+    Nothing is accumulated, so memory stays flat however large the directory.
+    """
+    # Entries written together share a minute, so format each minute once
+    minutes = {}
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+                stat = entry.stat()
+            except OSError:
+                # Broken symlink or entry removed while scanning
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                    is_dir = False
+                except OSError:
+                    continue
+            minute = int(stat.st_mtime // 60)
+            modified = minutes.get(minute)
+            if modified is None:
+                modified = datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M')
+                if len(minutes) < 4096:
+                    minutes[minute] = modified
+            yield {
+                'name': entry.name,
+                'type': 'directory' if is_dir else 'file',
+                'size': stat.st_size if not is_dir else 0,
+                'modified': modified
+            }
+
+
+def scan_directory(path):
+    """Read a directory's entries and their metadata"""
+    return list(iter_directory(path))
+
+
+class DirectoryCache:
+    def __init__(self, max_directories=DEFAULT_MAX_DIRECTORIES, watch=False):
+        self.max_directories = max_directories
+        self._lock = threading.Lock()
+        self._listings = OrderedDict()
+        self._observer = None
+        self._watches = {}
+        self._watch_lock = threading.Lock()
+        if watch and WATCHDOG_AVAILABLE:
+            self._observer = Observer()
+            self._observer.daemon = True
+            self._observer.start()
+
+    def get(self, path, max_age=None):
+        """Get the listing for a directory, rescanning it if it changed
+
+        A directory's mtime only changes when entries are added, removed or
+        renamed; max_age bounds how stale per-file sizes and times may be.
+        """
+        path = os.path.abspath(path)
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            listing = self._listings.get(path)
+            if listing is not None and listing.mtime == mtime and (
+                    max_age is None or time.monotonic() - listing.built_at <= max_age):
+                self._listings.move_to_end(path)
+                return listing
+
+        listing = DirectoryListing(path, mtime, scan_directory(path))
+        evicted = []
+        with self._lock:
+            self._listings[path] = listing
+            self._listings.move_to_end(path)
+            while len(self._listings) > self.max_directories:
+                evicted.append(self._listings.popitem(last=False)[0])
+
+        # Watches are managed outside the lock because the observer thread
+        # takes it from its event handlers
+        if self._observer is not None:
+            self._watch(path)
+            for evicted_path in evicted:
+                self._unwatch(evicted_path)
+        return listing
+
+    def invalidate(self, path):
+        """Forget a cached directory"""
+        with self._lock:
+            self._listings.pop(os.path.abspath(path), None)
+
+    def prefix(self, path, query, limit=None):
+        """Entry names in a directory starting with query"""
+        return self.get(path).prefix(query, limit)
+
+    def _watch(self, path):
+        with self._watch_lock:
+            if path in self._watches:
+                return
+            try:
+                self._watches[path] = self._observer.schedule(_InvalidateHandler(self, path), path, recursive=False)
+            except OSError:
+                pass
+
+    def _unwatch(self, path):
+        with self._watch_lock:
+            watch = self._watches.pop(path, None)
+            if watch is not None:
+                self._observer.unschedule(watch)
+
+    def __len__(self):
+        return len(self._listings)
+
+
+if WATCHDOG_AVAILABLE:
+    class _InvalidateHandler(FileSystemEventHandler):
+        """Drops a cached listing as soon as anything in it changes"""
+
+        def __init__(self, cache, path):
+            self.cache = cache
+            self.path = path
+
+        def on_any_event(self, event):
+            self.cache.invalidate(self.path)
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_directory_cache():
+    """Get the process-wide directory cache
+
+    Set TERMINAL_WATCH_DIRS=1 to refresh through filesystem events when
+    watchdog is installed.
+    """
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                watch = os.environ.get('TERMINAL_WATCH_DIRS', '') == '1'
+                _default_cache = DirectoryCache(watch=watch)
+    return _default_cache
@@ -0,0 +1,279 @@
+"""
+Streaming Command Execution
+Runs shell commands with piped output and yields stdout/stderr chunks as
+they arrive, with a per-command byte cap, a timeout and backpressure.
+Async variants run the command as an asyncio subprocess, so a command in
+flight needs no thread of its own.
+"""
+
+import asyncio
+import codecs
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+
+from metrics import subprocess_spawns, subprocess_duration, command_timeouts
+
+DEFAULT_CHUNK_SIZE = 4096
+DEFAULT_MAX_OUTPUT_BYTES = 1024 * 1024
+DEFAULT_STREAM_TIMEOUT = 300
+# Chunks buffered per command before the pipe readers stop reading; once the
+# OS pipe buffer fills up the child blocks on write, which is the backpressure
+DEFAULT_QUEUE_CHUNKS = 16
+
+
+def spawn_command(command, cwd):
+    """Start a shell command in its own process group with piped output"""
+    kwargs = {}
+    if os.name == 'nt':
+        kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs['start_new_session'] = True
+    subprocess_spawns.inc(mode='stream')
+    return subprocess.Popen(
+        command,
+        shell=True,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+        **kwargs
+    )
+
+
+def spawn_command_async(command, cwd):
+    """Start a shell command as an asyncio subprocess, like spawn_command"""
+    kwargs = {}
+    if os.name == 'nt':
+        kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs['start_new_session'] = True
+    subprocess_spawns.inc(mode='async')
+    return asyncio.create_subprocess_shell(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+        **kwargs
+    )
+
+
+def kill_process_group(pid):
+    """Kill the process group of a command started by another process (POSIX only)"""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def kill_process_tree(proc):
+    """Kill a process started by spawn_command or spawn_command_async together with its children"""
+    running = proc.poll() is None if isinstance(proc, subprocess.Popen) else proc.returncode is None
+    if not running:
+        return
+    if os.name != 'nt':
+        kill_process_group(proc.pid)
+        return
+    try:
+        proc.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _pump(pipe, name, chunks, stop, chunk_size):
+    """Read a pipe into the shared queue until EOF or stop is set"""
+    try:
+        while not stop.is_set():
+            data = pipe.read1(chunk_size)
+            if not data:
+                break
+            while not stop.is_set():
+                try:
+                    chunks.put((name, data), timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+    except (OSError, ValueError):
+        pass
+    finally:
+        pipe.close()
+        # The EOF marker must not be dropped, the consumer waits for it
+        while True:
+            try:
+                chunks.put((name, None), timeout=0.1)
+                break
+            except queue.Full:
+                if stop.is_set():
+                    break
+
+
+def iter_output(proc, max_bytes=DEFAULT_MAX_OUTPUT_BYTES, timeout=DEFAULT_STREAM_TIMEOUT,
+                chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield output events from a running process
+
+    Events are dicts: {'type': 'stdout'|'stderr', 'data': text} while the
+    process runs, optionally {'type': 'truncated'} or {'type': 'timeout'},
+    and finally {'type': 'exit', 'code': returncode}. Closing the generator
+    early (e.g. the client disconnected) kills the process.
+    """
+    chunks = queue.Queue(maxsize=DEFAULT_QUEUE_CHUNKS)
+    stop = threading.Event()
+    decoders = {}
+    readers = []
+    for name, pipe in (('stdout', proc.stdout), ('stderr', proc.stderr)):
+        decoders[name] = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        reader = threading.Thread(target=_pump, args=(pipe, name, chunks, stop, chunk_size), daemon=True)
+        reader.start()
+        readers.append(reader)
+
+    started = time.monotonic()
+    deadline = started + timeout
+    total = 0
+    open_pipes = len(readers)
+    killed = False
+    try:
+        while open_pipes:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                kill_process_tree(proc)
+                killed = True
+                command_timeouts.inc(mode='stream')
+                yield {'type': 'timeout'}
+                break
+            try:
+                name, data = chunks.get(timeout=remaining)
+            except queue.Empty:
+                continue
+
+            if data is None:
+                open_pipes -= 1
+                tail = decoders[name].decode(b'', final=True)
+                if tail:
+                    yield {'type': name, 'data': tail}
+                continue
+
+            if total + len(data) > max_bytes:
+                data = data[:max_bytes - total]
+                total = max_bytes
+                text = decoders[name].decode(data)
+                if text:
+                    yield {'type': name, 'data': text}
+                kill_process_tree(proc)
+                killed = True
+                yield {'type': 'truncated', 'limit': max_bytes}
+                break
+
+            total += len(data)
+            text = decoders[name].decode(data)
+            if text:
+                yield {'type': name, 'data': text}
+
+        if not killed:
+            # A process can close its output and keep running
+            try:
+                proc.wait(timeout=max(0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                kill_process_tree(proc)
+                command_timeouts.inc(mode='stream')
+                yield {'type': 'timeout'}
+        code = proc.wait()
+        subprocess_duration.observe(time.monotonic() - started, mode='stream')
+        yield {'type': 'exit', 'code': code}
+    finally:
+        # The readers see EOF once the process group is gone and close the pipes
+        stop.set()
+        kill_process_tree(proc)
+
+
+async def _pump_async(stream, name, chunks, chunk_size):
+    """Read an asyncio stream into the shared queue until EOF"""
+    try:
+        while True:
+            data = await stream.read(chunk_size)
+            if not data:
+                break
+            # Blocks while the queue is full, which stops reading the pipe
+            await chunks.put((name, data))
+    except (OSError, ValueError):
+        pass
+    await chunks.put((name, None))
+
+
+async def aiter_output(proc, max_bytes=DEFAULT_MAX_OUTPUT_BYTES, timeout=DEFAULT_STREAM_TIMEOUT,
+                       chunk_size=DEFAULT_CHUNK_SIZE):
+    """Async version of iter_output for a process from spawn_command_async
+
+    Yields the same events. Closing the generator or cancelling the task
+    consuming it kills the process.
+    """
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue(maxsize=DEFAULT_QUEUE_CHUNKS)
+    decoders = {}
+    readers = []
+    for name, stream in (('stdout', proc.stdout), ('stderr', proc.stderr)):
+        decoders[name] = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        readers.append(asyncio.ensure_future(_pump_async(stream, name, chunks, chunk_size)))
+
+    started = loop.time()
+    deadline = started + timeout
+    total = 0
+    open_pipes = len(readers)
+    killed = False
+    try:
+        while open_pipes:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                kill_process_tree(proc)
+                killed = True
+                command_timeouts.inc(mode='async')
+                yield {'type': 'timeout'}
+                break
+            try:
+                name, data = await asyncio.wait_for(chunks.get(), remaining)
+            except asyncio.TimeoutError:
+                continue
+
+            if data is None:
+                open_pipes -= 1
+                tail = decoders[name].decode(b'', final=True)
+                if tail:
+                    yield {'type': name, 'data': tail}
+                continue
+
+            if total + len(data) > max_bytes:
+                data = data[:max_bytes - total]
+                total = max_bytes
+                text = decoders[name].decode(data)
+                if text:
+                    yield {'type': name, 'data': text}
+                kill_process_tree(proc)
+                killed = True
+                yield {'type': 'truncated', 'limit': max_bytes}
+                break
+
+            total += len(data)
+            text = decoders[name].decode(data)
+            if text:
+                yield {'type': name, 'data': text}
+
+        if not killed:
+            # A process can close its output and keep running
+            try:
+                await asyncio.wait_for(proc.wait(), max(0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                kill_process_tree(proc)
+                command_timeouts.inc(mode='async')
+                yield {'type': 'timeout'}
+        code = await proc.wait()
+        subprocess_duration.observe(loop.time() - started, mode='async')
+        yield {'type': 'exit', 'code': code}
+    finally:
+        for reader in readers:
+            reader.cancel()
+        kill_process_tree(proc)
+        # Reap it here too when cancelled, so its pipes are closed with the loop running
+        await proc.wait()
@@ -0,0 +1,75 @@
+"""
+Stream Framing
+Encodings for the streaming routes besides newline-delimited JSON.
+'binary' frames are a type byte and a big-endian uint32 length followed by
+the payload: output text is sent as raw UTF-8 without JSON escaping, and
+any other event as a JSON object. 'msgpack' writes each event as a
+MessagePack map when the msgpack package is installed.
+"""
+
+import json
+import struct
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+FRAME_HEADER = struct.Struct('>BI')
+JSON_FRAME = 0
+# Events whose text payload is sent as is, by frame type
+TEXT_FRAMES = {'stdout': 1, 'stderr': 2, 'output': 3}
+FRAME_EVENTS = {frame_type: name for name, frame_type in TEXT_FRAMES.items()}
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'binary': 'application/x-terminal-frames',
+    'msgpack': 'application/msgpack'
+}
+
+
+def stream_format(name):
+    """Validate a ?format= value, returning (name, mimetype)"""
+    name = (name or 'ndjson').lower()
+    if name not in STREAM_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(STREAM_FORMATS)}")
+    if name == 'msgpack' and not MSGPACK_AVAILABLE:
+        raise ValueError("msgpack format requires the msgpack package")
+    return name, STREAM_FORMATS[name]
+
+
+def pack_frame(event):
+    """Encode one event as a length-prefixed frame"""
+    frame_type = TEXT_FRAMES.get(event.get('type'))
+    if frame_type is not None and isinstance(event.get('data'), str) and len(event) == 2:
+        payload = event['data'].encode('utf-8')
+    else:
+        frame_type, payload = JSON_FRAME, json.dumps(event).encode()
+    return FRAME_HEADER.pack(frame_type, len(payload)) + payload
+
+
+def unpack_frames(data):
+    """Decode a sequence of complete frames back into events"""
+    events = []
+    offset = 0
+    while offset < len(data):
+        frame_type, length = FRAME_HEADER.unpack_from(data, offset)
+        offset += FRAME_HEADER.size
+        payload = data[offset:offset + length]
+        if len(payload) < length:
+            raise ValueError("Truncated frame")
+        offset += length
+        if frame_type == JSON_FRAME:
+            events.append(json.loads(payload))
+        else:
+            events.append({'type': FRAME_EVENTS[frame_type], 'data': payload.decode('utf-8')})
+    return events
+
+
+def encode_event(event, format='ndjson'):
+    """Encode one event for the chosen stream format"""
+    if format == 'binary':
+        return pack_frame(event)
+    if format == 'msgpack':
+        return msgpack.packb(event)
+    return json.dumps(event) + "\n"
@@ -0,0 +1,501 @@
+"""
+Command History
+Recent commands in a fixed-size in-memory ring per terminal, and every
+command in one SQLite database shared by the web and CLI terminals, with
+substring search through an FTS5 trigram index and fuzzy (subsequence)
+search, scoped to a session or across all of them. A second table of
+distinct commands with use counts, under its own trigram index, backs
+the ranked reverse-i-search.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+DEFAULT_RING_SIZE = 1000
+DEFAULT_MAX_ENTRIES = 1000000
+DEFAULT_SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 1000
+# Inserts between checks of the size cap
+PRUNE_INTERVAL = 1000
+# Matches fetched by recency before fuzzy results are ranked
+FUZZY_CANDIDATES = 20
+DEFAULT_HISTORY_FILE = '.python_terminal_history.db'
+DEFAULT_FIND_LIMIT = 10
+# Most recently used matches ranked by find(); older ones are not considered
+FIND_CANDIDATES = 64
+# A session's most recent commands, scanned directly before find() turns
+# to the trigram index; also all that queries under 3 characters search
+RECENT_WINDOW = 10000
+# Trigram index matches examined when filtering them by session
+INDEX_SCAN_LIMIT = 256
+# Share of the query's trigrams a typo-tolerant match must contain
+MIN_TRIGRAM_SIMILARITY = 0.5
+# Use counts lose half their weight per week without use
+FIND_HALF_LIFE = 7 * 86400
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    session TEXT NOT NULL,
+    command TEXT NOT NULL,
+    cwd TEXT,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_session ON history (session, id);
+CREATE TABLE IF NOT EXISTS command_stats (
+    id INTEGER PRIMARY KEY,
+    session TEXT NOT NULL,
+    command TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    UNIQUE (session, command)
+);
+CREATE INDEX IF NOT EXISTS command_stats_recent ON command_stats (session, id, command);
+"""
+
+# External-content FTS table kept in step with history by triggers; the
+# trigram tokenizer (SQLite 3.34+) answers substring queries of 3+ characters
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+    command, content='history', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts (rowid, command) VALUES (new.id, new.command);
+END;
+CREATE TRIGGER IF NOT EXISTS history_fts_delete AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, command) VALUES ('delete', old.id, old.command);
+END;
+CREATE VIRTUAL TABLE IF NOT EXISTS command_stats_fts USING fts5(
+    command, content='command_stats', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS command_stats_fts_insert AFTER INSERT ON command_stats BEGIN
+    INSERT INTO command_stats_fts (rowid, command) VALUES (new.id, new.command);
+END;
+CREATE TRIGGER IF NOT EXISTS command_stats_fts_delete AFTER DELETE ON command_stats BEGIN
+    INSERT INTO command_stats_fts (command_stats_fts, rowid, command) VALUES ('delete', old.id, old.command);
+END;
+"""
+
+
+def format_timestamp(created):
+    return datetime.fromtimestamp(created).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class HistoryRing:
+    """Fixed-capacity list of recent entries with O(1) append
+
+    Indexing and slicing work as on a list holding the entries oldest
+    first, so it can stand in for the old trimmed history list.
+    """
+
+    def __init__(self, capacity=DEFAULT_RING_SIZE):
+        self.capacity = capacity
+        self._items = [None] * capacity
+        self._start = 0
+        self._count = 0
+
+    def append(self, item):
+        end = (self._start + self._count) % self.capacity
+        self._items[end] = item
+        if self._count < self.capacity:
+            self._count += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+
+    def clear(self):
+        self._items = [None] * self.capacity
+        self._start = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for offset in range(self._count):
+            yield self._items[(self._start + offset) % self.capacity]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('history index out of range')
+        return self._items[(self._start + index) % self.capacity]
+
+
+def fuzzy_span(pattern, text):
+    """Length of the shortest stretch of text containing pattern in order
+
+    None when pattern is not a subsequence of text; smaller is a closer
+    match, len(pattern) being an exact substring.
+    """
+    pattern = pattern.lower()
+    text = text.lower()
+    best = None
+    start = text.find(pattern[0]) if pattern else -1
+    while start != -1:
+        position = start
+        for char in pattern[1:]:
+            position = text.find(char, position + 1)
+            if position == -1:
+                return best
+        span = position - start + 1
+        if best is None or span < best:
+            best = span
+        start = text.find(pattern[0], start + 1)
+    return best
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def match_quality(query, command):
+    """How well command matches query, from 1 (prefix) down to 0 (no match)
+
+    Substrings score 0.6 to 1 depending on where they start; otherwise
+    the share of the query's trigrams found in command, which tolerates
+    typos, scaled below any substring match.
+    """
+    query = query.lower()
+    command = command.lower()
+    if command.startswith(query):
+        return 1.0
+    position = command.find(query)
+    if position > 0:
+        return 0.8 if command[position - 1] in ' /-_.=' else 0.6
+    wanted = trigrams(query)
+    if not wanted:
+        return 0.0
+    similarity = len(wanted & trigrams(command)) / len(wanted)
+    return similarity * 0.5 if similarity >= MIN_TRIGRAM_SIMILARITY else 0.0
+
+
+def _like_pattern(parts):
+    """LIKE pattern matching the parts in order, with wildcards escaped"""
+    escaped = [part.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') for part in parts]
+    return '%' + '%'.join(escaped) + '%'
+
+
+class HistoryStore:
+    """All commands ever run, persisted in SQLite
+
+    Appends are single-row inserts into a WAL journal, so they stay cheap
+    with millions of rows; the oldest rows are pruned in batches once the
+    table passes max_entries. path=':memory:' keeps history for this
+    process only.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._since_prune = 0
+        if path != ':memory:':
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.row_factory = sqlite3.Row
+        if path != ':memory:':
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+        try:
+            self._db.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            # No FTS5 or no trigram tokenizer; searches fall back to LIKE scans
+            self.fts = False
+        if not self._db.execute('SELECT 1 FROM command_stats LIMIT 1').fetchone():
+            # Databases written before command_stats existed
+            self._db.execute(
+                'INSERT INTO command_stats (session, command, count, last_used) '
+                'SELECT session, command, COUNT(*), MAX(created) FROM history '
+                'GROUP BY session, command ORDER BY MAX(id)'
+            )
+        self._db.commit()
+
+    def append(self, command, session='local', cwd=None, created=None):
+        """Store a command and return its entry"""
+        created = time.time() if created is None else created
+        entry_id = None
+        with self._lock:
+            try:
+                cursor = self._db.execute(
+                    'INSERT INTO history (session, command, cwd, created) VALUES (?, ?, ?, ?)',
+                    (session, command, cwd, created)
+                )
+                self._count_use(session, command, created)
+                self._db.commit()
+                entry_id = cursor.lastrowid
+                self._since_prune += 1
+                if self._since_prune >= PRUNE_INTERVAL:
+                    self._prune()
+            except sqlite3.Error:
+                # A full disk or a locked file loses the entry, not the command
+                self._db.rollback()
+        return {
+            'id': entry_id, 'session': session, 'command': command,
+            'cwd': cwd, 'timestamp': format_timestamp(created)
+        }
+
+    def extend(self, entries):
+        """Store many (command, session, cwd, created) tuples in one transaction"""
+        with self._lock:
+            for command, session, cwd, created in entries:
+                self._db.execute(
+                    'INSERT INTO history (session, command, cwd, created) VALUES (?, ?, ?, ?)',
+                    (session, command, cwd, created)
+                )
+                self._count_use(session, command, created)
+            self._prune()
+
+    def _count_use(self, session, command, created):
+        """Move a command's stats row to a new highest id
+
+        Ids then follow last use, so the newest matches of a search come
+        first in the trigram index without sorting.
+        """
+        row = self._db.execute(
+            'SELECT id, count FROM command_stats WHERE session = ? AND command = ?',
+            (session, command)
+        ).fetchone()
+        if row:
+            self._db.execute('DELETE FROM command_stats WHERE id = ?', (row['id'],))
+        self._db.execute(
+            'INSERT INTO command_stats (session, command, count, last_used) VALUES (?, ?, ?, ?)',
+            (session, command, (row['count'] if row else 0) + 1, created)
+        )
+
+    def _prune(self):
+        """Drop the oldest rows beyond max_entries"""
+        self._since_prune = 0
+        for table in ('history', 'command_stats'):
+            self._db.execute(
+                f'DELETE FROM {table} WHERE id <= (SELECT MAX(id) FROM {table}) - ?',
+                (self.max_entries,)
+            )
+        self._db.commit()
+
+    def compact(self):
+        """Prune, then rebuild the file and the search index to reclaim space"""
+        with self._lock:
+            self._prune()
+            if self.fts:
+                for index in ('history_fts', 'command_stats_fts'):
+                    self._db.execute(f"INSERT INTO {index} ({index}) VALUES ('optimize')")
+                self._db.commit()
+            self._db.execute('VACUUM')
+
+    def _query(self, where, params, limit, source='history', order='history.id'):
+        with self._lock:
+            rows = self._db.execute(
+                f'SELECT history.id, session, history.command, cwd, created FROM {source} '
+                f'WHERE {" AND ".join(where) or "1"} ORDER BY {order} DESC LIMIT ?',
+                params + [limit]
+            ).fetchall()
+        return [
+            {
+                'id': row['id'], 'session': row['session'], 'command': row['command'],
+                'cwd': row['cwd'], 'timestamp': format_timestamp(row['created'])
+            }
+            for row in rows
+        ]
+
+    def recent(self, limit=DEFAULT_SEARCH_LIMIT, session=None):
+        """Most recent entries, newest first"""
+        where, params = [], []
+        if session is not None:
+            where.append('session = ?')
+            params.append(session)
+        return self._query(where, params, limit)
+
+    def since(self, after_id, session, limit=DEFAULT_RING_SIZE):
+        """A session's entries with ids above after_id, oldest first
+
+        At most the newest limit are returned. Each entry also carries its
+        'created' time, for indexes that rank by recency.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT id, session, command, cwd, created FROM history WHERE session = ? AND id > ? '
+                'ORDER BY id DESC LIMIT ?',
+                (session, after_id, limit)
+            ).fetchall()
+        return [
+            {
+                'id': row['id'], 'session': row['session'], 'command': row['command'],
+                'cwd': row['cwd'], 'timestamp': format_timestamp(row['created']), 'created': row['created']
+            }
+            for row in reversed(rows)
+        ]
+
+    def search(self, query, session=None, limit=DEFAULT_SEARCH_LIMIT, fuzzy=False):
+        """Entries containing query, newest first
+
+        Matching ignores case. With fuzzy the characters of query only need
+        to appear in order, and results are ranked by how tightly they do.
+        """
+        if not query:
+            return self.recent(limit, session)
+        where, params = [], []
+        if session is not None:
+            where.append('session = ?')
+            params.append(session)
+
+        if fuzzy:
+            where.append("history.command LIKE ? ESCAPE '\\'")
+            params.append(_like_pattern(query))
+            candidates = self._query(where, params, limit * FUZZY_CANDIDATES)
+            ranked = sorted(
+                candidates,
+                key=lambda entry: (fuzzy_span(query, entry['command']), -entry['id'])
+            )
+            return ranked[:limit]
+
+        if self.fts and len(query) >= 3:
+            # FTS5 hands back matches in rowid order, so the newest come first
+            # without collecting every match
+            where.append('history_fts MATCH ?')
+            params.append('"' + query.replace('"', '""') + '"')
+            return self._query(
+                where, params, limit,
+                source='history_fts JOIN history ON history.id = history_fts.rowid',
+                order='history_fts.rowid'
+            )
+        where.append("history.command LIKE ? ESCAPE '\\'")
+        params.append(_like_pattern([query]))
+        return self._query(where, params, limit)
+
+    def _recent_matches(self, pattern, session):
+        """LIKE scan over the most recently used commands, newest first
+
+        Returns the matching ids and whether older commands were left out.
+        A session's commands are read from a covering index, so the scan
+        stays sequential even when sessions are interleaved.
+        """
+        scope, params = ('WHERE session = ?', [session]) if session is not None else ('', [])
+        with self._lock:
+            boundary = self._db.execute(
+                f'SELECT id FROM command_stats {scope} ORDER BY id DESC LIMIT 1 OFFSET ?',
+                params + [RECENT_WINDOW]
+            ).fetchone()
+            matches = self._db.execute(
+                f'SELECT id FROM command_stats {scope or "WHERE 1"} AND id > ? '
+                f"AND command LIKE ? ESCAPE '\\' ORDER BY id DESC LIMIT ?",
+                params + [boundary[0] if boundary else 0, pattern, FIND_CANDIDATES]
+            ).fetchall()
+        return [row['id'] for row in matches], boundary is not None
+
+    def _indexed_matches(self, match, session):
+        """Ids from the trigram index, newest first
+
+        For a session at most INDEX_SCAN_LIMIT index matches are examined,
+        which bounds the cost when the query is common elsewhere but rare
+        in the session.
+        """
+        with self._lock:
+            if session is None:
+                rows = self._db.execute(
+                    'SELECT rowid FROM command_stats_fts WHERE command_stats_fts MATCH ? '
+                    'ORDER BY rowid DESC LIMIT ?',
+                    (match, FIND_CANDIDATES)
+                ).fetchall()
+            else:
+                rows = self._db.execute(
+                    'SELECT id FROM command_stats WHERE id IN ('
+                    'SELECT rowid FROM command_stats_fts WHERE command_stats_fts MATCH ? ORDER BY rowid DESC LIMIT ?'
+                    ') AND session = ? ORDER BY id DESC LIMIT ?',
+                    (match, INDEX_SCAN_LIMIT, session, FIND_CANDIDATES)
+                ).fetchall()
+        return [row[0] for row in rows]
+
+    def find(self, query, session=None, limit=DEFAULT_FIND_LIMIT):
+        """Distinct commands for a reverse-i-search, best first
+
+        Each match is scored by match_quality, its use count and how long
+        ago it was last used. Only the most recently used matches are
+        ranked, so a query reads a bounded number of rows however large the
+        history grows. When no command contains query, those sharing most
+        of its trigrams are offered instead, which catches typos.
+        """
+        query = query.strip()
+        if not query:
+            return []
+        indexed = self.fts and len(query) >= 3
+        phrase = '"' + query.replace('"', '""') + '"'
+        if indexed and session is None:
+            ids = self._indexed_matches(phrase, None)
+        else:
+            ids, truncated = self._recent_matches(_like_pattern([query]), session)
+            if len(ids) < FIND_CANDIDATES and truncated and indexed:
+                # Older commands, beyond the window the scan covered
+                ids += self._indexed_matches(phrase, session)
+        if not ids and indexed:
+            wanted = trigrams(query.lower())
+            ids += self._indexed_matches(' OR '.join('"' + t.replace('"', '""') + '"' for t in wanted), session)
+        ids = list(set(ids))
+        if not ids:
+            return []
+
+        with self._lock:
+            rows = self._db.execute(
+                f'SELECT command, count, last_used FROM command_stats WHERE id IN ({",".join("?" * len(ids))})',
+                ids
+            ).fetchall()
+        now = time.time()
+        ranked = {}
+        for row in rows:
+            quality = match_quality(query, row['command'])
+            if not quality:
+                continue
+            age = max(0.0, now - row['last_used'])
+            score = quality * math.log2(1 + row['count']) * 0.5 ** (age / FIND_HALF_LIFE)
+            key = (score, row['last_used'])
+            previous = ranked.get(row['command'])
+            if previous is None or key > previous[0]:
+                # Across sessions the same command keeps its best row
+                ranked[row['command']] = (key, {
+                    'command': row['command'], 'count': row['count'],
+                    'last_used': format_timestamp(row['last_used']), 'score': round(score, 4)
+                })
+        best = sorted(ranked.values(), key=lambda item: item[0], reverse=True)
+        return [match for key, match in best[:limit]]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM history').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_history_store = None
+_store_lock = threading.Lock()
+
+
+def history_path():
+    """Database path; TERMINAL_HISTORY_DB='' keeps history in memory only"""
+    configured = os.environ.get('TERMINAL_HISTORY_DB')
+    if configured is not None:
+        return configured or ':memory:'
+    return os.path.join(os.path.expanduser('~'), DEFAULT_HISTORY_FILE)
+
+
+def get_history_store():
+    """Shared process-wide history store"""
+    global _history_store
+    with _store_lock:
+        if _history_store is None:
+            try:
+                _history_store = HistoryStore(history_path())
+            except (OSError, sqlite3.Error):
+                # Unwritable home or a locked file; history still works per process
+                _history_store = HistoryStore(':memory:')
+        return _history_store
@@ -0,0 +1,102 @@
+"""
+Natural Language Intent Matcher
+Turns phrases like "create folder test" into terminal commands. Every
+pattern is compiled once into a single regular expression, so a command is
+classified with one search no matter how many intents are registered.
+"""
+
+import re
+
+
+class Intent:
+    def __init__(self, name, template, patterns):
+        self.name = name
+        self.template = template
+        self.patterns = list(patterns)
+
+    def render(self, args):
+        """Build the terminal command from captured arguments"""
+        return self.template.format(*args)
+
+
+# Checked in order; the first intent with a matching pattern wins
+DEFAULT_INTENTS = [
+    Intent('mkdir', 'mkdir {0}', [
+        r'create (?:folder|directory) (\w+)',
+        r'make (?:folder|directory) (\w+)',
+        r'mkdir (\w+)'
+    ]),
+    Intent('mv', 'mv {0} {1}', [
+        r'move (?:file )?(\w+(?:\.\w+)?) to (\w+)',
+        r'mv (\w+(?:\.\w+)?) (\w+)'
+    ]),
+    # ls and monitor are single words that also turn up as arguments, as
+    # in "grep -r monitor .", so they only match as the whole line
+    Intent('ls', 'ls', [
+        r'^(?:list|show) (?:files|directory|contents)$',
+        r'^ls$'
+    ]),
+    Intent('cd', 'cd {0}', [
+        r'(?:go to|change to|cd) (\w+)',
+        r'enter (?:directory|folder) (\w+)'
+    ]),
+    Intent('monitor', 'monitor', [
+        r'^(?:show )?system (?:info|information|monitor)$',
+        r'^monitor$'
+    ])
+]
+
+
+class IntentMatcher:
+    def __init__(self, intents=None, names=None):
+        intents = DEFAULT_INTENTS if intents is None else intents
+        if names is not None:
+            intents = [intent for intent in intents if intent.name in names]
+        self.intents = list(intents)
+        self._compile()
+
+    def add(self, intent):
+        """Register another intent, checked after the existing ones"""
+        self.intents.append(intent)
+        self._compile()
+
+    def _compile(self):
+        """Build one anchored alternation of lookaheads
+
+        Each alternative is a lookahead for the pattern anywhere in the
+        string, so the alternatives are tried in registration order and the
+        first pattern found wins. Unlike a plain re.search, a pattern must
+        start and end on word boundaries: "ls" does not match "tools.py".
+        Patterns anchored with ^ and $ must match the whole line.
+        """
+        alternatives = []
+        self._groups = {}
+        group = 0
+        for intent in self.intents:
+            for pattern in intent.patterns:
+                captures = re.compile(pattern).groups
+                group += 1
+                self._groups[group] = (intent, captures)
+                alternatives.append(rf'(?=.*?(?<!\w)({pattern})(?!\w))')
+                group += captures
+        self._regex = re.compile('^(?:' + '|'.join(alternatives) + ')', re.DOTALL) if alternatives else None
+
+    def _search(self, command):
+        """Find the winning intent and its captured arguments"""
+        if self._regex is None:
+            return None
+        match = self._regex.match(command.lower().strip())
+        if match is None:
+            return None
+        intent, captures = self._groups[match.lastindex]
+        return intent, match.groups()[match.lastindex:match.lastindex + captures]
+
+    def match(self, command):
+        """Classify a command, returning (intent name, arguments) or None"""
+        found = self._search(command)
+        return (found[0].name, found[1]) if found else None
+
+    def parse(self, command):
+        """Translate a natural language command, or return None"""
+        found = self._search(command)
+        return found[0].render(found[1]) if found else None
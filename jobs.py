@@ -0,0 +1,475 @@
+"""
+Background Job Queue
+Runs shell commands on a bounded pool of worker threads so that /execute
+can return a job id immediately. Jobs can be polled for status and partial
+output, and cancelled by killing their process group.
+
+Job records are kept in SQLite, in the history database unless that is in
+memory, so with several server processes any of them can list, poll or
+cancel a job. The process that queued a job runs it.
+"""
+
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+from execution import (spawn_command, iter_output, kill_process_tree, kill_process_group,
+                       DEFAULT_MAX_OUTPUT_BYTES, DEFAULT_STREAM_TIMEOUT)
+from history import history_path
+
+DEFAULT_WORKERS = 8
+DEFAULT_PER_SESSION = 2
+DEFAULT_MAX_PENDING = 100
+DEFAULT_MAX_PENDING_PER_SESSION = 20
+DEFAULT_MAX_FINISHED = 500
+# Seconds between writes of a running job's output to the store; other
+# processes see output this much later than the one running the job
+OUTPUT_FLUSH_INTERVAL = 0.25
+
+QUEUED = 'queued'
+RUNNING = 'running'
+FINISHED_STATES = ('completed', 'failed', 'cancelled', 'timeout', 'truncated')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    session TEXT NOT NULL,
+    command TEXT NOT NULL,
+    cwd TEXT,
+    status TEXT NOT NULL,
+    exit_code INTEGER,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    output TEXT NOT NULL DEFAULT '',
+    owner INTEGER NOT NULL,
+    pid INTEGER,
+    cancel_requested INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_session ON jobs (session, created);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, owner);
+"""
+
+
+class JobRejected(Exception):
+    """Raised when a job cannot be queued because a limit was reached"""
+
+
+class Job:
+    def __init__(self, session_id, command, cwd):
+        self.id = secrets.token_hex(8)
+        self.session_id = session_id
+        self.command = command
+        self.cwd = cwd
+        self.status = QUEUED
+        self.exit_code = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.proc = None
+        self.cancel_requested = False
+        self._chunks = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_row(cls, row):
+        """A copy of a stored job, as it was when it was read"""
+        job = cls(row['session'], row['command'], row['cwd'])
+        job.id = row['id']
+        job.status = row['status']
+        job.exit_code = row['exit_code']
+        job.created_at = row['created']
+        job.started_at = row['started']
+        job.finished_at = row['finished']
+        job._chunks = [row['output']]
+        return job
+
+    def append_output(self, text):
+        """Record a chunk of output"""
+        with self._lock:
+            self._chunks.append(text)
+
+    def output(self, offset=0):
+        """Get the output collected so far, starting at a character offset"""
+        with self._lock:
+            text = ''.join(self._chunks)
+            # Collapse so repeated polls do not re-join every chunk
+            self._chunks = [text]
+        return text[offset:], len(text)
+
+    def is_finished(self):
+        return self.status in FINISHED_STATES
+
+    def to_dict(self, offset=0):
+        """Describe the job, including output from offset onwards"""
+        output, next_offset = self.output(offset)
+        return {
+            'job_id': self.id,
+            'command': self.command,
+            'status': self.status,
+            'exit_code': self.exit_code,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'output': output,
+            'offset': next_offset
+        }
+
+
+def _process_alive(pid):
+    """Whether a process on this host still exists"""
+    if os.name == 'nt' or pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobStore:
+    """Job records shared by every process that opens the same database
+
+    path=':memory:' keeps them for this process only.
+    """
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Autocommit, so add() can take the write lock for its whole check
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        if path != ':memory:':
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+
+    def _reap(self):
+        """Fail the unfinished jobs of server processes that have exited"""
+        owners = self._db.execute(
+            'SELECT DISTINCT owner FROM jobs WHERE status IN (?, ?)', (QUEUED, RUNNING)
+        ).fetchall()
+        for (owner,) in owners:
+            if not _process_alive(owner):
+                self._db.execute(
+                    'UPDATE jobs SET status = ?, finished = ?, pid = NULL, output = output || ? '
+                    'WHERE owner = ? AND status IN (?, ?)',
+                    ('failed', time.time(), "\nError: the server process running this job exited",
+                     owner, QUEUED, RUNNING)
+                )
+
+    def add(self, job, max_pending, max_pending_per_session):
+        """Store a queued job, raising JobRejected when a queue limit is reached
+
+        The limits count the jobs queued by every process.
+        """
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                self._reap()
+                pending, session_pending = self._db.execute(
+                    'SELECT COUNT(*), COALESCE(SUM(session = ?), 0) FROM jobs WHERE status = ?',
+                    (job.session_id, QUEUED)
+                ).fetchone()
+                if pending >= max_pending:
+                    raise JobRejected("Job queue is full, try again later")
+                if session_pending >= max_pending_per_session:
+                    raise JobRejected("Too many queued jobs for this session")
+                self._db.execute(
+                    'INSERT INTO jobs (id, session, command, cwd, status, created, owner) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (job.id, job.session_id, job.command, job.cwd, job.status, job.created_at, os.getpid())
+                )
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def load(self, job_id):
+        """The stored job, or None"""
+        with self._lock:
+            self._reap()
+            row = self._db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def for_session(self, session_id):
+        """A session's stored jobs, oldest first, without their output"""
+        with self._lock:
+            self._reap()
+            rows = self._db.execute(
+                "SELECT id, session, command, cwd, status, exit_code, created, started, finished, "
+                "'' AS output FROM jobs WHERE session = ? ORDER BY created",
+                (session_id,)
+            ).fetchall()
+        return [Job.from_row(row) for row in rows]
+
+    def start(self, job_id, started):
+        """Mark a queued job as running; False when it was cancelled first"""
+        with self._lock:
+            cursor = self._db.execute(
+                'UPDATE jobs SET status = ?, started = ? WHERE id = ? AND status = ?',
+                (RUNNING, started, job_id, QUEUED)
+            )
+        return cursor.rowcount == 1
+
+    def attach(self, job_id, pid):
+        """Record a running job's process group, returning whether a cancel was requested"""
+        with self._lock:
+            self._db.execute('UPDATE jobs SET pid = ? WHERE id = ?', (pid, job_id))
+            row = self._db.execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return bool(row and row['cancel_requested'])
+
+    def append_output(self, job_id, text):
+        with self._lock:
+            self._db.execute('UPDATE jobs SET output = output || ? WHERE id = ?', (text, job_id))
+
+    def finish(self, job_id, status, exit_code, finished, output=''):
+        """Record a job's result, returning its final status
+
+        A cancel requested by another process turns any status into
+        'cancelled'.
+        """
+        with self._lock:
+            self._db.execute(
+                'UPDATE jobs SET status = CASE WHEN cancel_requested THEN ? ELSE ? END, exit_code = ?, '
+                'finished = ?, pid = NULL, output = output || ? WHERE id = ?',
+                ('cancelled', status, exit_code, finished, output, job_id)
+            )
+            row = self._db.execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return row['status'] if row else status
+
+    def cancel_queued(self, job_id, finished):
+        """Cancel a job that has not started; False when it already has"""
+        with self._lock:
+            cursor = self._db.execute(
+                'UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status = ?',
+                ('cancelled', finished, job_id, QUEUED)
+            )
+        return cursor.rowcount == 1
+
+    def request_cancel(self, job_id):
+        """Flag a running job for cancellation, returning its process group id"""
+        with self._lock:
+            self._db.execute(
+                'UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?', (job_id, RUNNING)
+            )
+            row = self._db.execute('SELECT pid FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return row['pid'] if row else None
+
+    def prune(self, keep):
+        """Forget the oldest finished jobs beyond keep"""
+        with self._lock:
+            self._db.execute(
+                f'DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE status IN '
+                f'({", ".join("?" * len(FINISHED_STATES))}) ORDER BY finished DESC LIMIT -1 OFFSET ?)',
+                FINISHED_STATES + (keep,)
+            )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_job_store = None
+_store_lock = threading.Lock()
+
+
+def get_job_store():
+    """Shared process-wide job store, in the history database"""
+    global _job_store
+    with _store_lock:
+        if _job_store is None:
+            try:
+                _job_store = JobStore(history_path())
+            except (OSError, sqlite3.Error):
+                # Unwritable home or a locked file; jobs still work per process
+                _job_store = JobStore(':memory:')
+        return _job_store
+
+
+class JobManager:
+    def __init__(self, workers=DEFAULT_WORKERS, per_session=DEFAULT_PER_SESSION,
+                 max_pending=DEFAULT_MAX_PENDING, max_pending_per_session=DEFAULT_MAX_PENDING_PER_SESSION,
+                 max_bytes=DEFAULT_MAX_OUTPUT_BYTES, timeout=DEFAULT_STREAM_TIMEOUT, store=None):
+        self.workers = workers
+        # Running jobs per session are limited within each process
+        self.per_session = per_session
+        self.max_pending = max_pending
+        self.max_pending_per_session = max_pending_per_session
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.store = store or JobStore()
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._running = {}  # session id -> running job count
+        # Unfinished jobs queued by this process; finished ones are read
+        # back from the store
+        self._jobs = OrderedDict()
+        self._threads = []
+
+    def _ensure_workers(self):
+        """Start the worker threads on first use"""
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, session_id, command, cwd):
+        """Queue a command, returning its Job or raising JobRejected"""
+        job = Job(session_id, command, cwd)
+        self.store.add(job, self.max_pending, self.max_pending_per_session)
+        with self._cond:
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._ensure_workers()
+            self._cond.notify_all()
+        self.store.prune(DEFAULT_MAX_FINISHED)
+        return job
+
+    def get(self, job_id, session_id=None):
+        """Look up a job, optionally requiring it to belong to a session"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+        if job is None or job.status == QUEUED:
+            # Finished, queued by another process, or cancelled by one
+            job = self.store.load(job_id)
+        if job is None or (session_id is not None and job.session_id != session_id):
+            return None
+        return job
+
+    def for_session(self, session_id):
+        """All known jobs for a session, oldest first"""
+        jobs = self.store.for_session(session_id)
+        with self._cond:
+            # This process's running jobs are fresher than their records
+            return [
+                self._jobs[job.id] if job.id in self._jobs and job.status == RUNNING else job
+                for job in jobs
+            ]
+
+    def cancel(self, job_id, session_id=None):
+        """Cancel a queued or running job, whichever process runs it"""
+        job = self.get(job_id, session_id)
+        if job is None:
+            return None
+        with self._cond:
+            local = self._jobs.get(job_id)
+            if local is not None and local in self._pending:
+                self._pending.remove(local)
+        if job.status == QUEUED and self.store.cancel_queued(job_id, time.time()):
+            if local is not None:
+                self._finish(local, 'cancelled')
+            return self.store.load(job_id)
+        if job.status not in (QUEUED, RUNNING):
+            return job
+
+        pid = self.store.request_cancel(job_id)
+        proc = None
+        if local is not None:
+            with self._cond:
+                local.cancel_requested = True
+                proc = local.proc
+        if proc is not None:
+            kill_process_tree(proc)
+        elif pid is not None and local is None and os.name != 'nt':
+            kill_process_group(pid)
+        return local or job
+
+    def _next_job(self):
+        """Take the oldest pending job whose session is below its limit"""
+        for job in self._pending:
+            if self._running.get(job.session_id, 0) < self.per_session:
+                self._pending.remove(job)
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_job()
+                self._running[job.session_id] = self._running.get(job.session_id, 0) + 1
+
+            try:
+                started = time.time()
+                if self.store.start(job.id, started):
+                    job.started_at = started
+                    job.status = RUNNING
+                    self._run(job)
+                else:
+                    # Cancelled while it waited
+                    self._forget(job, self.store.load(job.id))
+            finally:
+                with self._cond:
+                    self._running[job.session_id] -= 1
+                    if not self._running[job.session_id]:
+                        del self._running[job.session_id]
+                    self._cond.notify_all()
+
+    def _run(self, job):
+        """Execute a job to completion"""
+        try:
+            proc = spawn_command(job.command, job.cwd)
+        except Exception as e:
+            message = f"Error executing command: {str(e)}"
+            job.append_output(message)
+            self._finish(job, 'failed', message)
+            return
+
+        cancelled = self.store.attach(job.id, proc.pid)
+        with self._cond:
+            job.proc = proc
+            cancelled = cancelled or job.cancel_requested
+        if cancelled:
+            kill_process_tree(proc)
+
+        status = 'completed'
+        unflushed = []
+        flushed_at = time.monotonic()
+        for event in iter_output(proc, max_bytes=self.max_bytes, timeout=self.timeout):
+            if event['type'] in ('stdout', 'stderr'):
+                job.append_output(event['data'])
+                unflushed.append(event['data'])
+                if time.monotonic() - flushed_at >= OUTPUT_FLUSH_INTERVAL:
+                    self.store.append_output(job.id, ''.join(unflushed))
+                    unflushed = []
+                    flushed_at = time.monotonic()
+            elif event['type'] in ('timeout', 'truncated'):
+                status = event['type']
+            elif event['type'] == 'exit':
+                job.exit_code = event['code']
+
+        if job.cancel_requested:
+            status = 'cancelled'
+        elif status == 'completed' and job.exit_code:
+            status = 'failed'
+        self._finish(job, status, ''.join(unflushed))
+
+    def _finish(self, job, status, output=''):
+        """Record a job's result and stop tracking it in this process"""
+        finished = time.time()
+        status = self.store.finish(job.id, status, job.exit_code, finished, output)
+        job.finished_at = finished
+        job.proc = None
+        job.status = status
+        with self._cond:
+            self._jobs.pop(job.id, None)
+
+    def _forget(self, job, stored):
+        """Stop tracking a job that was finished elsewhere"""
+        if stored is not None:
+            job.finished_at = stored.finished_at
+            job.status = stored.status
+        with self._cond:
+            self._jobs.pop(job.id, None)
@@ -1,22 +1,34 @@
 #!/usr/bin/env python3
 """
 Python Command Terminal Launcher
-Allows users to choose between CLI and Web interface
+Allows users to choose between CLI and Web interface, or serve the web
+terminal with a production server
 """
 
 import sys
 import os
+import importlib.util
+import secrets
 import subprocess
 import argparse
 
+# Production servers: gunicorn (POSIX, multi-process), waitress (threads
+# only) or uvicorn for the asyncio variant in app_asgi.py. Only looked up
+# here; importing them would slow down every launch, including the CLI
+GUNICORN_AVAILABLE = os.name != 'nt' and importlib.util.find_spec('gunicorn') is not None
+WAITRESS_AVAILABLE = importlib.util.find_spec('waitress') is not None
+UVICORN_AVAILABLE = importlib.util.find_spec('uvicorn') is not None
+
+DEFAULT_HOST = '0.0.0.0'
+DEFAULT_PORT = 5000
+# Each open browser tab holds a thread for its /monitor/stream under
+# gunicorn and waitress, so leave plenty for everything else
+DEFAULT_THREADS = 32
+DEFAULT_WORKER_TIMEOUT = 30
+
 def check_dependencies():
-    """Check if required packages are installed"""
-    try:
-        import flask
-        import psutil
-        return True
-    except ImportError:
-        return False
+    """Check if required packages are installed, without importing them"""
+    return all(importlib.util.find_spec(name) is not None for name in ('flask', 'psutil'))
 
 def install_dependencies():
     """Install required dependencies"""
@@ -30,29 +42,119 @@ def install_dependencies():
         return False
 
 def launch_web_terminal():
-    """Launch the web-based terminal"""
+    """Launch the web-based terminal in this process"""
     print("🚀 Starting Web Terminal...")
     print("📱 Access at: http://localhost:5000")
     print("🔥 Press Ctrl+C to stop the server")
     try:
-        subprocess.run([sys.executable, "app.py"])
+        from app import run_development_server
+        run_development_server(use_reloader=False)
     except KeyboardInterrupt:
         print("\n👋 Web terminal stopped.")
 
+def gunicorn_server(options):
+    """A gunicorn application serving the web terminal with the given settings"""
+    from gunicorn.app.base import BaseApplication
+    
+    class TerminalServer(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+        
+        def load(self):
+            from app import create_app
+            return create_app()
+    
+    return TerminalServer()
+
+def default_workers():
+    """One worker per CPU; each also runs several request threads"""
+    return int(os.environ.get('TERMINAL_WORKERS', os.cpu_count() or 1))
+
+def launch_production_server(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, threads=DEFAULT_THREADS,
+                             preload=False, server='auto', timeout=DEFAULT_WORKER_TIMEOUT):
+    """Serve the web terminal with gunicorn, or waitress where gunicorn is unavailable
+    
+    server='uvicorn' serves the asyncio variant from app_asgi.py instead.
+    """
+    workers = workers or default_workers()
+    if server == 'auto':
+        server = 'gunicorn' if GUNICORN_AVAILABLE else 'waitress'
+    if server == 'gunicorn' and not GUNICORN_AVAILABLE:
+        print("❌ gunicorn is not installed (pip install gunicorn)")
+        return 1
+    if server == 'uvicorn' and not UVICORN_AVAILABLE:
+        print("❌ uvicorn is not installed (pip install uvicorn)")
+        return 1
+    if server == 'waitress' and not WAITRESS_AVAILABLE:
+        print("❌ No production server found. Install one with: pip install gunicorn (or waitress on Windows)")
+        return 1
+    
+    # Workers that do not preload import the app themselves, so they need the
+    # session key from the environment rather than generating their own
+    os.environ.setdefault('TERMINAL_SECRET_KEY', secrets.token_hex(32))
+    
+    print(f"🚀 Serving Web Terminal with {server} at http://{host}:{port}")
+    if workers > 1 and server != 'waitress' and os.environ.get('TERMINAL_HISTORY_DB') == '':
+        # Jobs and history are shared through the history database
+        print("⚠️  TERMINAL_HISTORY_DB is empty: each worker keeps its own jobs and history")
+    if server == 'gunicorn':
+        print(f"⚙️  {workers} worker(s) x {threads} thread(s){', preloaded' if preload else ''}")
+        print(f"🔄 Graceful reload: kill -HUP {os.getpid()}")
+        gunicorn_server({
+            'bind': f"{host}:{port}",
+            'workers': workers,
+            'threads': threads,
+            # Threaded workers keep long-lived streams from blocking other requests
+            'worker_class': 'gthread',
+            'preload_app': preload,
+            'timeout': timeout,
+            'graceful_timeout': timeout
+        }).run()
+        return 0
+    
+    if server == 'uvicorn':
+        # Commands run as asyncio subprocesses; threads only serve blocking work
+        os.environ.setdefault('TERMINAL_ASGI_THREADS', str(threads))
+        print(f"⚙️  {workers} worker(s), async commands, {threads} thread(s) for blocking work")
+        import uvicorn
+        uvicorn.run('app_asgi:app', host=host, port=port, workers=workers)
+        return 0
+    
+    if workers > 1:
+        print("ℹ️  waitress runs a single process; using threads only")
+    print(f"⚙️  {threads} thread(s)")
+    import waitress
+    from app import create_app
+    waitress.serve(create_app(), host=host, port=port, threads=threads)
+    return 0
+
 def launch_cli_terminal():
-    """Launch the CLI terminal"""
+    """Launch the CLI terminal in this process"""
     print("🚀 Starting CLI Terminal...")
     try:
-        subprocess.run([sys.executable, "cli_terminal.py"])
+        from cli_terminal import main as run_cli
+        run_cli()
     except KeyboardInterrupt:
         print("\n👋 CLI terminal stopped.")
 
 def main():
     parser = argparse.ArgumentParser(description="Python Command Terminal Launcher")
-    parser.add_argument("--mode", choices=["cli", "web", "auto"], default="auto",
-                      help="Launch mode: cli, web, or auto (interactive)")
+    parser.add_argument("--mode", choices=["cli", "web", "serve", "auto"], default="auto",
+                      help="Launch mode: cli, web (development server), serve (production server), or auto (interactive)")
     parser.add_argument("--install-deps", action="store_true",
                       help="Install dependencies and exit")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Address to serve on (serve mode)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to serve on (serve mode)")
+    parser.add_argument("--workers", type=int, default=None,
+                      help="Worker processes (serve mode, default: CPU count or TERMINAL_WORKERS)")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS,
+                      help=f"Request threads per worker (serve mode, default: {DEFAULT_THREADS}); each open "
+                           "browser tab holds one for its monitoring stream")
+    parser.add_argument("--preload", action="store_true",
+                      help="Load the app once before forking workers; saves memory, but a reload then needs a restart")
+    parser.add_argument("--server", choices=["auto", "gunicorn", "waitress", "uvicorn"], default="auto",
+                      help="Production server to use (serve mode); uvicorn runs the asyncio variant")
     
     args = parser.parse_args()
     
@@ -71,6 +173,10 @@ def main():
         print(f"   python {sys.argv[0]} --install-deps")
         return
     
+    if args.mode == "serve":
+        sys.exit(launch_production_server(args.host, args.port, args.workers, args.threads,
+                                          args.preload, args.server))
+    
     # Display welcome message
     print("=" * 60)
     print("🐍 PYTHON COMMAND TERMINAL LAUNCHER")
@@ -0,0 +1,196 @@
+"""
+Prometheus/OpenMetrics Exporter
+Counters and histograms for the server's own activity, plus gauges built
+from the latest monitoring snapshot, rendered in the OpenMetrics text
+format for /metrics.
+"""
+
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return 'NaN'
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        # An unlabelled counter is exported as 0 before its first increment
+        self._values = {} if self.labels else {(): 0}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        return self._values.get(key, 0)
+
+    def render(self):
+        lines = [f"# TYPE {self.name} counter", f"# HELP {self.name} {self.description}"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}_total{_format_labels(zip(self.labels, key))} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts (last is +Inf), count, sum]
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            series[0][index] += 1
+            series[1] += 1
+            series[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the with block takes"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        series = self._series.get(key)
+        return series[1] if series else 0
+
+    def render(self):
+        lines = [f"# TYPE {self.name} histogram", f"# HELP {self.name} {self.description}"]
+        with self._lock:
+            series = sorted((key, [list(value[0]), value[1], value[2]]) for key, value in self._series.items())
+        for key, (buckets, count, total) in series:
+            labels = list(zip(self.labels, key))
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (math.inf,), buckets):
+                cumulative += bucket
+                le = '+Inf' if math.isinf(bound) else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, description, labels=()):
+        metric = Counter(name, description, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, description, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self, snapshot=None):
+        """Render every metric, plus host gauges when a snapshot is given"""
+        lines = []
+        if snapshot is not None:
+            lines.extend(host_gauges(snapshot))
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def _gauge(name, description, samples):
+    """Lines for one gauge family from (labels, value) pairs"""
+    lines = [f"# TYPE {name} gauge", f"# HELP {name} {description}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return lines
+
+
+def host_gauges(snapshot):
+    """Gauges for a monitoring snapshot from SystemSampler"""
+    gigabyte = 1024 ** 3
+    memory = snapshot.get('memory', {})
+    disk = snapshot.get('disk', {})
+    network = snapshot.get('network', {})
+    disk_io = snapshot.get('disk_io', {})
+    processes = snapshot.get('top_processes', [])
+
+    lines = []
+    lines += _gauge('terminal_host_cpu_percent', "Host CPU usage",
+                    [((), snapshot.get('cpu_percent'))])
+    lines += _gauge('terminal_host_cpu_core_percent', "Host CPU usage per core",
+                    [((('core', core),), value) for core, value in enumerate(snapshot.get('cpu_per_core', []))])
+    lines += _gauge('terminal_host_memory_percent', "Host memory usage",
+                    [((), memory.get('percent'))])
+    lines += _gauge('terminal_host_memory_used_bytes', "Host memory in use",
+                    [((), round(memory.get('used', 0) * gigabyte))])
+    lines += _gauge('terminal_host_memory_total_bytes', "Host memory installed",
+                    [((), round(memory.get('total', 0) * gigabyte))])
+    lines += _gauge('terminal_host_disk_percent', "Root filesystem usage",
+                    [((), disk.get('percent'))])
+    lines += _gauge('terminal_host_network_bytes_per_second', "Network throughput",
+                    [((('direction', 'receive'),), network.get('bytes_recv_per_sec')),
+                     ((('direction', 'transmit'),), network.get('bytes_sent_per_sec'))])
+    lines += _gauge('terminal_host_disk_io_bytes_per_second', "Disk throughput",
+                    [((('direction', 'read'),), disk_io.get('read_bytes_per_sec')),
+                     ((('direction', 'write'),), disk_io.get('write_bytes_per_sec'))])
+    lines += _gauge('terminal_process_cpu_percent', "CPU usage of the top processes",
+                    [((('pid', proc['pid']), ('name', proc['name'])), proc['cpu_percent']) for proc in processes])
+    lines += _gauge('terminal_process_memory_percent', "Memory usage of the top processes",
+                    [((('pid', proc['pid']), ('name', proc['name'])), proc['memory_percent']) for proc in processes])
+    if 'sampled_at' in snapshot:
+        lines += _gauge('terminal_host_sample_age_seconds', "Seconds since the host was sampled",
+                        [((), round(max(0.0, time.time() - snapshot['sampled_at']), 3))])
+    return lines
+
+
+# Server metrics, shared by the modules that record them
+registry = MetricsRegistry()
+request_duration = registry.histogram(
+    'terminal_request_duration_seconds', "HTTP request latency by route", ('route', 'method'))
+subprocess_spawns = registry.counter(
+    'terminal_subprocess_spawns', "Shell commands started", ('mode',))
+subprocess_duration = registry.histogram(
+    'terminal_subprocess_duration_seconds', "Shell command run time", ('mode',))
+command_timeouts = registry.counter(
+    'terminal_command_timeouts', "Shell commands killed for exceeding their timeout", ('mode',))
+commands_rejected = registry.counter(
+    'terminal_commands_rejected', "Commands refused by the dangerous command filter")
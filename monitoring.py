@@ -0,0 +1,375 @@
+"""
+System Monitoring Sampler
+Collects CPU, memory, disk, network and process data in a background thread
+so that monitoring requests can return the latest snapshot without blocking.
+"""
+
+import heapq
+import os
+import threading
+import time
+
+import psutil
+
+from timeseries import MetricsHistory
+
+DEFAULT_INTERVAL = 2.0
+DEFAULT_TOP_N = 5
+MAX_TOP_N = 50
+
+# Ranking keys accepted by ProcessTracker.top, mapped to row fields
+PROCESS_SORT_KEYS = {
+    'cpu': 'cpu_percent',
+    'memory': 'memory_percent',
+    'io': 'io_rate'
+}
+
+
+class ProcessTracker:
+    def __init__(self):
+        # pid -> {'proc', 'name', 'io_bytes', 'io_time'}; the Process handles
+        # persist so cpu_percent() measures the delta since the last sample
+        self._table = {}
+        self._rows = []
+
+    def _entry(self, pid):
+        """The table entry for pid, tracking it if it is new"""
+        entry = self._table.get(pid)
+        if entry is None:
+            try:
+                proc = psutil.Process(pid)
+                entry = {'proc': proc, 'name': proc.name(), 'io_bytes': None, 'io_time': None}
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                return None
+            self._table[pid] = entry
+        return entry
+
+    def prime(self):
+        """Start the CPU measurement of every process
+
+        A new handle's first cpu_percent() is always 0.0, so call this before
+        the first update() with a delay in between.
+        """
+        for pid in psutil.pids():
+            entry = self._entry(pid)
+            if entry is None:
+                continue
+            try:
+                entry['proc'].cpu_percent(interval=None)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+
+    def update(self):
+        """Refresh per-process stats, tracking new pids and dropping dead ones"""
+        pids = set(psutil.pids())
+        for pid in [pid for pid in self._table if pid not in pids]:
+            del self._table[pid]
+
+        rows = []
+        for pid in pids:
+            entry = self._entry(pid)
+            if entry is None:
+                continue
+
+            proc = entry['proc']
+            try:
+                with proc.oneshot():
+                    cpu_percent = proc.cpu_percent(interval=None)
+                    memory_percent = proc.memory_percent()
+                    try:
+                        io = proc.io_counters()
+                        io_bytes = io.read_bytes + io.write_bytes
+                    except (psutil.AccessDenied, AttributeError):
+                        io_bytes = None
+            except psutil.NoSuchProcess:
+                del self._table[pid]
+                continue
+            except psutil.AccessDenied:
+                continue
+
+            now = time.monotonic()
+            io_rate = 0.0
+            if io_bytes is not None and entry['io_bytes'] is not None:
+                elapsed = now - entry['io_time']
+                if elapsed > 0:
+                    io_rate = round(max(0, io_bytes - entry['io_bytes']) / elapsed, 1)
+            entry['io_bytes'] = io_bytes
+            entry['io_time'] = now
+
+            rows.append({
+                'pid': pid,
+                'name': entry['name'],
+                'cpu_percent': cpu_percent,
+                'memory_percent': memory_percent,
+                'io_rate': io_rate
+            })
+
+        self._rows = rows
+        return rows
+
+    def top(self, n=DEFAULT_TOP_N, sort='cpu'):
+        """Return the n busiest processes ranked by cpu, memory or io"""
+        if sort not in PROCESS_SORT_KEYS:
+            raise ValueError(f"Unknown sort key '{sort}', expected one of: {', '.join(PROCESS_SORT_KEYS)}")
+        field = PROCESS_SORT_KEYS[sort]
+        return heapq.nlargest(n, self._rows, key=lambda row: row[field] or 0)
+
+    def __len__(self):
+        return len(self._table)
+
+
+def _read_net_counters():
+    return psutil.net_io_counters(pernic=True)
+
+
+def _read_disk_counters():
+    return psutil.disk_io_counters(perdisk=True)
+
+
+class RateTracker:
+    def __init__(self, read, fields):
+        self.read = read
+        self.fields = tuple(fields)
+        self._counters = None
+        self._read_at = None
+
+    def update(self):
+        """Read the counters and return per-second rates since the last read
+
+        Returns {device: {'<field>_per_sec': rate}}, empty on the first call.
+        Devices that appeared since the last read are left out until the
+        next one, and counters that went backwards (reset or wrapped) count
+        as zero.
+        """
+        try:
+            counters = self.read() or {}
+        except (OSError, RuntimeError):
+            counters = {}
+        now = time.monotonic()
+        previous, read_at = self._counters, self._read_at
+        self._counters, self._read_at = counters, now
+        if not previous or now <= read_at:
+            return {}
+
+        elapsed = now - read_at
+        rates = {}
+        for name, current in counters.items():
+            before = previous.get(name)
+            if before is None:
+                continue
+            rates[name] = {
+                f'{field}_per_sec': round(max(0, getattr(current, field) - getattr(before, field)) / elapsed, 1)
+                for field in self.fields
+            }
+        return rates
+
+
+def _sum_rates(rates, fields):
+    """Total the per-device rates"""
+    return {
+        f'{field}_per_sec': round(sum(device[f'{field}_per_sec'] for device in rates.values()), 1)
+        for field in fields
+    }
+
+
+class SystemSampler:
+    def __init__(self, interval=DEFAULT_INTERVAL, disk_path=None):
+        self.interval = interval
+        self.disk_path = disk_path or ('/' if os.name != 'nt' else 'C:')
+        self._lock = threading.Lock()
+        self._updated = threading.Condition(self._lock)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._snapshot = None
+        self._version = 0
+        self._listeners = []
+        self.processes = ProcessTracker()
+        self.network = RateTracker(_read_net_counters, ('bytes_sent', 'bytes_recv'))
+        self.disk_io = RateTracker(_read_disk_counters, ('read_bytes', 'write_bytes'))
+        self.history = MetricsHistory(interval)
+
+    def start(self):
+        """Start the background sampling thread"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='system-sampler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background sampling thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def is_running(self):
+        """Check whether the sampling thread is alive"""
+        return bool(self._thread and self._thread.is_alive())
+
+    def _run(self):
+        """Sampling loop, runs until stop() is called"""
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                self.sample()
+            except Exception:
+                # Keep serving the last good snapshot
+                pass
+            elapsed = time.monotonic() - started
+            self._stop_event.wait(max(0.0, self.interval - elapsed))
+
+    def sample(self):
+        """Collect one snapshot and publish it"""
+        # cpu_percent(interval=None) measures since the previous call, so the
+        # very first sample needs a short blocking window to be meaningful
+        first = self._snapshot is None
+        if first:
+            # Take the first IO and per-process CPU counters now so the
+            # blocking CPU window below also gives the first sample real IO
+            # rates and process CPU usage
+            self.network.update()
+            self.disk_io.update()
+            self.processes.prime()
+        cpu_percent = psutil.cpu_percent(interval=0.1 if first else None)
+        # Tracked separately from the total by psutil, so both stay deltas
+        cpu_per_core = psutil.cpu_percent(percpu=True)
+        network = self.network.update()
+        disk_io = self.disk_io.update()
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+
+        # Get top processes
+        self.processes.update()
+        processes = self.processes.top(DEFAULT_TOP_N, 'cpu')
+
+        snapshot = {
+            'cpu_percent': cpu_percent,
+            'memory': {
+                'total': round(memory.total / (1024**3), 2),
+                'available': round(memory.available / (1024**3), 2),
+                'percent': memory.percent,
+                'used': round(memory.used / (1024**3), 2)
+            },
+            'disk': {
+                'total': round(disk.total / (1024**3), 2),
+                'used': round(disk.used / (1024**3), 2),
+                'free': round(disk.free / (1024**3), 2),
+                'percent': round((disk.used / disk.total) * 100, 2)
+            },
+            'cpu_per_core': cpu_per_core,
+            'network': dict(_sum_rates(network, self.network.fields), interfaces=network),
+            'disk_io': dict(_sum_rates(disk_io, self.disk_io.fields), disks=disk_io),
+            'top_processes': processes,
+            'sampled_at': time.time()
+        }
+
+        net_rate = None
+        if network:
+            net_rate = snapshot['network']['bytes_sent_per_sec'] + snapshot['network']['bytes_recv_per_sec']
+        self.history.record(snapshot['sampled_at'], {
+            'cpu': cpu_percent,
+            'memory': memory.percent,
+            'disk': snapshot['disk']['percent'],
+            'net': net_rate
+        })
+
+        # Snapshots are replaced, never mutated, so readers need no copy
+        with self._updated:
+            self._snapshot = snapshot
+            self._version += 1
+            self._updated.notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
+        return snapshot
+
+    def get_history(self, range_seconds, step=None):
+        """Averaged samples over the last range_seconds, see MetricsHistory.query"""
+        if not self.is_running():
+            self.start()
+        return self.history.query(range_seconds, step)
+
+    def get_snapshot(self, wait=True):
+        """Return the latest snapshot with staleness information
+
+        Before the first sample exists this samples synchronously, or with
+        wait=False only starts the thread and returns None.
+        """
+        snapshot = self._snapshot
+        if snapshot is None and not wait:
+            self.start()
+            return None
+        if snapshot is None:
+            snapshot = self.sample()
+        if not self.is_running():
+            self.start()
+
+        result = dict(snapshot)
+        result['age'] = round(max(0.0, time.time() - snapshot['sampled_at']), 3)
+        result['interval'] = self.interval
+        return result
+
+    def top_processes(self, n=DEFAULT_TOP_N, sort='cpu'):
+        """Rank the tracked processes from the latest sample"""
+        if self._snapshot is None:
+            self.get_snapshot()
+        return self.processes.top(min(max(n, 1), MAX_TOP_N), sort)
+
+    def add_listener(self, listener):
+        """Call listener() from the sampling thread after each new snapshot"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def wait_for_update(self, version, timeout=None):
+        """Block until a snapshot newer than version exists
+
+        Returns (version, snapshot); the version is unchanged on timeout.
+        """
+        if not self.is_running():
+            self.start()
+        with self._updated:
+            self._updated.wait_for(lambda: self._version > version, timeout)
+            return self._version, self._snapshot
+
+
+def diff_snapshots(old, new):
+    """Return only the fields of new that differ from old
+
+    Nested dicts are diffed recursively, anything else is compared whole.
+    A key that new no longer has, such as a removed network interface, is
+    sent as None so clients know to drop it.
+    """
+    if old is None:
+        return new
+    changes = {key: None for key in old if key not in new}
+    for key, value in new.items():
+        previous = old.get(key)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            nested = diff_snapshots(previous, value)
+            if nested:
+                changes[key] = nested
+        elif value != previous:
+            changes[key] = value
+    return changes
+
+
+_default_sampler = None
+_default_lock = threading.Lock()
+
+
+def get_sampler():
+    """Get the process-wide sampler, configured from MONITOR_INTERVAL"""
+    global _default_sampler
+    if _default_sampler is None:
+        with _default_lock:
+            if _default_sampler is None:
+                interval = float(os.environ.get('MONITOR_INTERVAL', DEFAULT_INTERVAL))
+                _default_sampler = SystemSampler(interval=interval)
+    return _default_sampler
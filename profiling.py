@@ -0,0 +1,169 @@
+"""
+Request Profiling
+Named timing spans around the stages of command execution, aggregated in
+process with streaming quantiles, and an on-demand sampling profiler that
+reports where every thread spends its time.
+"""
+
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+DEFAULT_ACCURACY = 0.01
+DEFAULT_SAMPLE_INTERVAL = 0.005
+MAX_PROFILE_SECONDS = 30
+DEFAULT_TOP_FUNCTIONS = 25
+# Shared no-op span, so disabled profiling costs one attribute check
+_DISABLED_SPAN = nullcontext()
+
+
+class QuantileSketch:
+    """Log-bucketed histogram answering quantiles within a relative error
+
+    Values within relative_accuracy of each other share a bucket, so the
+    number of buckets stays small (about a thousand from a microsecond to
+    an hour) however many values are added.
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_ACCURACY):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._buckets = {}
+        self._zeros = 0
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        if value <= 1e-9:
+            self._zeros += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+
+    def quantile(self, q):
+        """Approximate value below which a fraction q of the values fall"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self._zeros
+        if rank < seen:
+            return 0.0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen > rank:
+                # Midpoint of the bucket (gamma^(i-1), gamma^i]
+                return min(2 * self.gamma ** index / (self.gamma + 1), self.max)
+        return self.max
+
+
+class Profiler:
+    def __init__(self, enabled=False, relative_accuracy=DEFAULT_ACCURACY):
+        self.enabled = enabled
+        self.relative_accuracy = relative_accuracy
+        self._lock = threading.Lock()
+        self._spans = {}
+        self.started_at = time.time()
+
+    def span(self, name):
+        """Time a block under name while profiling is enabled"""
+        if not self.enabled:
+            return _DISABLED_SPAN
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name, seconds):
+        """Add one timing to a span's aggregate"""
+        if not self.enabled:
+            return
+        with self._lock:
+            sketch = self._spans.get(name)
+            if sketch is None:
+                sketch = self._spans[name] = QuantileSketch(self.relative_accuracy)
+            sketch.add(seconds)
+
+    def stats(self):
+        """Per-span count, total, mean, max and p50/p95/p99 in milliseconds"""
+        with self._lock:
+            result = {}
+            for name, sketch in sorted(self._spans.items()):
+                result[name] = {
+                    'count': sketch.count,
+                    'total_ms': round(sketch.sum * 1000, 3),
+                    'mean_ms': round(sketch.sum / sketch.count * 1000, 3),
+                    'p50_ms': round(sketch.quantile(0.5) * 1000, 3),
+                    'p95_ms': round(sketch.quantile(0.95) * 1000, 3),
+                    'p99_ms': round(sketch.quantile(0.99) * 1000, 3),
+                    'max_ms': round(sketch.max * 1000, 3)
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._spans = {}
+            self.started_at = time.time()
+
+
+def sample_stacks(seconds, interval=DEFAULT_SAMPLE_INTERVAL, limit=DEFAULT_TOP_FUNCTIONS):
+    """Sample every other thread's stack for a while
+
+    Returns the functions seen most often, with 'self' counting samples
+    where the function was running and 'total' those where it was anywhere
+    on the stack. Unlike cProfile this sees all threads and adds no
+    overhead to the code being measured.
+    """
+    seconds = min(max(seconds, interval), MAX_PROFILE_SECONDS)
+    own_thread = threading.get_ident()
+    exclusive = Counter()
+    inclusive = Counter()
+    samples = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            samples += 1
+            seen = set()
+            top = True
+            while frame is not None:
+                code = frame.f_code
+                key = (code.co_name, code.co_filename, code.co_firstlineno)
+                if top:
+                    exclusive[key] += 1
+                    top = False
+                if key not in seen:
+                    inclusive[key] += 1
+                    seen.add(key)
+                frame = frame.f_back
+        time.sleep(interval)
+
+    functions = [
+        {
+            'function': name,
+            'file': os.path.relpath(filename) if not filename.startswith('<') else filename,
+            'line': line,
+            'self': exclusive[(name, filename, line)],
+            'total': count
+        }
+        for (name, filename, line), count in inclusive.most_common()
+    ]
+    functions.sort(key=lambda entry: (entry['self'], entry['total']), reverse=True)
+    return {'seconds': seconds, 'samples': samples, 'functions': functions[:limit]}
+
+
+# Process-wide profiler; TERMINAL_PROFILE=1 enables it at startup
+profiler = Profiler(enabled=os.environ.get('TERMINAL_PROFILE', '') == '1')
@@ -0,0 +1,59 @@
+"""
+Terminal Session Manager
+Keeps one terminal state object per client in a bounded LRU with idle
+eviction, so concurrent users no longer share a working directory.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_SESSIONS = 1000
+DEFAULT_IDLE_TIMEOUT = 3600
+
+
+class SessionManager:
+    def __init__(self, factory, max_sessions=DEFAULT_MAX_SESSIONS, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        # session id -> (terminal, last used); most recently used last
+        self._sessions = OrderedDict()
+
+    def get(self, session_id):
+        """Get the terminal for a session, creating it if needed"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            terminal = entry[0] if entry else None
+            self._evict(now)
+            if terminal is None:
+                terminal = self.factory()
+            self._sessions[session_id] = (terminal, now)
+            return terminal
+
+    def peek(self, session_id):
+        """Get the terminal for a session without creating or touching it"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return entry[0] if entry else None
+
+    def discard(self, session_id):
+        """Drop a session"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict(self, now):
+        """Drop idle sessions, then the least recently used beyond capacity"""
+        while self._sessions:
+            session_id, (terminal, last_used) = next(iter(self._sessions.items()))
+            if now - last_used <= self.idle_timeout and len(self._sessions) < self.max_sessions:
+                break
+            del self._sessions[session_id]
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, session_id):
+        return session_id in self._sessions
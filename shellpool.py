@@ -0,0 +1,270 @@
+"""
+Persistent Shell Pool
+Keeps a few long-lived /bin/sh processes and feeds them commands instead of
+starting a new shell for every command. Each command runs in a subshell of
+a pooled shell, so cd, exit and variable changes do not leak between
+commands. Its output goes to a pair of FIFOs made for that command, and
+the shell reports its exit status after a random sentinel marker.
+"""
+
+import atexit
+import os
+import secrets
+import selectors
+import shlex
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+
+from execution import DEFAULT_MAX_OUTPUT_BYTES
+
+# Process groups and select() on pipes are POSIX only
+SHELL_POOL_SUPPORTED = os.name != 'nt'
+DEFAULT_POOL_SIZE = 4
+DEFAULT_COMMAND_TIMEOUT = 30
+# Commands a worker runs before it is replaced, to bound slow leaks
+DEFAULT_MAX_USES = 1000
+
+
+class ShellWorkerError(OSError):
+    """Raised when a pooled shell exits or breaks while running a command"""
+
+
+class ShellWorker:
+    def __init__(self, shell='/bin/sh'):
+        self.proc = subprocess.Popen(
+            [shell],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0,
+            start_new_session=True
+        )
+        # Commands write to FIFOs made here rather than to the shell's own
+        # pipes, which only carry the end-of-command markers
+        self.fifo_dir = tempfile.mkdtemp(prefix='shellpool-')
+        self.uses = 0
+        self.broken = False
+
+    def _open_fifo(self, name):
+        """Make a FIFO for one command's output, returning (path, read fd, write fd)
+
+        Holding a write end keeps the read end from seeing EOF before the
+        command has opened it.
+        """
+        path = os.path.join(self.fifo_dir, name)
+        os.mkfifo(path, 0o600)
+        read_fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        return path, read_fd, os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+
+    def run(self, command, cwd, timeout=DEFAULT_COMMAND_TIMEOUT, max_bytes=DEFAULT_MAX_OUTPUT_BYTES):
+        """Run one command, returning a subprocess.CompletedProcess
+
+        Output is read until the command and anything it left running in the
+        background have closed it, as subprocess.run does, so a background
+        command's output can never reach a later command on this shell.
+        Raises subprocess.TimeoutExpired like subprocess.run. A worker that
+        timed out, overflowed max_bytes or died is marked broken and must not
+        be reused.
+        """
+        self.uses += 1
+        token = secrets.token_hex(8)
+        marker = f"__shellpool_{token}__".encode()
+        fifos = {}
+        try:
+            for name in ('stdout', 'stderr'):
+                fifos[name] = self._open_fifo(f"{token}.{name}")
+        except OSError as e:
+            self._close_fifos(fifos)
+            raise ShellWorkerError(f"Cannot create output pipes: {e}")
+        script = (
+            f"( cd -- {shlex.quote(cwd)} && eval {shlex.quote(command)} ) </dev/null "
+            f">{shlex.quote(fifos['stdout'][0])} 2>{shlex.quote(fifos['stderr'][0])}; "
+            f"printf '%s%d\\n' '{marker.decode()}' \"$?\"\n"
+        )
+        try:
+            self.proc.stdin.write(script.encode())
+        except (BrokenPipeError, ValueError) as e:
+            self._close_fifos(fifos)
+            self.broken = True
+            raise ShellWorkerError(f"Shell worker is not running: {e}")
+
+        # Read end -> output buffer; the marker line collects separately
+        buffers = {fifos['stdout'][1]: bytearray(), fifos['stderr'][1]: bytearray()}
+        status = bytearray()
+        code = None
+        shell_out = self.proc.stdout.fileno()
+        selector = selectors.DefaultSelector()
+        selector.register(shell_out, selectors.EVENT_READ)
+        for fd in buffers:
+            selector.register(fd, selectors.EVENT_READ)
+        open_fds = set(buffers)
+        deadline = time.monotonic() + timeout
+        try:
+            while code is None or open_fds:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.close()
+                    raise subprocess.TimeoutExpired(command, timeout, *self._decode(buffers, fifos))
+                for key, _ in selector.select(remaining):
+                    fd = key.fd
+                    try:
+                        data = os.read(fd, 65536)
+                    except BlockingIOError:
+                        continue
+                    if fd == shell_out:
+                        if not data:
+                            self.close()
+                            raise ShellWorkerError("Shell worker exited unexpectedly")
+                        status += data
+                        end = status.find(marker)
+                        if end != -1 and status.endswith(b'\n'):
+                            code = int(status[end + len(marker):].strip())
+                            selector.unregister(fd)
+                            # The command has exited; from now on EOF means
+                            # whatever it left running has closed the FIFOs too
+                            for name in fifos:
+                                os.close(fifos[name][2])
+                                fifos[name] = fifos[name][:2] + (None,)
+                        continue
+                    if not data:
+                        selector.unregister(fd)
+                        open_fds.discard(fd)
+                        continue
+                    buffer = buffers[fd]
+                    buffer += data
+                    if len(buffer) > max_bytes:
+                        # Keep the capped output and report the command as killed
+                        self.close()
+                        del buffer[max_bytes:]
+                        stdout, stderr = self._decode(buffers, fifos)
+                        return subprocess.CompletedProcess(command, -signal.SIGKILL, stdout, stderr)
+        finally:
+            selector.close()
+            self._close_fifos(fifos)
+
+        stdout, stderr = self._decode(buffers, fifos)
+        return subprocess.CompletedProcess(command, code, stdout, stderr)
+
+    def _decode(self, buffers, fifos):
+        return tuple(bytes(buffers[fifos[name][1]]).decode('utf-8', 'replace') for name in ('stdout', 'stderr'))
+
+    def _close_fifos(self, fifos):
+        for path, *fds in fifos.values():
+            for fd in fds:
+                if fd is not None:
+                    try:
+                        os.close(fd)
+                    except OSError:
+                        pass
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def is_alive(self):
+        return not self.broken and self.proc.poll() is None
+
+    def close(self):
+        """Kill the shell and anything it started"""
+        self.broken = True
+        if self.proc.poll() is None:
+            try:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        self.proc.wait()
+        for pipe in (self.proc.stdin, self.proc.stdout, self.proc.stderr):
+            pipe.close()
+        shutil.rmtree(self.fifo_dir, ignore_errors=True)
+
+
+class ShellPool:
+    def __init__(self, size=DEFAULT_POOL_SIZE, max_uses=DEFAULT_MAX_USES, shell='/bin/sh'):
+        self.size = size
+        self.max_uses = max_uses
+        self.shell = shell
+        self._cond = threading.Condition()
+        self._idle = []
+        self._workers = 0
+        self._closed = False
+
+    def _acquire(self):
+        """Take an idle worker, starting one if the pool is not full"""
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise ShellWorkerError("Shell pool is closed")
+                while self._idle:
+                    worker = self._idle.pop()
+                    if worker.is_alive():
+                        return worker
+                    self._workers -= 1
+                if self._workers < self.size:
+                    self._workers += 1
+                    break
+                self._cond.wait()
+        try:
+            return ShellWorker(self.shell)
+        except Exception:
+            self._release(None)
+            raise
+
+    def _release(self, worker):
+        """Return a worker to the pool, or drop it if it cannot be reused"""
+        reusable = worker is not None and worker.is_alive() and worker.uses < self.max_uses
+        with self._cond:
+            if reusable and not self._closed:
+                self._idle.append(worker)
+                worker = None
+            else:
+                self._workers -= 1
+            self._cond.notify()
+        if worker is not None:
+            worker.close()
+
+    def run(self, command, cwd, timeout=DEFAULT_COMMAND_TIMEOUT, max_bytes=DEFAULT_MAX_OUTPUT_BYTES):
+        """Run a command on a pooled shell, see ShellWorker.run"""
+        worker = self._acquire()
+        try:
+            return worker.run(command, cwd, timeout=timeout, max_bytes=max_bytes)
+        finally:
+            self._release(worker)
+
+    def close(self):
+        """Stop every idle shell; busy ones stop when their command returns"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._workers -= len(idle)
+            self._cond.notify_all()
+        for worker in idle:
+            worker.close()
+
+    def __len__(self):
+        return self._workers
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def get_shell_pool():
+    """Get the process-wide shell pool, or None if it is disabled
+
+    Set TERMINAL_SHELL_POOL to the number of shells to keep (0 disables the
+    pool, the default).
+    """
+    global _default_pool
+    size = int(os.environ.get('TERMINAL_SHELL_POOL', 0))
+    if size <= 0 or not SHELL_POOL_SUPPORTED:
+        return None
+    if _default_pool is None:
+        with _default_lock:
+            if _default_pool is None:
+                _default_pool = ShellPool(size)
+                atexit.register(_default_pool.close)
+    return _default_pool
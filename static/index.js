@@ -0,0 +1,552 @@
+let commandHistory = [];
+let historyIndex = -1;
+let autocompleteIndex = -1;
+let isExecuting = false;
+let streamingAvailable = true;
+
+const terminalOutput = document.getElementById('terminal-output');
+const commandInput = document.getElementById('command-input');
+const currentDirSpan = document.getElementById('current-dir');
+const systemInfoSpan = document.getElementById('system-info');
+const autocompleteDropdown = document.getElementById('autocomplete-dropdown');
+
+// Focus on input
+commandInput.focus();
+
+// Load system info, then the history once the session cookie is set
+loadSystemInfo().then(loadCommandHistory);
+
+// Start monitoring
+startSystemMonitoring();
+loadMonitoringTrend();
+setInterval(loadMonitoringTrend, 30000);
+
+function loadSystemInfo() {
+    // Platform details are static, so they come once from a cacheable
+    // endpoint instead of with every command's response
+    fetch('/system_info')
+    .then(response => response.ok ? response.json() : null)
+    .then(showSystemInfo)
+    .catch(() => {});
+
+    return fetch('/execute', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ command: 'pwd', system_info: false, history: false })
+    })
+    .then(response => response.json())
+    .then(data => {
+        showSystemInfo(data.system_info);
+        currentDirSpan.textContent = data.current_dir || '~';
+    });
+}
+
+function showSystemInfo(info) {
+    if (info) {
+        systemInfoSpan.textContent = `${info.platform} | Python ${info.python_version}`;
+    }
+}
+
+function loadCommandHistory() {
+    // Arrow keys recall this session's commands from earlier visits too
+    fetch('/history?limit=50')
+    .then(response => response.json())
+    .then(entries => {
+        if (commandHistory.length === 0) {
+            commandHistory = entries.map(entry => entry.command);
+        }
+    })
+    .catch(error => {
+        console.error('Error loading command history:', error);
+    });
+}
+
+let monitoringData = {};
+
+function startSystemMonitoring() {
+    if (!window.EventSource) {
+        // No server push available, fall back to polling
+        pollSystemMonitoring();
+        return;
+    }
+
+    const source = new EventSource('/monitor/stream');
+    let connected = false;
+    source.onopen = function() {
+        connected = true;
+    };
+    source.addEventListener('snapshot', function(event) {
+        monitoringData = JSON.parse(event.data);
+        renderSystemMonitoring(monitoringData);
+    });
+    source.addEventListener('update', function(event) {
+        mergeUpdate(monitoringData, JSON.parse(event.data));
+        renderSystemMonitoring(monitoringData);
+    });
+    source.onerror = function(error) {
+        if (!connected) {
+            // The stream never opened: the serverless apps have no
+            // /monitor/stream (a 404 closes it, a network error retries),
+            // so poll /monitor instead
+            source.close();
+            pollSystemMonitoring();
+            return;
+        }
+        // EventSource reconnects on its own and resends a full snapshot
+        console.error('Monitoring stream interrupted:', error);
+    };
+}
+
+function pollSystemMonitoring() {
+    setInterval(updateSystemMonitoring, 3000);
+    updateSystemMonitoring();
+}
+
+function loadMonitoringTrend() {
+    fetch('/monitor/history?range=15m&step=30s')
+    .then(response => response.json())
+    .then(history => {
+        const blocks = '▁▂▃▄▅▆▇█';
+        document.getElementById('cpu-trend').textContent = history.series.cpu.map(value =>
+            value === null ? ' ' : blocks[Math.min(blocks.length - 1, Math.floor(value / 100 * blocks.length))]
+        ).join('');
+    })
+    .catch(error => {
+        console.error('Error fetching monitoring history:', error);
+    });
+}
+
+function mergeUpdate(target, changes) {
+    Object.keys(changes).forEach(key => {
+        const value = changes[key];
+        if (value === null) {
+            // Removed on the server, e.g. a network interface that went away
+            delete target[key];
+        } else if (value && typeof value === 'object' && !Array.isArray(value) &&
+            target[key] && typeof target[key] === 'object') {
+            mergeUpdate(target[key], value);
+        } else {
+            target[key] = value;
+        }
+    });
+}
+
+function updateSystemMonitoring() {
+    fetch('/monitor')
+    .then(response => response.json())
+    .then(renderSystemMonitoring)
+    .catch(error => {
+        console.error('Error fetching monitoring data:', error);
+    });
+}
+
+function formatRate(bytesPerSec) {
+    const units = ['B/s', 'KB/s', 'MB/s', 'GB/s'];
+    let value = bytesPerSec || 0;
+    let unit = 0;
+    while (value >= 1024 && unit < units.length - 1) {
+        value /= 1024;
+        unit++;
+    }
+    return `${value.toFixed(1)} ${units[unit]}`;
+}
+
+function renderSystemMonitoring(data) {
+    if (typeof data === 'object' && data.cpu_percent !== undefined) {
+        // Update CPU
+        document.getElementById('cpu-usage').textContent = `${data.cpu_percent.toFixed(1)}%`;
+        document.getElementById('cpu-progress').style.width = `${data.cpu_percent}%`;
+
+        // Update Memory
+        document.getElementById('memory-usage').textContent = `${data.memory.percent.toFixed(1)}%`;
+        document.getElementById('memory-progress').style.width = `${data.memory.percent}%`;
+
+        // Update Disk
+        document.getElementById('disk-usage').textContent = `${data.disk.percent.toFixed(1)}%`;
+        document.getElementById('disk-progress').style.width = `${data.disk.percent}%`;
+
+        // Update throughput
+        if (data.network) {
+            document.getElementById('network-rate').textContent =
+                `↓${formatRate(data.network.bytes_recv_per_sec)} ↑${formatRate(data.network.bytes_sent_per_sec)}`;
+        }
+        if (data.disk_io) {
+            document.getElementById('disk-io-rate').textContent =
+                `R ${formatRate(data.disk_io.read_bytes_per_sec)} W ${formatRate(data.disk_io.write_bytes_per_sec)}`;
+        }
+
+        // Update top processes
+        const processesDiv = document.getElementById('top-processes');
+        if (data.top_processes && data.top_processes.length > 0) {
+            processesDiv.innerHTML = data.top_processes.slice(0, 5).map(proc => 
+                `<div style="font-size: 10px; margin-bottom: 3px; color: #888;">
+                    <div>${proc.name || 'Unknown'}</div>
+                    <div style="color: #00ff00;">CPU: ${(proc.cpu_percent || 0).toFixed(1)}%</div>
+                </div>`
+            ).join('');
+        }
+    }
+}
+
+function executeCommand(command) {
+    if (isExecuting) return;
+
+    isExecuting = true;
+
+    // Add command to output
+    addToOutput(`${currentDirSpan.textContent}$ ${command}`, 'command');
+
+    // Add loading indicator
+    const loadingLine = addToOutput('Executing...', 'loading');
+
+    const finish = () => {
+        loadingLine.remove();
+        isExecuting = false;
+    };
+
+    const run = (streamingAvailable && window.ReadableStream && window.TextDecoder) ? streamCommand : bufferedCommand;
+    run(command, loadingLine)
+    .then(finish)
+    .catch(error => {
+        finish();
+        addToOutput(`Error: ${error.message}`, 'error');
+    });
+}
+
+function bufferedCommand(command) {
+    return fetch('/execute', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ command: command, system_info: false })
+    })
+    .then(response => response.json())
+    .then(data => {
+        showCommandOutput(data.output);
+
+        // Update current directory
+        if (data.current_dir) {
+            currentDirSpan.textContent = data.current_dir;
+        }
+    });
+}
+
+function streamCommand(command, loadingLine) {
+    // Output arrives as events while the command runs
+    let stdoutLine = null;
+    let stderrLine = null;
+
+    const handleEvent = event => {
+        if (event.type === 'output') {
+            showCommandOutput(event.data);
+        } else if (event.type === 'stdout' || event.type === 'stderr') {
+            let line = event.type === 'stdout' ? stdoutLine : stderrLine;
+            if (!line) {
+                line = addToOutput('', event.type === 'stdout' ? 'output' : 'error');
+                terminalOutput.insertBefore(loadingLine, null);
+                if (event.type === 'stdout') stdoutLine = line; else stderrLine = line;
+            }
+            line.textContent += event.data;
+            terminalOutput.scrollTop = terminalOutput.scrollHeight;
+        } else if (event.type === 'truncated') {
+            addToOutput(`Error: Output truncated at ${event.limit} bytes`, 'error');
+        } else if (event.type === 'timeout') {
+            addToOutput('Error: Command timed out', 'error');
+        } else if (event.type === 'exit' && !stdoutLine && !stderrLine) {
+            addToOutput('Command executed successfully', 'output');
+        } else if (event.type === 'done' && event.current_dir) {
+            currentDirSpan.textContent = event.current_dir;
+        }
+    };
+
+    // Binary frames carry output as raw UTF-8 rather than escaped JSON
+    return fetch('/execute/stream?format=binary', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ command: command })
+    })
+    .then(response => {
+        // Servers without the stream route (the serverless apps) get the
+        // command through /execute instead, now and for later commands
+        const type = response.headers.get('Content-Type') || '';
+        if (!response.ok || !type.startsWith('application/x-terminal-frames')) {
+            streamingAvailable = false;
+            return bufferedCommand(command);
+        }
+        const reader = response.body.getReader();
+        let buffer = new Uint8Array(0);
+
+        const pump = () => reader.read().then(({ done, value }) => {
+            if (value) {
+                const joined = new Uint8Array(buffer.length + value.length);
+                joined.set(buffer);
+                joined.set(value, buffer.length);
+                buffer = joined;
+            }
+            buffer = readFrames(buffer, handleEvent);
+            if (!done) return pump();
+        });
+        return pump();
+    });
+}
+
+const FRAME_TYPES = ['json', 'stdout', 'stderr', 'output'];
+const frameDecoder = window.TextDecoder ? new TextDecoder() : null;
+
+function readFrames(buffer, handleEvent) {
+    // Each frame is a type byte, a big-endian uint32 length and the
+    // payload; returns the bytes of any incomplete frame
+    let offset = 0;
+    while (buffer.length - offset >= 5) {
+        const view = new DataView(buffer.buffer, buffer.byteOffset + offset, 5);
+        const type = FRAME_TYPES[view.getUint8(0)];
+        const length = view.getUint32(1);
+        if (buffer.length - offset - 5 < length) break;
+        const text = frameDecoder.decode(buffer.subarray(offset + 5, offset + 5 + length));
+        handleEvent(type === 'json' ? JSON.parse(text) : { type: type, data: text });
+        offset += 5 + length;
+    }
+    return buffer.slice(offset);
+}
+
+function showCommandOutput(output) {
+    if (output === 'CLEAR_TERMINAL') {
+        clearTerminal();
+    } else if (typeof output === 'object') {
+        addToOutput(JSON.stringify(output, null, 2), 'output');
+    } else {
+        addToOutput(output, output.startsWith('Error:') ? 'error' : 'output');
+    }
+}
+
+function addToOutput(text, className = 'output') {
+    const line = document.createElement('div');
+    line.className = `output-line ${className}`;
+    line.textContent = text;
+    terminalOutput.appendChild(line);
+    terminalOutput.scrollTop = terminalOutput.scrollHeight;
+    return line;
+}
+
+function clearTerminal() {
+    terminalOutput.innerHTML = `
+        <div class="output-line">
+            <span class="output">Terminal cleared.</span>
+        </div>
+    `;
+}
+
+// Event listeners
+commandInput.addEventListener('keydown', function(event) {
+    if (event.ctrlKey && event.key === 'r') {
+        event.preventDefault();
+        if (reverseSearch) {
+            nextSearchMatch();
+        } else {
+            startReverseSearch();
+        }
+        return;
+    }
+    if (reverseSearch) {
+        if (event.key === 'Escape' || (event.ctrlKey && event.key === 'g')) {
+            event.preventDefault();
+            endReverseSearch(false);
+            return;
+        }
+        if (event.key === 'Enter' || event.key === 'Tab') {
+            event.preventDefault();
+            endReverseSearch(true);
+            return;
+        }
+    }
+    if (event.key === 'Enter') {
+        const command = this.value.trim();
+        if (command) {
+            // Add to history
+            commandHistory.unshift(command);
+            if (commandHistory.length > 50) {
+                commandHistory.pop();
+            }
+            historyIndex = -1;
+
+            executeCommand(command);
+            this.value = '';
+        }
+        hideAutocomplete();
+    } else if (event.key === 'ArrowUp') {
+        event.preventDefault();
+        if (historyIndex < commandHistory.length - 1) {
+            historyIndex++;
+            this.value = commandHistory[historyIndex];
+        }
+    } else if (event.key === 'ArrowDown') {
+        event.preventDefault();
+        if (historyIndex > 0) {
+            historyIndex--;
+            this.value = commandHistory[historyIndex];
+        } else if (historyIndex === 0) {
+            historyIndex = -1;
+            this.value = '';
+        }
+    } else if (event.key === 'Tab') {
+        event.preventDefault();
+        handleAutocomplete();
+    } else if (event.key === 'Escape') {
+        hideAutocomplete();
+    }
+});
+
+let autocompleteTimer = null;
+let autocompleteRequest = 0;
+
+commandInput.addEventListener('input', function() {
+    const query = this.value.trim();
+    // Wait for a pause in typing instead of querying on every key
+    clearTimeout(autocompleteTimer);
+    if (reverseSearch) {
+        autocompleteRequest++;
+        if (query.length > 0) {
+            autocompleteTimer = setTimeout(() => findHistory(query), 120);
+        } else {
+            reverseSearch.matches = [];
+            hideAutocomplete();
+        }
+    } else if (query.length > 0) {
+        autocompleteTimer = setTimeout(() => showAutocomplete(query), 120);
+    } else {
+        autocompleteRequest++;
+        hideAutocomplete();
+    }
+});
+
+function showAutocomplete(query) {
+    const requestId = ++autocompleteRequest;
+    fetch(`/autocomplete?q=${encodeURIComponent(query)}`)
+    .then(response => response.json())
+    .then(suggestions => {
+        // A newer query was sent in the meantime, drop this answer
+        if (requestId !== autocompleteRequest) return;
+        if (suggestions.length > 0) {
+            autocompleteDropdown.innerHTML = suggestions.map((suggestion, index) => 
+                `<div class="autocomplete-item" data-index="${index}">${suggestion}</div>`
+            ).join('');
+
+            autocompleteDropdown.style.display = 'block';
+            autocompleteIndex = -1;
+
+            // Add click listeners
+            autocompleteDropdown.querySelectorAll('.autocomplete-item').forEach(item => {
+                item.addEventListener('click', function() {
+                    commandInput.value = this.textContent;
+                    hideAutocomplete();
+                    commandInput.focus();
+                });
+            });
+        } else {
+            hideAutocomplete();
+        }
+    })
+    .catch(() => hideAutocomplete());
+}
+
+// Ctrl-R searches the history ranked by the server; Ctrl-R again
+// moves to the next match, Enter or Tab takes it, Escape cancels
+let reverseSearch = null;
+const promptSpan = document.getElementById('prompt');
+
+function startReverseSearch() {
+    reverseSearch = { saved: commandInput.value, matches: [], index: 0 };
+    promptSpan.textContent = '(reverse-i-search)';
+    commandInput.placeholder = 'Search history...';
+    hideAutocomplete();
+    const query = commandInput.value.trim();
+    if (query) {
+        findHistory(query);
+    }
+}
+
+function findHistory(query) {
+    const requestId = ++autocompleteRequest;
+    fetch(`/history/find?q=${encodeURIComponent(query)}`)
+    .then(response => response.json())
+    .then(matches => {
+        if (requestId !== autocompleteRequest || !reverseSearch) return;
+        reverseSearch.matches = matches.map(match => match.command);
+        reverseSearch.index = 0;
+        renderSearchMatches();
+    })
+    .catch(() => hideAutocomplete());
+}
+
+function renderSearchMatches() {
+    autocompleteDropdown.innerHTML = '';
+    if (reverseSearch.matches.length === 0) {
+        hideAutocomplete();
+        return;
+    }
+    reverseSearch.matches.forEach((command, index) => {
+        const item = document.createElement('div');
+        item.className = index === reverseSearch.index ? 'autocomplete-item selected' : 'autocomplete-item';
+        item.textContent = command;
+        item.addEventListener('click', function() {
+            reverseSearch.index = index;
+            endReverseSearch(true);
+            commandInput.focus();
+        });
+        autocompleteDropdown.appendChild(item);
+    });
+    autocompleteDropdown.style.display = 'block';
+}
+
+function nextSearchMatch() {
+    if (reverseSearch.matches.length > 0) {
+        reverseSearch.index = (reverseSearch.index + 1) % reverseSearch.matches.length;
+        renderSearchMatches();
+    }
+}
+
+function endReverseSearch(accept) {
+    const { saved, matches, index } = reverseSearch;
+    if (accept && matches.length > 0) {
+        commandInput.value = matches[index];
+    } else if (!accept) {
+        commandInput.value = saved;
+    }
+    reverseSearch = null;
+    autocompleteRequest++;
+    promptSpan.textContent = '$';
+    commandInput.placeholder = 'Enter command...';
+    hideAutocomplete();
+}
+
+function hideAutocomplete() {
+    autocompleteDropdown.style.display = 'none';
+    autocompleteIndex = -1;
+}
+
+function handleAutocomplete() {
+    const items = autocompleteDropdown.querySelectorAll('.autocomplete-item');
+    if (items.length > 0) {
+        if (autocompleteIndex >= 0) {
+            commandInput.value = items[autocompleteIndex].textContent;
+            hideAutocomplete();
+        } else {
+            autocompleteIndex = 0;
+            items[0].classList.add('selected');
+        }
+    }
+}
+
+// Keep focus on input
+document.addEventListener('click', function(event) {
+    if (!autocompleteDropdown.contains(event.target)) {
+        commandInput.focus();
+        hideAutocomplete();
+    }
+});
+
+// Window click to hide autocomplete
+window.addEventListener('click', function(event) {
+    if (!event.target.closest('.input-container')) {
+        hideAutocomplete();
+    }
+});
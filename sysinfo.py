@@ -0,0 +1,81 @@
+"""
+Static System Information
+Platform details shown by the terminals, cached in memory and on disk.
+Collecting them imports platform and runs `uname -p` for the processor,
+which is a noticeable part of startup, while they only change when the OS
+or the Python installation does.
+"""
+
+import json
+import os
+import sys
+
+CACHE_FILE = 'system_info.json'
+
+_system_info = None
+
+
+def cache_dir():
+    """Directory for the cache; TERMINAL_CACHE_DIR='' disables it"""
+    configured = os.environ.get('TERMINAL_CACHE_DIR')
+    if configured is not None:
+        return configured or None
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'python-terminal')
+
+
+def _cache_key():
+    """Cheap fingerprint of the things the cached values depend on"""
+    uname = list(os.uname()) if hasattr(os, 'uname') else list(sys.getwindowsversion())
+    return [sys.version, sys.executable, sys.platform, uname]
+
+
+def collect_system_info():
+    """Ask the platform module directly, bypassing the caches"""
+    import platform
+    return {
+        'platform': platform.system(),
+        'platform_version': platform.version(),
+        'architecture': platform.architecture()[0],
+        'processor': platform.processor(),
+        'python_version': platform.python_version()
+    }
+
+
+def _read_cache(path, key):
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get('key') != key:
+        return None
+    return cached.get('info')
+
+
+def _write_cache(path, key, info):
+    """Write the cache atomically; a read-only home just means no cache"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({'key': key, 'info': info}, f)
+        os.replace(temp_path, path)
+    except OSError:
+        pass
+
+
+def get_system_info():
+    """Platform, version, architecture, processor and Python version"""
+    global _system_info
+    if _system_info is None:
+        directory = cache_dir()
+        path = os.path.join(directory, CACHE_FILE) if directory else None
+        key = _cache_key()
+        info = _read_cache(path, key) if path else None
+        if info is None:
+            info = collect_system_info()
+            if path:
+                _write_cache(path, key, info)
+        _system_info = info
+    return dict(_system_info)
@@ -0,0 +1,183 @@
+"""
+Monitoring Time Series
+Fixed-size ring buffers of monitoring samples. Raw samples are kept for an
+hour, with minute and hour averages kept for longer. Every buffer is
+preallocated, so memory use does not grow with uptime.
+"""
+
+import math
+import struct
+import threading
+import time
+from array import array
+
+SERIES_FIELDS = ('cpu', 'memory', 'disk', 'net')
+# (name, step in seconds or None for raw samples, retention in seconds)
+TIERS = (
+    ('raw', None, 3600),
+    ('minute', 60, 24 * 3600),
+    ('hour', 3600, 30 * 24 * 3600)
+)
+MAX_POINTS = 2000
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_duration(text):
+    """Parse '90', '30s', '15m', '24h' or '7d' into seconds"""
+    text = str(text).strip().lower()
+    unit = DURATION_UNITS.get(text[-1:])
+    number = text[:-1] if unit else text
+    try:
+        seconds = float(number) * (unit or 1)
+    except ValueError:
+        raise ValueError(f"Invalid duration '{text}'")
+    if not seconds > 0 or math.isinf(seconds):
+        raise ValueError(f"Invalid duration '{text}'")
+    return seconds
+
+
+class RingBuffer:
+    def __init__(self, capacity, fields=SERIES_FIELDS):
+        self.capacity = capacity
+        self.fields = tuple(fields)
+        self.times = array('d', [0.0]) * capacity
+        self.columns = {field: array('d', [math.nan]) * capacity for field in self.fields}
+        self._next = 0
+        self._count = 0
+
+    def append(self, timestamp, values):
+        """Store a sample, overwriting the oldest one when full"""
+        position = self._next
+        self.times[position] = timestamp
+        for field in self.fields:
+            value = values.get(field)
+            self.columns[field][position] = math.nan if value is None else value
+        self._next = (position + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def oldest(self):
+        """Timestamp of the oldest stored sample, or None when empty"""
+        if not self._count:
+            return None
+        return self.times[(self._next - self._count) % self.capacity]
+
+    def positions(self):
+        """Buffer positions from oldest to newest"""
+        start = self._next - self._count
+        return [(start + i) % self.capacity for i in range(self._count)]
+
+    def __len__(self):
+        return self._count
+
+
+class MetricsHistory:
+    def __init__(self, interval, fields=SERIES_FIELDS, tiers=TIERS):
+        self.fields = tuple(fields)
+        self._lock = threading.Lock()
+        self._tiers = []
+        for name, step, retention in tiers:
+            step_seconds = step or interval
+            capacity = max(1, int(math.ceil(retention / step_seconds)))
+            self._tiers.append({
+                'name': name,
+                'step': step_seconds,
+                'raw': step is None,
+                'buffer': RingBuffer(capacity, self.fields),
+                # Running sums for the bucket being filled
+                'bucket': None,
+                'sums': dict.fromkeys(self.fields, 0.0),
+                'counts': dict.fromkeys(self.fields, 0)
+            })
+
+    def record(self, timestamp, values):
+        """Add a sample to the raw tier and the downsampled averages"""
+        with self._lock:
+            for tier in self._tiers:
+                if tier['raw']:
+                    tier['buffer'].append(timestamp, values)
+                    continue
+                bucket = int(timestamp // tier['step'])
+                if tier['bucket'] is not None and bucket != tier['bucket']:
+                    self._flush(tier)
+                tier['bucket'] = bucket
+                for field in self.fields:
+                    value = values.get(field)
+                    if value is not None:
+                        tier['sums'][field] += value
+                        tier['counts'][field] += 1
+
+    def _flush(self, tier):
+        """Store the average of a finished bucket"""
+        averages = {}
+        for field in self.fields:
+            count = tier['counts'][field]
+            averages[field] = tier['sums'][field] / count if count else None
+            tier['sums'][field] = 0.0
+            tier['counts'][field] = 0
+        tier['buffer'].append(tier['bucket'] * tier['step'], averages)
+
+    def _pick_tier(self, start, step):
+        """Finest tier that still covers start and is no finer than step"""
+        candidates = [tier for tier in self._tiers if tier['step'] <= step] or self._tiers[:1]
+        for tier in candidates:
+            oldest = tier['buffer'].oldest()
+            if oldest is not None and oldest <= start:
+                return tier
+        # Nothing reaches back far enough, use whichever holds the most history
+        return min(candidates, key=lambda tier: tier['buffer'].oldest() or math.inf)
+
+    def query(self, range_seconds, step=None, now=None):
+        """Averages over fixed steps covering the last range_seconds
+
+        Returns {'start', 'step', 'count', 'tier', 'fields', 'series'} where
+        series maps each field to a list of count values (None where there
+        was no data); point i covers [start + i*step, start + (i+1)*step).
+        """
+        now = time.time() if now is None else now
+        step = step or self._tiers[0]['step']
+        # Keep responses bounded however small a step is asked for
+        step = max(step, range_seconds / MAX_POINTS)
+        start = (now - range_seconds) // step * step
+        count = int(math.ceil((now - start) / step))
+
+        sums = {field: [0.0] * count for field in self.fields}
+        counts = {field: [0] * count for field in self.fields}
+        with self._lock:
+            tier = self._pick_tier(start, step)
+            buffer = tier['buffer']
+            for position in buffer.positions():
+                index = int((buffer.times[position] - start) // step)
+                if not 0 <= index < count:
+                    continue
+                for field in self.fields:
+                    value = buffer.columns[field][position]
+                    if not math.isnan(value):
+                        sums[field][index] += value
+                        counts[field][index] += 1
+
+        series = {}
+        for field in self.fields:
+            series[field] = [
+                round(total / n, 2) if n else None
+                for total, n in zip(sums[field], counts[field])
+            ]
+        return {
+            'start': start,
+            'step': step,
+            'count': count,
+            'tier': tier['name'],
+            'fields': list(self.fields),
+            'series': series
+        }
+
+
+def pack_history(history):
+    """Encode a query result as little-endian float32 columns
+
+    Each field is count floats in the order of history['fields'], with NaN
+    where there was no data.
+    """
+    values = []
+    for field in history['fields']:
+        values.extend(math.nan if value is None else value for value in history['series'][field])
+    return struct.pack(f"<{len(values)}f", *values)